@@ -52,6 +52,29 @@ class PaddleOCRVisionConfig(PretrainedConfig):
         self.temporal_patch_size = temporal_patch_size
         self.tokens_per_second = tokens_per_second
 
+    @classmethod
+    def tiny(cls, **kwargs):
+        """
+        Tiny vision preset for fast CPU benchmarking and tests (random weights only).
+
+        Keeps the patch size, merge size and image size of the released checkpoint so the
+        shipped image processor produces compatible inputs.
+
+        Args:
+            **kwargs: Overrides applied on top of the preset
+        """
+        preset = dict(
+            hidden_size=64,
+            intermediate_size=128,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            image_size=384,
+            patch_size=14,
+            spatial_merge_size=2,
+        )
+        preset.update(kwargs)
+        return cls(**preset)
+
 
 
 class PaddleOCRVLConfig(PretrainedConfig):
@@ -188,4 +211,40 @@ class PaddleOCRVLConfig(PretrainedConfig):
                 self.rope_scaling["type"] = "default"
             self.rope_scaling["rope_type"] = self.rope_scaling["type"]
         rope_config_validation(self, ignore_keys={"mrope_section"})        
-        super().__init__(tie_word_embeddings=tie_word_embeddings, **kwargs)
\ No newline at end of file
+        super().__init__(tie_word_embeddings=tie_word_embeddings, **kwargs)
+
+    @classmethod
+    def tiny(cls, vision_config=None, **kwargs):
+        """
+        Tiny preset for fast CPU benchmarking and tests (random weights only).
+
+        Keeps the vocabulary and special token ids of the released checkpoint so the shipped
+        tokenizer and processor can be reused unchanged; only the layer count and widths shrink.
+        The mRoPE sections are scaled with head_dim (sum(mrope_section) == head_dim // 2).
+
+        Args:
+            vision_config (dict, optional): Overrides for PaddleOCRVisionConfig.tiny
+            **kwargs: Overrides applied on top of the preset
+        """
+        preset = dict(
+            vocab_size=103424,
+            hidden_size=64,
+            intermediate_size=128,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            num_key_value_heads=1,
+            head_dim=32,
+            max_position_embeddings=131072,
+            image_token_id=100295,
+            video_token_id=101307,
+            vision_start_token_id=101305,
+            rms_norm_eps=1e-05,
+            rope_theta=500000,
+            rope_scaling={"mrope_section": [4, 6, 6], "rope_type": "default", "type": "default"},
+            use_cache=True,
+            use_3d_rope=True,
+            rope_is_neox_style=True,
+        )
+        preset.update(kwargs)
+        vision = PaddleOCRVisionConfig.tiny(**(vision_config or {}))
+        return cls(vision_config=vision.to_dict(), **preset)
\ No newline at end of file
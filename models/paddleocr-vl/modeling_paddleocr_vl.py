@@ -14,6 +14,7 @@
 
 import math
 import warnings
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
@@ -994,33 +995,24 @@ class Projector(nn.Module):
         self.linear_2 = nn.Linear(
             self.hidden_size, self.text_config.hidden_size, bias=True
         )
+        # (grid signature, device) -> (gather index, merged token count per image)
+        self._merge_indices: "OrderedDict[tuple, Tuple[torch.Tensor, List[int]]]" = OrderedDict()
+
+    # upper bound on cached merge indices (one entry per distinct batch of page grids)
+    merge_index_cache_size = 64
 
     def forward(
         self, image_features: torch.Tensor, image_grid_thw: List[Tuple[int, int, int]]
     ) -> torch.Tensor:
-        m1, m2 = self.merge_kernel_size
         if isinstance(image_features, (list, tuple)):
-            processed_features = list()
-            for image_feature, image_grid in zip(image_features, image_grid_thw):
-                image_feature = self.pre_norm(image_feature)
-                t, h, w = image_grid
-                from einops import rearrange
-
-                image_feature = rearrange(
-                    image_feature,
-                    "(t h p1 w p2) d -> (t h w) (p1 p2 d)",
-                    t=t,
-                    h=h // m1,
-                    p1=m1,
-                    w=w // m2,
-                    p2=m2,
-                )
-                hidden_states = self.linear_1(image_feature)
-                hidden_states = self.act(hidden_states)
-                hidden_states = self.linear_2(hidden_states)
-                processed_features.append(hidden_states)
-
-            return processed_features
+            packed = (
+                image_features[0]
+                if len(image_features) == 1
+                else torch.cat(list(image_features), dim=0)
+            )
+            hidden_states = self.forward_packed(packed, image_grid_thw)
+            _, counts = self._merge_index(grid_signature(image_grid_thw), packed.device)
+            return list(hidden_states.split(counts, dim=0))
 
         dims = image_features.shape[:-1]
         dim = image_features.shape[-1]
@@ -1032,6 +1024,59 @@ class Projector(nn.Module):
 
         return hidden_states.view(*dims, -1)
 
+    def forward_packed(
+        self, image_features: torch.Tensor, image_grid_thw: List[Tuple[int, int, int]]
+    ) -> torch.Tensor:
+        """
+        Project the features of several images packed along the first dimension.
+
+        Equivalent to rearranging each image with `(t h p1 w p2) d -> (t h w) (p1 p2 d)` and
+        projecting it separately, but done with one gather and one pass through the MLP.
+        Returns `(total_merged_tokens, text_hidden_size)` in image order.
+        """
+        index, _ = self._merge_index(grid_signature(image_grid_thw), image_features.device)
+        hidden_states = self.pre_norm(image_features)
+        hidden_states = hidden_states.index_select(0, index).view(-1, self.hidden_size)
+        hidden_states = self.linear_1(hidden_states)
+        hidden_states = self.act(hidden_states)
+        return self.linear_2(hidden_states)
+
+    def _merge_index(
+        self, signature: Tuple[Tuple[int, int, int], ...], device: torch.device
+    ) -> Tuple[torch.Tensor, List[int]]:
+        """
+        Gather index that reorders packed patches into merge-kernel order, cached by grid signature.
+
+        Row `k * m1 * m2 + p1 * m2 + p2` of the gathered tensor is patch `(t, h * m1 + p1, w * m2 + p2)`
+        of the image owning merged token `k = (t, h, w)`.
+        """
+        key = (signature, str(device))
+        cached = self._merge_indices.get(key)
+        if cached is not None:
+            self._merge_indices.move_to_end(key)
+            return cached
+
+        m1, m2 = self.merge_kernel_size
+        indices, counts, offset = [], [], 0
+        for t, h, w in signature:
+            patches = torch.arange(t * h * w).view(t, h // m1, m1, w // m2, m2)
+            indices.append(patches.permute(0, 1, 3, 2, 4).flatten() + offset)
+            counts.append(t * (h // m1) * (w // m2))
+            offset += t * h * w
+        cached = (torch.cat(indices).to(device), counts)
+
+        self._merge_indices[key] = cached
+        if len(self._merge_indices) > self.merge_index_cache_size:
+            self._merge_indices.popitem(last=False)
+        return cached
+
+
+def grid_signature(image_grid_thw) -> Tuple[Tuple[int, int, int], ...]:
+    """Hashable `((t, h, w), ...)` for a grid tensor or a list of grid tuples, read back from the device once."""
+    if torch.is_tensor(image_grid_thw):
+        return tuple(tuple(grid) for grid in image_grid_thw.tolist())
+    return tuple(tuple(int(v) for v in grid) for grid in image_grid_thw)
+
 
 class SiglipVisionEmbeddings(nn.Module):
     def __init__(self, config: PaddleOCRVisionConfig):
@@ -1217,9 +1262,55 @@ def eager_attention_forward(
     return attn_output, attn_weights
 
 
+def chunked_varlen_attention_forward(
+    query: torch.Tensor,
+    key: torch.Tensor,
+    value: torch.Tensor,
+    cu_seqlens: torch.Tensor,
+    scaling: float,
+    max_scores: int,
+) -> torch.Tensor:
+    """
+    Memory-bounded attention over a packed batch of variable-length sequences.
+
+    Tokens only attend within their own `cu_seqlens` segment (one image each), and every segment is processed
+    in query chunks so that at most `max_scores` attention scores (chunk x segment length x heads) are alive at
+    a time. Peak memory therefore grows linearly with the number of patches instead of quadratically.
+
+    Args:
+        query, key, value: `(1, num_heads, seq_len, head_dim)` tensors, rotary embedding already applied.
+        cu_seqlens: `(num_segments + 1,)` cumulative segment lengths.
+        scaling: softmax scale.
+        max_scores: upper bound on the number of attention scores materialized per chunk.
+
+    Returns:
+        `(1, seq_len, num_heads, head_dim)` attention output.
+    """
+    num_heads = query.shape[1]
+    output = torch.empty_like(query)
+    bounds = cu_seqlens.tolist()
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        seg_len = end - start
+        if seg_len == 0:
+            continue
+        seg_key = key[:, :, start:end]
+        seg_value = value[:, :, start:end]
+        chunk = max(1, max_scores // (num_heads * seg_len))
+        for q_start in range(start, end, chunk):
+            q_end = min(q_start + chunk, end)
+            output[:, :, q_start:q_end] = F.scaled_dot_product_attention(
+                query[:, :, q_start:q_end], seg_key, seg_value, scale=scaling
+            )
+    return output.transpose(1, 2)
+
+
 class SiglipAttention(nn.Module):
     """Multi-headed attention from 'Attention Is All You Need' paper"""
 
+    # Upper bound on attention scores materialized at once by the chunked varlen path (64M scores,
+    # 256 MB in fp32), used when flash-attention is unavailable.
+    varlen_max_scores = 1 << 26
+
     def __init__(self, config: PaddleOCRVisionConfig):
         super().__init__()
         self.config = config
@@ -1287,7 +1378,29 @@ class SiglipAttention(nn.Module):
                 batch_size, seq_length, self.num_heads, self.head_dim
             ).transpose(1, 2)
 
-        if not use_flash_attn:
+        if (
+            not use_flash_attn
+            and cu_seqlens is not None
+            and attention_mask is None
+            and batch_size == 1
+            and not output_attentions
+            and not self.training
+        ):
+            # packed images without flash-attention: attend per image in memory-bounded query chunks
+            # instead of materializing a dense (seq_len x seq_len) score matrix over the whole pack
+            attn_output = chunked_varlen_attention_forward(
+                queries,
+                keys,
+                values,
+                cu_seqlens,
+                scaling=self.scale,
+                max_scores=self.varlen_max_scores,
+            )
+            attn_output = attn_output.reshape(
+                batch_size, seq_length, embed_dim
+            ).contiguous()
+            attn_weights = None
+        elif not use_flash_attn:
             attention_interface: Callable = eager_attention_forward
             if self.config._attn_implementation != "eager":
                 if self.config._attn_implementation == "sdpa" and output_attentions:
@@ -2065,6 +2178,10 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
         self.vocab_size = config.vocab_size
         self.lm_head = nn.Linear(config.hidden_size, config.vocab_size, bias=False)
         self.rope_deltas = None
+        # (grid_t, grid_h, grid_w, device) -> per-image mRoPE template, see `_rope_index_template`
+        self._rope_templates: "OrderedDict[tuple, Tuple[torch.Tensor, int]]" = OrderedDict()
+        # (grid signature, device) -> packed vision metadata, see `_vision_metadata`
+        self._vision_metadata_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
 
         self.post_init()
 
@@ -2086,6 +2203,11 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
     def get_decoder(self):
         return self.model
 
+    # upper bound on cached per-grid templates (one entry per distinct page grid)
+    rope_template_cache_size = 256
+    # upper bound on cached vision metadata (one entry per distinct batch of page grids)
+    vision_metadata_cache_size = 64
+
     def get_rope_index(
         self,
         input_ids: Optional[torch.LongTensor] = None,
@@ -2093,6 +2215,97 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
         video_grid_thw: Optional[torch.LongTensor] = None,
         second_per_grid_ts: Optional[torch.Tensor] = None,
         attention_mask: Optional[torch.Tensor] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Calculate the 3D rope index; see `get_rope_index_reference` for the layout.
+
+        Image-only batches (the OCR path) are computed with tensor operations over the whole
+        padded batch; videos and inputs whose image tokens or vision-start markers do not match
+        `image_grid_thw` fall back to the reference loop. Both produce identical position ids and deltas.
+        """
+        if input_ids is None or image_grid_thw is None or video_grid_thw is not None:
+            return self.get_rope_index_reference(
+                input_ids, image_grid_thw, video_grid_thw, second_per_grid_ts, attention_mask
+            )
+
+        device = input_ids.device
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        valid = attention_mask.to(device) == 1
+        image_mask = (input_ids == self.config.image_token_id) & valid
+
+        merge = self.config.vision_config.spatial_merge_size
+        grids = [
+            (t, h // merge, w // merge) for t, h, w in image_grid_thw.tolist()
+        ]
+        templates = [self._rope_index_template(*grid, device) for grid in grids]
+        lengths = [t * h * w for t, h, w in grids]
+        image_starts = (
+            (input_ids[:, :-1] == self.config.vision_start_token_id)
+            & image_mask[:, 1:]
+            & valid[:, :-1]
+        )
+        if int(image_mask.sum()) != sum(lengths) or int(image_starts.sum()) != len(grids):
+            return self.get_rope_index_reference(
+                input_ids, image_grid_thw, video_grid_thw, second_per_grid_ts, attention_mask
+            )
+
+        # Text positions advance by one per valid token; each image block advances them by
+        # its span (max template position + 1) instead of its token count. The shift is added
+        # on the image's last token and applied to later tokens via an exclusive cumsum.
+        shifts = torch.zeros(sum(lengths), dtype=torch.long, device=device)
+        ends = torch.tensor(lengths, device=device).cumsum(0) - 1
+        shifts[ends] = torch.tensor([shift for _, shift in templates], dtype=torch.long, device=device)
+        token_shift = torch.zeros(input_ids.shape, dtype=torch.long, device=device)
+        token_shift[image_mask] = shifts
+        base = valid.long().cumsum(-1) - 1 + token_shift.cumsum(-1) - token_shift
+
+        position_ids = base.unsqueeze(0).repeat(3, 1, 1)
+        position_ids[:, image_mask] += torch.cat([offsets for offsets, _ in templates], dim=1)
+        position_ids.masked_fill_(~valid.unsqueeze(0), 1)
+        position_ids = position_ids.to(input_ids.dtype)
+
+        max_positions = position_ids.masked_fill(~valid.unsqueeze(0), 0).amax(dim=(0, 2))
+        mrope_position_deltas = (max_positions + 1 - input_ids.shape[1]).unsqueeze(1)
+        return position_ids, mrope_position_deltas
+
+    def _rope_index_template(
+        self, grid_t: int, grid_h: int, grid_w: int, device: torch.device
+    ) -> Tuple[torch.Tensor, int]:
+        """
+        Per-image mRoPE template for a merged grid, cached by grid shape.
+
+        Returns `(offsets, shift)`: `offsets[:, j]` is the (t, h, w) position of the j-th image
+        token minus `j` (added on top of the sequential text position), and `shift` is how much
+        further the following text starts compared to counting the image tokens one by one.
+        Images use `second_per_grid_t = 0`, so their temporal index is always 0.
+        """
+        key = (grid_t, grid_h, grid_w, str(device))
+        template = self._rope_templates.get(key)
+        if template is not None:
+            self._rope_templates.move_to_end(key)
+            return template
+
+        count = grid_t * grid_h * grid_w
+        t_index = torch.zeros(count, dtype=torch.long)
+        h_index = torch.arange(grid_h).view(1, -1, 1).expand(grid_t, -1, grid_w).flatten()
+        w_index = torch.arange(grid_w).view(1, 1, -1).expand(grid_t, grid_h, -1).flatten()
+        positions = torch.stack([t_index, h_index, w_index])
+        span = int(positions.max()) + 1
+        template = ((positions - torch.arange(count)).to(device), span - count)
+
+        self._rope_templates[key] = template
+        if len(self._rope_templates) > self.rope_template_cache_size:
+            self._rope_templates.popitem(last=False)
+        return template
+
+    def get_rope_index_reference(
+        self,
+        input_ids: Optional[torch.LongTensor] = None,
+        image_grid_thw: Optional[torch.LongTensor] = None,
+        video_grid_thw: Optional[torch.LongTensor] = None,
+        second_per_grid_ts: Optional[torch.Tensor] = None,
+        attention_mask: Optional[torch.Tensor] = None,
     ) -> Tuple[torch.Tensor, torch.Tensor]:
         """
         Calculate the 3D rope index based on image and video's temporal, height and width in LLM.
@@ -2309,6 +2522,77 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
 
             return position_ids, mrope_position_deltas
 
+    def get_image_features(
+        self, pixel_values: torch.Tensor, image_grid_thw: torch.LongTensor
+    ) -> torch.Tensor:
+        """
+        Run the vision tower and projector on packed image patches.
+
+        Returns the projected image embeddings of all images concatenated along the first
+        dimension (one row per image token). Callers may cache this output and pass it back
+        to `forward` as `image_embeds` to skip the vision tower on later prompts.
+        """
+        pixel_values = pixel_values.type(self.visual.dtype)
+        pixel_values = pixel_values.unsqueeze(0)
+        signature = grid_signature(image_grid_thw)
+        image_grid_hws, siglip_position_ids, sample_indices, cu_seqlens = (
+            self._vision_metadata(signature, pixel_values.device)
+        )
+
+        vision_outputs = self.visual(
+            pixel_values=pixel_values,
+            image_grid_thw=image_grid_hws,
+            position_ids=siglip_position_ids,
+            vision_return_embed_list=True,
+            interpolate_pos_encoding=True,
+            sample_indices=sample_indices,
+            cu_seqlens=cu_seqlens,
+            return_pooler_output=False,
+            use_rope=True,
+            window_size=-1,
+        )
+        image_embeds = vision_outputs.last_hidden_state
+        packed = image_embeds[0] if len(image_embeds) == 1 else torch.cat(image_embeds, dim=0)
+        return self.mlp_AR.forward_packed(packed, signature)
+
+    def _vision_metadata(
+        self, signature: Tuple[Tuple[int, int, int], ...], device: torch.device
+    ) -> Tuple[List[Tuple[int, int, int]], torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        Packed-patch metadata for the vision tower, built in one pass and cached by grid signature.
+
+        Returns `(image_grid_hws, siglip_position_ids, sample_indices, cu_seqlens)`: the grids as
+        tuples, each patch's position within its frame, the owning image index of each patch, and
+        the int32 cumulative patch counts. The cached tensors are shared and must not be modified.
+        """
+        key = (signature, str(device))
+        cached = self._vision_metadata_cache.get(key)
+        if cached is not None:
+            self._vision_metadata_cache.move_to_end(key)
+            return cached
+
+        grids = torch.tensor(signature, dtype=torch.int64).view(-1, 3)
+        numels = grids.prod(dim=1)
+        starts = numels.cumsum(0) - numels
+        frame_sizes = grids[:, 1] * grids[:, 2]
+        patch_ids = torch.arange(int(numels.sum()))
+        siglip_position_ids = (
+            patch_ids - starts.repeat_interleave(numels)
+        ) % frame_sizes.repeat_interleave(numels)
+        sample_indices = torch.arange(len(signature)).repeat_interleave(numels)
+        cu_seqlens = F.pad(numels.cumsum(0), (1, 0)).to(torch.int32)
+        cached = (
+            list(signature),
+            siglip_position_ids.to(device),
+            sample_indices.to(device),
+            cu_seqlens.to(device),
+        )
+
+        self._vision_metadata_cache[key] = cached
+        if len(self._vision_metadata_cache) > self.vision_metadata_cache_size:
+            self._vision_metadata_cache.popitem(last=False)
+        return cached
+
     def forward(
         self,
         input_ids: torch.LongTensor = None,
@@ -2328,9 +2612,15 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
         rope_deltas: Optional[torch.LongTensor] = None,
         cache_position: Optional[torch.LongTensor] = None,
         second_per_grid_ts: Optional[torch.Tensor] = None,
+        image_embeds: Optional[torch.Tensor] = None,
         **kwargs,
     ) -> Union[Tuple, PaddleOCRVLCausalLMOutputWithPast]:
         r"""
+        image_embeds (`torch.Tensor` of shape `(num_image_tokens, hidden_size)`, *optional*):
+            Precomputed output of `get_image_features` for the images in `input_ids`. When given,
+            `pixel_values` are ignored and the vision tower is skipped; `image_grid_thw` is still
+            required to compute the multimodal rope index.
+
         Returns:
         """
         output_attentions = (
@@ -2349,53 +2639,10 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
 
         if inputs_embeds is None:
             inputs_embeds = self.model.embed_tokens(input_ids)
-            if pixel_values is not None:
-                pixel_values = pixel_values.type(self.visual.dtype)
-                pixel_values = pixel_values.unsqueeze(0)
-                siglip_position_ids = list()
-                image_grid_hws = list()
-                sample_indices = list()
-                cu_seqlens = [0]
-
-                pro = 0
-                for idx, thw in enumerate(image_grid_thw):
-                    thw_tuple = tuple(thw.detach().cpu().numpy().tolist())
-                    numel = np.prod(thw_tuple)
-                    image_grid_hws.append(thw_tuple)
-                    image_position_ids = torch.arange(numel) % np.prod(thw_tuple[1:])
-                    siglip_position_ids.append(image_position_ids)
-                    sample_indices.append(torch.full((numel,), idx, dtype=torch.int64))
-                    cu_seqlens.append(cu_seqlens[-1] + numel)
-
-                siglip_position_ids = torch.concat(siglip_position_ids, dim=0).to(
-                    pixel_values.device
-                )
-                cu_seqlens = torch.tensor(cu_seqlens, dtype=torch.int32).to(
-                    pixel_values.device
-                )
-                sample_indices = torch.concat(sample_indices, dim=0).to(
-                    pixel_values.device
-                )
-
-                vision_outputs = self.visual(
-                    pixel_values=pixel_values,
-                    image_grid_thw=image_grid_hws,
-                    position_ids=siglip_position_ids,
-                    vision_return_embed_list=True,
-                    interpolate_pos_encoding=True,
-                    sample_indices=sample_indices,
-                    cu_seqlens=cu_seqlens,
-                    return_pooler_output=False,
-                    use_rope=True,
-                    window_size=-1,
-                )
-                image_embeds = vision_outputs.last_hidden_state
-
-                image_embeds = self.mlp_AR(image_embeds, image_grid_thw)
-
+            if image_embeds is None and pixel_values is not None:
+                image_embeds = self.get_image_features(pixel_values, image_grid_thw)
+            if image_embeds is not None:
                 n_image_tokens = (input_ids == self.config.image_token_id).sum().item()
-                # image_embeds is a list of tensor, each tensor is a image feature,I want to concat them all into a tensor
-                image_embeds = torch.cat(image_embeds, dim=0)
                 n_image_features = image_embeds.shape[0]
                 if n_image_tokens != n_image_features:
                     raise ValueError(
@@ -2420,10 +2667,14 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
         if position_ids is None and (
             attention_mask is None or attention_mask.ndim == 2
         ):
+            # rope deltas travel with the generation kwargs (see `_update_model_kwargs_for_generation`);
+            # the model attribute is only a fallback for callers driving `forward` by hand
+            if rope_deltas is None:
+                rope_deltas = self.rope_deltas
             # calculate RoPE index once per generation in the pre-fill stage only
             if (
                 (cache_position is not None and cache_position[0] == 0)
-                or self.rope_deltas is None
+                or rope_deltas is None
                 or (past_key_values is None or past_key_values.get_seq_length() == 0)
             ):
                 position_ids, rope_deltas = self.get_rope_index(
@@ -2438,7 +2689,7 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
             else:
                 batch_size, seq_length, _ = inputs_embeds.shape
                 delta = (
-                    (cache_position[0] + self.rope_deltas).to(inputs_embeds.device)
+                    (cache_position[0] + rope_deltas).to(inputs_embeds.device)
                     if cache_position is not None
                     else 0
                 )
@@ -2456,6 +2707,7 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
             past_key_values=past_key_values,
             inputs_embeds=inputs_embeds,
             use_cache=use_cache,
+            cache_position=cache_position,
             output_attentions=output_attentions,
             output_hidden_states=output_hidden_states,
             return_dict=return_dict,
@@ -2490,7 +2742,7 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
             past_key_values=outputs.past_key_values,
             hidden_states=outputs.hidden_states,
             attentions=outputs.attentions,
-            rope_deltas=self.rope_deltas,
+            rope_deltas=rope_deltas if rope_deltas is not None else self.rope_deltas,
         )
 
     def prepare_inputs_for_generation(
@@ -2507,6 +2759,7 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
         image_grid_thw=None,
         video_grid_thw=None,
         second_per_grid_ts=None,
+        image_embeds=None,
         **kwargs,
     ):
         # Overwritten -- in specific circumstances we don't want to forward image inputs to the model
@@ -2524,6 +2777,7 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
             video_grid_thw=video_grid_thw,
             second_per_grid_ts=second_per_grid_ts,
             use_cache=use_cache,
+            image_embeds=image_embeds,
             **kwargs,
         )
 
@@ -2532,9 +2786,32 @@ class PaddleOCRVLForConditionalGeneration(Ernie4_5PreTrainedModel, GenerationMix
         if cache_position[0] != 0:
             model_inputs["pixel_values"] = None
             model_inputs["pixel_values_videos"] = None
+            model_inputs["image_embeds"] = None
+        else:
+            # a new generation starts from scratch: never reuse deltas of a previous prompt
+            model_inputs["rope_deltas"] = None
 
         return model_inputs
 
+    def _update_model_kwargs_for_generation(
+        self,
+        outputs: ModelOutput,
+        model_kwargs: Dict[str, Any],
+        is_encoder_decoder: bool = False,
+        num_new_tokens: int = 1,
+    ) -> Dict[str, Any]:
+        # Overwritten -- carry the mRoPE deltas computed at pre-fill to the cached decode steps,
+        # so that position ids are a per-generation (and per-row) quantity rather than model state
+        model_kwargs = super()._update_model_kwargs_for_generation(
+            outputs,
+            model_kwargs,
+            is_encoder_decoder=is_encoder_decoder,
+            num_new_tokens=num_new_tokens,
+        )
+        if getattr(outputs, "rope_deltas", None) is not None:
+            model_kwargs["rope_deltas"] = outputs.rope_deltas
+        return model_kwargs
+
     def _get_image_nums_and_video_nums(
         self,
         input_ids: Optional[torch.LongTensor],
@@ -7,14 +7,16 @@ FastAPI后端服务
 import os
 import uuid
 import json
+import hashlib
+import time
 import shutil
 import asyncio
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any
 
-from fastapi import FastAPI, File, UploadFile, BackgroundTasks, HTTPException
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
+from fastapi import FastAPI, File, UploadFile, BackgroundTasks, HTTPException, Query, Request, Header
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, StreamingResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import aiofiles
@@ -22,6 +24,18 @@ import aiofiles
 from converter.pdf_processor import PDFProcessor
 from converter.ocr_processor import OCRProcessor
 from converter.markdown_generator import MarkdownGenerator
+from converter.executor import InferenceExecutor
+from converter.pipeline import PagePipeline
+from converter.scheduler import ContinuousBatchScheduler
+from converter.task_store import create_task_store
+from converter.task_events import TaskEventHub
+from converter.upload_limit import UploadSizeLimitMiddleware
+from converter.result_cache import ConversionCache
+from converter.page_cache import PageResultCache
+from converter.vision_cache import VisionEmbeddingCache
+from converter.prefix_cache import PrefixKVCache
+from converter.page_classifier import PageClassifier
+from converter.metrics import MetricsRegistry, process_rss_bytes
 
 
 # 初始化FastAPI应用
@@ -31,15 +45,6 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# 添加CORS支持
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # 配置目录
 BASE_DIR = Path(__file__).parent
 UPLOAD_DIR = BASE_DIR / "uploads"
@@ -55,116 +60,495 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 # 全局处理器（单例）
-pdf_processor = PDFProcessor(dpi=300)
+# TEXT_LAYER_FASTPATH=0 时所有页面都走OCR
+pdf_processor = PDFProcessor(
+    dpi=300,
+    use_text_layer=os.environ.get("TEXT_LAYER_FASTPATH", "1") != "0"
+)
 ocr_processor = None  # 延迟加载（模型较大）
 markdown_generator = MarkdownGenerator()
 
-# 任务状态存储（简单实现，生产环境应使用数据库或Redis）
-tasks: Dict[str, Dict[str, Any]] = {}
+# 推理前页面分类：空白页/纯图片页不送入模型（PAGE_CLASSIFIER=0 关闭）
+# 阈值可通过 PAGE_CLASSIFIER_THRESHOLDS 以JSON覆盖，例如 {"blank_max_ink_density": 0.001}
+page_classifier = PageClassifier(
+    **json.loads(os.environ.get("PAGE_CLASSIFIER_THRESHOLDS", "{}"))
+) if os.environ.get("PAGE_CLASSIFIER", "1") != "0" else None
+if page_classifier is not None:
+    print(f"页面分类阈值: {json.dumps(page_classifier.thresholds, ensure_ascii=False)}")
+
+# 上传限制：单文件最大字节数、最大页数（0表示不限制），上传按固定大小分块写盘
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", "512")) * 1024 ** 2)
+MAX_PDF_PAGES = int(os.environ.get("MAX_PDF_PAGES", "0"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# 在 FastAPI 解析表单之前限制上传请求体大小（multipart包装开销很小，留出一个分块的余量）
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path="/api/upload",
+    max_body_bytes=MAX_UPLOAD_BYTES + UPLOAD_CHUNK_SIZE,
+    detail=f"文件超过大小上限 {MAX_UPLOAD_BYTES // 1024 ** 2} MB"
+)
+
+# 添加CORS支持（最后添加的中间件位于最外层，413等错误响应也带CORS头）
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# 流水线阶段间队列容量（内存中同时驻留的页面数上限约为 2 × 该值）
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "2"))
+
+# 解码截断原因的日志说明
+TRUNCATION_REASONS = {
+    "repetition": "输出陷入重复循环，已提前停止",
+    "time_budget": "超过单页解码时间预算",
+    "max_new_tokens": "达到最大生成token数",
+}
+
+# 连续批处理：CONTINUOUS_BATCHING=1 时多个任务的页面共享一个解码批（CONTINUOUS_BATCH_SIZE 条序列），
+# 最多 MAX_CONCURRENT_TASKS 个任务的流水线同时运行
+CONTINUOUS_BATCHING = os.environ.get("CONTINUOUS_BATCHING", "0") == "1"
+CONTINUOUS_BATCH_SIZE = int(os.environ.get("CONTINUOUS_BATCH_SIZE", "4"))
+MAX_CONCURRENT_TASKS = int(os.environ.get("MAX_CONCURRENT_TASKS", "4"))
+
+# 执行器：渲染走线程池，推理走专用线程，事件循环只负责调度
+executor = InferenceExecutor(
+    render_workers=int(os.environ.get("RENDER_WORKERS", "0")) or None,
+    pipeline_workers=MAX_CONCURRENT_TASKS if CONTINUOUS_BATCHING else 1
+)
+scheduler = None  # 连续批处理调度器（随OCR处理器延迟创建）
+
+# 任务状态存储：默认SQLite（WAL），重启后任务记录与下载仍然可用
+# TASK_STORE=memory 可切换为内存存储（仅用于开发调试）
+tasks = create_task_store(
+    backend=os.environ.get("TASK_STORE", "sqlite"),
+    db_path=os.environ.get("TASK_DB_PATH", str(BASE_DIR / "data" / "tasks.db"))
+)
+
+# 任务事件中心：任务存储变更时唤醒SSE连接
+task_events = TaskEventHub()
+tasks.add_listener(task_events.publish)
+
+# SSE心跳间隔（秒），防止代理断开空闲连接
+SSE_HEARTBEAT_SECONDS = 15
+
+# 转换结果缓存：相同PDF + 相同处理参数直接复用已有输出
+conversion_cache = ConversionCache(
+    cache_dir=os.environ.get("CONVERSION_CACHE_DIR", str(BASE_DIR / "cache" / "conversions")),
+    max_bytes=int(float(os.environ.get("CONVERSION_CACHE_MAX_MB", "2048")) * 1024 ** 2),
+    max_age_seconds=float(os.environ.get("CONVERSION_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+)
+
+# 页面级识别结果缓存：跨文档复用相同页面（封面、声明页、空白页等）的识别结果
+# PAGE_CACHE_MAX_MB=0 时关闭
+PAGE_CACHE_MAX_MB = float(os.environ.get("PAGE_CACHE_MAX_MB", "256"))
+page_cache = PageResultCache(
+    db_path=os.environ.get("PAGE_CACHE_PATH", str(BASE_DIR / "cache" / "pages.db")),
+    max_bytes=int(PAGE_CACHE_MAX_MB * 1024 ** 2)
+) if PAGE_CACHE_MAX_MB > 0 else None
+
+# 视觉嵌入缓存：同一页面换任务类型重新识别时跳过视觉编码器（safetensors 文件）
+# 每页约数MB，默认关闭，VISION_CACHE_MAX_MB>0 时开启
+VISION_CACHE_MAX_MB = float(os.environ.get("VISION_CACHE_MAX_MB", "0"))
+vision_cache = VisionEmbeddingCache(
+    cache_dir=os.environ.get("VISION_CACHE_DIR", str(BASE_DIR / "cache" / "vision")),
+    max_bytes=int(VISION_CACHE_MAX_MB * 1024 ** 2)
+) if VISION_CACHE_MAX_MB > 0 else None
+
+# 图像前缀KV缓存：同一页面换任务类型时只预填充任务指令（常驻模型设备内存），默认关闭
+PREFIX_CACHE_MAX_MB = float(os.environ.get("PREFIX_CACHE_MAX_MB", "0"))
+prefix_cache = PrefixKVCache(
+    max_bytes=int(PREFIX_CACHE_MAX_MB * 1024 ** 2)
+) if PREFIX_CACHE_MAX_MB > 0 else None
+
+
+# 指标：热路径只记录计数器和直方图，瞬时值在抓取 /metrics 时采集
+metrics = MetricsRegistry()
+STAGE_SECONDS = metrics.histogram(
+    "pdf2md_stage_seconds",
+    "各处理阶段耗时（render/preprocess 按页，vision/prefill/decode 按批，markdown 按文档）",
+    labelnames=("stage",)
+)
+GENERATED_TOKENS = metrics.counter("pdf2md_generated_tokens_total", "模型生成的token总数")
+VISION_TOKENS = metrics.histogram(
+    "pdf2md_vision_tokens_per_page",
+    "每页送入语言模型的视觉token数",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192)
+)
+PAGES = metrics.counter("pdf2md_pages_total", "已处理页数（按路由）", labelnames=("route",))
+TRUNCATED_PAGES = metrics.counter("pdf2md_truncated_pages_total", "解码被截断的页数（按原因）", labelnames=("reason",))
+TASKS_FINISHED = metrics.counter("pdf2md_tasks_finished_total", "已结束的任务数", labelnames=("status",))
+TASKS_BY_STATUS = metrics.gauge("pdf2md_tasks", "当前各状态的任务数", labelnames=("status",))
+EXECUTOR_PENDING = metrics.gauge("pdf2md_executor_pending", "执行器排队和执行中的任务数", labelnames=("pool",))
+DECODE_SEQUENCES = metrics.gauge("pdf2md_decode_sequences", "连续批处理调度器中的序列数", labelnames=("state",))
+CACHE_HIT_RATIO = metrics.gauge("pdf2md_cache_hit_ratio", "缓存命中率", labelnames=("cache",))
+CACHE_LOOKUPS = metrics.gauge("pdf2md_cache_lookups", "缓存查询次数", labelnames=("cache", "result"))
+MODEL_LOAD_SECONDS = metrics.gauge("pdf2md_model_load_seconds", "模型加载耗时（秒）")
+PROCESS_RSS = metrics.gauge("process_resident_memory_bytes", "进程常驻内存（字节）")
+
+
+def observe_stage(stage: str, seconds: float):
+    """记录流水线阶段耗时（在流水线线程中调用）"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def observe_generation(stats: Dict[str, Any]):
+    """记录一次 generate 的耗时和token统计（在推理线程中调用）"""
+    if stats.get("decode_steps") is not None:
+        STAGE_SECONDS.observe(stats["vision_ms"] / 1000, stage="vision")
+        STAGE_SECONDS.observe(stats["prefill_ms"] / 1000, stage="prefill")
+        STAGE_SECONDS.observe(stats["decode_ms"] / 1000, stage="decode")
+    GENERATED_TOKENS.inc(sum(stats["generated_tokens"]))
+    for count in stats["vision_tokens"]:
+        VISION_TOKENS.observe(count)
+
+
+def collect_metrics():
+    """抓取 /metrics 时刷新瞬时值"""
+    counts = tasks.count_by_status()
+    for status in ("queued", "processing", "completed", "failed"):
+        TASKS_BY_STATUS.set(counts.get(status, 0), status=status)
+    
+    executor_stats = executor.get_stats()
+    for pool, pending in executor_stats["pending"].items():
+        EXECUTOR_PENDING.set(pending, pool=pool)
+    
+    if scheduler is not None:
+        scheduler_stats = scheduler.get_stats()
+        DECODE_SEQUENCES.set(scheduler_stats["active"], state="active")
+        DECODE_SEQUENCES.set(scheduler_stats["waiting"], state="waiting")
+    
+    caches = {"conversion": conversion_cache.get_stats()}
+    if page_cache is not None:
+        caches["page"] = page_cache.get_stats()
+    if vision_cache is not None:
+        caches["vision"] = vision_cache.get_stats()
+    if prefix_cache is not None:
+        caches["prefix"] = prefix_cache.get_stats()
+    for name, stats in caches.items():
+        CACHE_HIT_RATIO.set(stats["hit_rate"] or 0, cache=name)
+        CACHE_LOOKUPS.set(stats["hits"], cache=name, result="hit")
+        CACHE_LOOKUPS.set(stats["misses"], cache=name, result="miss")
+    
+    if ocr_processor is not None and ocr_processor.load_seconds is not None:
+        MODEL_LOAD_SECONDS.set(round(ocr_processor.load_seconds, 3))
+    PROCESS_RSS.set(process_rss_bytes())
+
+
+metrics.add_collector(collect_metrics)
 
 
 def get_ocr_processor():
     """获取OCR处理器实例（延迟加载）"""
     global ocr_processor
     if ocr_processor is None:
-        ocr_processor = OCRProcessor()
+        ocr_processor = OCRProcessor(
+            batch_size=int(os.environ.get("OCR_BATCH_SIZE", "1")),
+            page_cache=page_cache,
+            compile_decode=os.environ.get("COMPILE_DECODE", "0") == "1",
+            compile_cache_dir=os.environ.get("COMPILE_CACHE_DIR", str(BASE_DIR / "cache" / "compile")),
+            quantization=os.environ.get("QUANTIZATION", "none"),
+            quantization_cache_dir=os.environ.get("QUANTIZATION_CACHE_DIR") or None,
+            vision_quantization=os.environ.get("VISION_QUANTIZATION", "none"),
+            stop_on_repetition=os.environ.get("STOP_ON_REPETITION", "1") != "0",
+            page_time_budget=float(os.environ.get("PAGE_TIME_BUDGET_SECONDS", "0")),
+            vision_cache=vision_cache,
+            prefix_cache=prefix_cache
+        )
+        ocr_processor.generation_observer = observe_generation
     return ocr_processor
 
 
-async def process_pdf_task(task_id: str, pdf_path: str):
+def get_scheduler() -> Optional[ContinuousBatchScheduler]:
+    """获取连续批处理调度器（未启用时返回None）"""
+    global scheduler
+    if CONTINUOUS_BATCHING and scheduler is None:
+        scheduler = ContinuousBatchScheduler(get_ocr_processor(), max_batch_size=CONTINUOUS_BATCH_SIZE)
+    return scheduler
+
+
+def write_json(path: Path, data: Any):
+    """
+    将数据写入JSON文件
+    
+    Args:
+        path: 文件路径
+        data: 可序列化的数据
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def conversion_settings(task_type: str = "ocr") -> Dict[str, Any]:
+    """
+    影响转换输出的处理参数（参与转换缓存键计算）
+    
+    Args:
+        task_type: 任务类型
+        
+    Returns:
+        参数字典
+    """
+    processor = get_ocr_processor()
+    return {
+        "dpi": pdf_processor.dpi,
+        "text_layer": pdf_processor.use_text_layer and {
+            "min_text_chars": pdf_processor.min_text_chars,
+            "max_image_coverage": pdf_processor.max_image_coverage,
+            "max_invalid_char_ratio": pdf_processor.max_invalid_char_ratio,
+        },
+        "page_classifier": page_classifier.thresholds if page_classifier is not None else None,
+        "task_type": task_type,
+        "prompt": processor.PROMPTS[task_type],
+        "model_revision": processor.model_revision(),
+        "inference_variant": processor.inference_variant(),
+        "max_new_tokens": processor.max_new_tokens,
+    }
+
+
+# 各任务类型的转换参数（首次计算后复用，模型版本与推理配置在进程内不变）
+conversion_settings_cache: Dict[str, Dict[str, Any]] = {}
+
+
+async def get_conversion_settings(task_type: str = "ocr") -> Dict[str, Any]:
+    """
+    获取转换参数（首次计算需要创建OCR处理器并哈希模型配置文件，放在渲染线程池中执行，不阻塞事件循环）
+    
+    Args:
+        task_type: 任务类型
+        
+    Returns:
+        参数字典
+        
+    Raises:
+        HTTPException: 推理配置无效（如量化方式与设备不匹配）时返回503
+    """
+    settings = conversion_settings_cache.get(task_type)
+    if settings is None:
+        try:
+            settings = await executor.run_render(conversion_settings, task_type)
+        except ValueError as e:
+            raise HTTPException(status_code=503, detail=f"推理配置无效: {e}")
+        conversion_settings_cache[task_type] = settings
+    return settings
+
+
+def materialize_cached_result(task_id: str, cache_key: str, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    将缓存条目复制为新任务的输出，并改写元数据中的任务ID和文件路径
+    
+    Args:
+        task_id: 新任务ID
+        cache_key: 缓存键
+        entry: 缓存条目元数据
+        
+    Returns:
+        新任务的元数据，条目已失效时返回None
+    """
+    output_dir = OUTPUT_DIR / task_id
+    if not conversion_cache.materialize(cache_key, str(output_dir)):
+        return None
+    
+    metadata_path = output_dir / "metadata.json"
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    
+    def relocate(path: str) -> str:
+        return str(Path(task_id, *Path(path).parts[1:]))
+    
+    files = metadata["files"]
+    metadata["task_id"] = task_id
+    metadata["files"] = {
+        "markdown": relocate(files["markdown"]),
+        "ocr_json": relocate(files["ocr_json"]),
+        "images": [relocate(p) for p in files["images"]]
+    }
+    metadata["cache"] = {
+        "hit": True,
+        "key": cache_key,
+        "source_task_id": entry["source_task_id"]
+    }
+    write_json(metadata_path, metadata)
+    return metadata
+
+
+async def process_pdf_task(task_id: str, pdf_path: str, cache_key: Optional[str] = None):
     """
     异步处理PDF任务
     
+    所有阻塞工作（渲染、推理、文件写入）都交给执行器，
+    事件循环只负责更新任务状态，保证状态查询和健康检查接口及时响应。
+    
     Args:
         task_id: 任务ID
         pdf_path: PDF文件路径
+        cache_key: 转换缓存键（全部页面识别成功时写入缓存）
     """
-    # 初始化日志列表
-    tasks[task_id]["logs"] = []
-    
     def add_log(message: str):
         """添加日志消息"""
-        import datetime
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        timestamp = datetime.now().strftime("%H:%M:%S")
         log_entry = f"[{timestamp}] {message}"
-        tasks[task_id]["logs"].append(log_entry)
+        tasks.append_log(task_id, log_entry)
         print(log_entry)
     
     try:
         # 更新任务状态
-        tasks[task_id]["status"] = "processing"
-        tasks[task_id]["progress"] = 5
-        tasks[task_id]["message"] = "开始处理..."
+        tasks.update(
+            task_id,
+            status="processing",
+            progress=5,
+            message="开始处理..."
+        )
         add_log("✓ 任务开始处理")
         
-        tasks[task_id]["progress"] = 10
-        tasks[task_id]["message"] = "正在转换PDF为图片..."
-        add_log("📄 开始转换PDF为图片...")
-        
         # 创建输出目录
         output_dir = OUTPUT_DIR / task_id
         pages_dir = output_dir / "pages"
         pages_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 步骤1: PDF转图片
         add_log(f"  - 输出目录: {pages_dir}")
-        image_paths = pdf_processor.pdf_to_images(pdf_path, str(pages_dir))
-        add_log(f"✓ PDF转换完成，共 {len(image_paths)} 页")
-        tasks[task_id]["progress"] = 30
-        tasks[task_id]["message"] = f"已转换 {len(image_paths)} 页为图片"
-        
-        # 步骤2: OCR识别
-        tasks[task_id]["progress"] = 35
-        tasks[task_id]["message"] = "正在加载OCR模型..."
+        
+        # 步骤1: 加载OCR模型
+        tasks.update(
+            task_id,
+            progress=10,
+            message="正在加载OCR模型..."
+        )
         add_log("🤖 正在加载OCR模型...")
         
         processor = get_ocr_processor()
+        await executor.run_inference(processor.load_model)
         add_log("✓ OCR模型加载完成")
         
-        tasks[task_id]["progress"] = 40
-        tasks[task_id]["message"] = f"正在识别第 1/{len(image_paths)} 页..."
-        add_log(f"📝 开始OCR识别，共 {len(image_paths)} 页")
-        
-        # 批量处理，带进度更新
-        ocr_results = []
-        for idx, img_path in enumerate(image_paths, 1):
-            progress = 40 + int((idx / len(image_paths)) * 30)
-            tasks[task_id]["progress"] = progress
-            tasks[task_id]["message"] = f"正在识别第 {idx}/{len(image_paths)} 页..."
-            add_log(f"  - 处理第 {idx}/{len(image_paths)} 页: {Path(img_path).name}")
-            
+        # 步骤2: 渲染 → 预处理 → OCR 流水线
+        # 渲染和预处理在流水线线程中进行，推理在专用推理线程中进行
+        tasks.update(
+            task_id,
+            progress=15,
+            message="正在渲染并识别页面..."
+        )
+        batch_scheduler = get_scheduler()
+        if batch_scheduler is not None:
+            add_log(f"📝 开始流水线处理 (连续批处理, 解码批上限 {batch_scheduler.max_batch_size}, "
+                    f"队列容量 {PIPELINE_QUEUE_SIZE})")
+        else:
+            add_log(f"📝 开始流水线处理 (批大小 {processor.batch_size}, 队列容量 {PIPELINE_QUEUE_SIZE})")
+        if page_classifier is not None:
+            add_log(f"  - 页面分类阈值: {json.dumps(page_classifier.thresholds, ensure_ascii=False)}")
+        
+        pages_done = []
+        
+        def on_page(page_index: int, total: int, result: Dict[str, Any]):
+            """单页识别完成（在事件循环线程执行）"""
+            pages_done.append(page_index)
+            done = len(pages_done)
+            tasks.update(
+                task_id,
+                progress=15 + int((done / total) * 55),
+                message=f"已识别 {done}/{total} 页..."
+            )
+            name = Path(result["image_path"]).name if result.get("image_path") else f"第{page_index + 1}页"
+            if "error" in result:
+                add_log(f"  ✗ {name} 识别失败: {result['error']}")
+            elif result.get("route") == "text":
+                add_log(f"  ✓ {name} 文本层直出 ({len(result['result'])} 字符)")
+            elif result.get("route") in ("blank", "picture"):
+                page_class = result["routing"]["page_class"]
+                add_log(
+                    f"  ✓ {name} 判定为{'空白页' if result['route'] == 'blank' else '纯图片页'}，跳过推理 "
+                    f"(墨迹 {page_class['ink_density']}, 边缘 {page_class['edge_density']}, "
+                    f"字符连通域 {page_class.get('text_components', 0)})"
+                )
+            elif result.get("truncated"):
+                reason = result["truncated"]["reason"]
+                TRUNCATED_PAGES.inc(reason=reason)
+                add_log(f"  ⚠️ {name} 识别结果被截断 ({TRUNCATION_REASONS.get(reason, reason)}，"
+                        f"{len(result['result'])} 字符)")
+            else:
+                add_log(f"  ✓ {name} 识别成功 ({len(result['result'])} 字符)")
+        
+        pipeline = PagePipeline(
+            pdf_processor,
+            processor,
+            task_type="ocr",
+            queue_size=PIPELINE_QUEUE_SIZE,
+            page_classifier=page_classifier,
+            stage_observer=observe_stage,
+            scheduler=batch_scheduler
+        )
+        loop = asyncio.get_running_loop()
+        # 连续批处理时模型只由调度器线程调用，流水线可以在 pipeline 线程池中并行运行
+        run_pipeline = executor.run_pipeline if batch_scheduler is not None else executor.run_inference
+        ocr_results = await run_pipeline(
+            pipeline.run, pdf_path, str(pages_dir), executor.bind_loop(loop, on_page)
+        )
+        image_paths = [r["image_path"] for r in ocr_results if r.get("image_path")]
+        for result in ocr_results:
+            route = "error" if "error" in result else result.get("route", "ocr")
+            PAGES.inc(route="cached" if result.get("cached") else route)
+        
+        pipeline_stats = pipeline.get_stats()
+        for stage, stats in pipeline_stats.items():
+            add_log(
+                f"  - 阶段 {stage}: {stats['processed']} 页, 忙碌 {stats['busy_seconds']}s, "
+                f"停顿 {stats['stall_seconds']}s"
+            )
+        
+        # 生成标注图片（渲染线程池）
+        for result in ocr_results:
+            if "error" in result:
+                continue
+            img_path = result["image_path"]
+            annotated_path = pages_dir / f"{Path(img_path).stem}_annotated.jpg"
             try:
-                result = processor.process_image(img_path, task_type="ocr")
-                annotated_path = pages_dir / f"{Path(img_path).stem}_annotated.jpg"
-                processor.create_annotated_image(img_path, result, str(annotated_path))
+                await executor.run_render(
+                    processor.create_annotated_image, img_path, result, str(annotated_path)
+                )
                 result["annotated_image"] = str(annotated_path)
-                ocr_results.append(result)
-                add_log(f"    ✓ 识别成功 ({len(result['result'])} 字符)")
             except Exception as e:
-                add_log(f"    ✗ 识别失败: {str(e)}")
-                ocr_results.append({"image_path": img_path, "error": str(e)})
+                add_log(f"  ⚠️ {Path(img_path).name} 标注图片生成失败: {str(e)}")
         
         add_log(f"✓ OCR识别完成，成功 {len([r for r in ocr_results if 'error' not in r])}/{len(image_paths)} 页")
         
-        tasks[task_id]["progress"] = 70
-        tasks[task_id]["message"] = "OCR识别完成，生成Markdown..."
+        # 本文档的页面缓存命中情况
+        page_cache_hits = len([r for r in ocr_results if r.get("cached")])
+        page_cache_stats = {
+            "enabled": page_cache is not None,
+            "hits": page_cache_hits,
+            "pages": len(ocr_results),
+            "hit_rate": round(page_cache_hits / len(ocr_results), 3) if ocr_results else None
+        }
+        if page_cache_hits:
+            add_log(f"  - 页面缓存命中 {page_cache_hits}/{len(ocr_results)} 页")
+        
+        tasks.update(
+            task_id,
+            progress=70,
+            message="OCR识别完成，生成Markdown..."
+        )
         add_log("📋 开始生成Markdown文档...")
         
         # 步骤3: 生成Markdown
         pdf_name = Path(pdf_path).stem
         generator = MarkdownGenerator()
         add_log("  - 解析OCR结果...")
-        markdown_content = generator.generate_from_ocr_results(ocr_results, pdf_name)
+        markdown_start = time.perf_counter()
+        markdown_content = await executor.run_render(
+            generator.generate_from_ocr_results, ocr_results, pdf_name
+        )
+        STAGE_SECONDS.observe(time.perf_counter() - markdown_start, stage="markdown")
         add_log(f"  - 生成Markdown文档 ({len(markdown_content)} 字符)")
         
         # 保存Markdown文件
         md_path = output_dir / "document.md"
-        generator.save_to_file(str(md_path))
+        await executor.run_render(generator.save_to_file, str(md_path))
         add_log(f"✓ Markdown已保存: {md_path.name}")
         
         # 保存OCR结果JSON
         json_path = output_dir / "ocr_results.json"
-        processor.save_results(ocr_results, str(json_path))
+        await executor.run_render(processor.save_results, ocr_results, str(json_path))
         add_log(f"✓ OCR结果已保存: {json_path.name}")
         
         # 生成元数据
@@ -173,12 +557,20 @@ async def process_pdf_task(task_id: str, pdf_path: str):
         add_log(f"  - 总页数: {summary['total_pages']}")
         add_log(f"  - 成功页数: {summary['successful_pages']}")
         add_log(f"  - 识别字符数: {summary['total_characters']}")
+        add_log(f"  - 页面路由: {', '.join(f'{k}={v}' for k, v in summary['routes'].items())}")
+        if summary["timings"]:
+            slowest = summary["timings"]["slowest_pages"][0]
+            add_log(f"  - 最慢页面: 第{slowest['page']}页 ({slowest['route']}, {slowest['total_ms']:.0f} ms)")
+        if summary["truncated_pages"]:
+            add_log(f"  - 截断页面: {', '.join(str(item['page']) for item in summary['truncated_pages'])}")
         
         metadata = {
             "task_id": task_id,
             "pdf_name": pdf_name,
             "processed_at": datetime.now().isoformat(),
             "summary": summary,
+            "pipeline": pipeline_stats,
+            "page_cache": page_cache_stats,
             "files": {
                 "markdown": str(md_path.relative_to(OUTPUT_DIR)),
                 "ocr_json": str(json_path.relative_to(OUTPUT_DIR)),
@@ -187,24 +579,39 @@ async def process_pdf_task(task_id: str, pdf_path: str):
         }
         
         metadata_path = output_dir / "metadata.json"
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        await executor.run_render(write_json, metadata_path, metadata)
         add_log(f"✓ 元数据已保存: {metadata_path.name}")
         
+        # 写入转换缓存（有失败页或截断页时不缓存，避免固化偶发错误，截断页可换参数重试）
+        if cache_key and summary["failed_pages"] == 0 and not summary["truncated_pages"]:
+            stored = await executor.run_render(
+                conversion_cache.store, cache_key, str(output_dir), task_id
+            )
+            if stored:
+                add_log("✓ 转换结果已写入缓存")
+        
         # 任务完成
         add_log("=" * 50)
         add_log("🎉 处理完成！")
         add_log(f"✓ 输出目录: {output_dir}")
-        tasks[task_id]["status"] = "completed"
-        tasks[task_id]["progress"] = 100
-        tasks[task_id]["message"] = "处理完成！"
-        tasks[task_id]["result"] = metadata
+        TASKS_FINISHED.inc(status="completed")
+        tasks.update(
+            task_id,
+            status="completed",
+            progress=100,
+            message="处理完成！",
+            result=metadata
+        )
         
     except Exception as e:
         add_log(f"✗ 处理失败: {str(e)}")
-        tasks[task_id]["status"] = "failed"
-        tasks[task_id]["message"] = f"处理失败: {str(e)}"
-        tasks[task_id]["error"] = str(e)
+        TASKS_FINISHED.inc(status="failed")
+        tasks.update(
+            task_id,
+            status="failed",
+            message=f"处理失败: {str(e)}",
+            error=str(e)
+        )
         print(f"任务 {task_id} 失败: {e}")
         import traceback
         traceback.print_exc()
@@ -229,6 +636,84 @@ async def root():
     """
 
 
+async def save_upload(file: UploadFile, dest_path: Path) -> str:
+    """
+    分块流式保存上传文件，边写边计算SHA-256，文件本身超过大小上限时中止
+    （请求体在解析前已由 UploadSizeLimitMiddleware 限制，这里按文件内容精确检查）
+    
+    每次只在内存中保留一个分块，内存占用与文件大小无关。
+    文件先写入 .part 临时文件，完整写入后再重命名为目标路径。
+    
+    Args:
+        file: 上传的文件
+        dest_path: 目标路径
+        
+    Returns:
+        文件内容的SHA-256（十六进制）
+    """
+    part_path = dest_path.with_name(dest_path.name + ".part")
+    digest = hashlib.sha256()
+    size = 0
+    
+    try:
+        async with aiofiles.open(part_path, 'wb') as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0 and not chunk.startswith(b"%PDF-"):
+                    raise HTTPException(status_code=400, detail="文件内容不是有效的PDF")
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"文件超过大小上限 {MAX_UPLOAD_BYTES // 1024 ** 2} MB"
+                    )
+                digest.update(chunk)
+                await f.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="上传的文件为空")
+        part_path.replace(dest_path)
+    except HTTPException:
+        part_path.unlink(missing_ok=True)
+        raise
+    except Exception as e:
+        part_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
+    
+    return digest.hexdigest()
+
+
+async def preflight_pdf(pdf_path: Path) -> int:
+    """
+    上传后预检：打开PDF读取页数，拒绝损坏文件和超过页数上限的文件
+    
+    Args:
+        pdf_path: PDF文件路径
+        
+    Returns:
+        页数
+    """
+    try:
+        page_count = await executor.run_render(pdf_processor.get_page_count, str(pdf_path))
+    except Exception as e:
+        pdf_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail=f"无法解析PDF文件: {str(e)}")
+    
+    if page_count == 0:
+        pdf_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="PDF文件没有页面")
+    
+    if MAX_PDF_PAGES and page_count > MAX_PDF_PAGES:
+        pdf_path.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=413,
+            detail=f"PDF共 {page_count} 页，超过页数上限 {MAX_PDF_PAGES}"
+        )
+    
+    return page_count
+
+
 @app.post("/api/upload")
 async def upload_pdf(
     background_tasks: BackgroundTasks,
@@ -247,36 +732,61 @@ async def upload_pdf(
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="只支持PDF文件")
     
+    # 请求体大小已由 UploadSizeLimitMiddleware 在表单解析之前限制
+    
     # 生成任务ID
     task_id = str(uuid.uuid4())
     
-    # 保存上传的文件
+    # 保存上传的文件（分块写盘，同时计算哈希）
     pdf_path = UPLOAD_DIR / f"{task_id}.pdf"
+    content_sha256 = await save_upload(file, pdf_path)
+    page_count = await preflight_pdf(pdf_path)
     
-    try:
-        async with aiofiles.open(pdf_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
+    # 查询转换缓存：命中时直接由缓存输出生成已完成的任务
+    cache_key = ConversionCache.make_key(content_sha256, await get_conversion_settings())
+    entry = await executor.run_render(conversion_cache.lookup, cache_key)
+    if entry is not None:
+        metadata = await executor.run_render(materialize_cached_result, task_id, cache_key, entry)
+        if metadata is not None:
+            tasks.create({
+                "task_id": task_id,
+                "filename": file.filename,
+                "status": "completed",
+                "progress": 100,
+                "message": "处理完成！（命中转换缓存）",
+                "created_at": datetime.now().isoformat(),
+                "result": metadata
+            })
+            tasks.append_log(
+                task_id,
+                f"[{datetime.now().strftime('%H:%M:%S')}] ⚡ 命中转换缓存，复用任务 {entry['source_task_id']} 的结果"
+            )
+            return JSONResponse({
+                "success": True,
+                "task_id": task_id,
+                "cached": True,
+                "page_count": page_count,
+                "message": "文件上传成功，已命中转换缓存"
+            })
     
     # 创建任务记录
-    tasks[task_id] = {
+    tasks.create({
         "task_id": task_id,
         "filename": file.filename,
         "status": "queued",
         "progress": 0,
         "message": "任务已创建，等待处理...",
-        "created_at": datetime.now().isoformat(),
-        "logs": []  # 初始化日志列表
-    }
+        "created_at": datetime.now().isoformat()
+    })
     
     # 添加后台任务
-    background_tasks.add_task(process_pdf_task, task_id, str(pdf_path))
+    background_tasks.add_task(process_pdf_task, task_id, str(pdf_path), cache_key)
     
     return JSONResponse({
         "success": True,
         "task_id": task_id,
+        "cached": False,
+        "page_count": page_count,
         "message": "文件上传成功，开始处理..."
     })
 
@@ -292,10 +802,113 @@ async def get_task_status(task_id: str):
     Returns:
         任务状态信息
     """
-    if task_id not in tasks:
+    task = tasks.get(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    return JSONResponse(tasks[task_id])
+    return JSONResponse(task)
+
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """
+    格式化一条Server-Sent Event
+    
+    Args:
+        event: 事件类型
+        data: 事件数据
+        event_id: 事件ID（客户端重连时通过 Last-Event-ID 回传）
+        
+    Returns:
+        SSE文本
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@app.get("/api/tasks/{task_id}/events")
+async def task_events_stream(
+    task_id: str,
+    request: Request,
+    cursor: int = Query(0, ge=0),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    以Server-Sent Events推送任务进度
+    
+    每个事件只携带状态、进度、消息以及游标之后的新日志，事件ID即日志游标。
+    断线重连时浏览器自动回传 Last-Event-ID，也可以通过 ?cursor= 显式指定续传位置。
+    任务结束时发送 done 事件（附带结果或错误信息）后关闭连接。
+    
+    Args:
+        task_id: 任务ID
+        cursor: 已接收的日志条数
+        last_event_id: 浏览器重连时回传的最后事件ID
+        
+    Returns:
+        text/event-stream 响应
+    """
+    if tasks.get(task_id, include_logs=False) is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    if last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+    
+    async def event_stream():
+        log_cursor = cursor
+        changed = task_events.subscribe(task_id)
+        try:
+            while True:
+                # 先清除再读取，读取之后发生的变更一定会再次唤醒
+                changed.clear()
+                task = tasks.get(task_id, include_logs=False)
+                if task is None:
+                    yield format_sse("error", {"message": "任务不存在"})
+                    return
+                
+                new_logs = tasks.get_logs(task_id, after=log_cursor)
+                if new_logs:
+                    log_cursor = new_logs[-1][0]
+                
+                payload = {
+                    "status": task["status"],
+                    "progress": task["progress"],
+                    "message": task["message"],
+                    "logs": [line for _, line in new_logs],
+                    "cursor": log_cursor
+                }
+                
+                if task["status"] in ("completed", "failed"):
+                    payload["result"] = task.get("result")
+                    payload["error"] = task.get("error")
+                    yield format_sse("done", payload, log_cursor)
+                    return
+                
+                yield format_sse("progress", payload, log_cursor)
+                
+                # 等待任务变更，超时则发送心跳注释
+                while True:
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=SSE_HEARTBEAT_SECONDS)
+                        break
+                    except asyncio.TimeoutError:
+                        if await request.is_disconnected():
+                            return
+                        yield ": keep-alive\n\n"
+        finally:
+            task_events.unsubscribe(task_id, changed)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
 
 @app.get("/api/download/{task_id}/markdown")
@@ -309,10 +922,11 @@ async def download_markdown(task_id: str):
     Returns:
         Markdown文件
     """
-    if task_id not in tasks:
+    task = tasks.get(task_id, include_logs=False)
+    if task is None:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    if tasks[task_id]["status"] != "completed":
+    if task["status"] != "completed":
         raise HTTPException(status_code=400, detail="任务尚未完成")
     
     md_path = OUTPUT_DIR / task_id / "document.md"
@@ -322,7 +936,7 @@ async def download_markdown(task_id: str):
     
     return FileResponse(
         path=str(md_path),
-        filename=f"{tasks[task_id]['filename'].replace('.pdf', '')}.md",
+        filename=f"{task['filename'].replace('.pdf', '')}.md",
         media_type="text/markdown"
     )
 
@@ -339,7 +953,7 @@ async def download_image(task_id: str, filename: str):
     Returns:
         图片文件
     """
-    if task_id not in tasks:
+    if tasks.get(task_id, include_logs=False) is None:
         raise HTTPException(status_code=404, detail="任务不存在")
     
     img_path = OUTPUT_DIR / task_id / "pages" / filename
@@ -355,16 +969,31 @@ async def download_image(task_id: str, filename: str):
 
 
 @app.get("/api/tasks")
-async def list_tasks():
+async def list_tasks(
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None
+):
     """
-    列出所有任务
+    按创建时间倒序分页列出任务（不含日志）
     
+    Args:
+        status: 按状态过滤（queued / processing / completed / failed）
+        limit: 每页数量
+        cursor: 上一页返回的 next_cursor（省略表示第一页）
+        
     Returns:
-        任务列表
+        任务列表与下一页游标（没有更多任务时为null）
     """
+    try:
+        items, total, next_cursor = tasks.list(status=status, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return JSONResponse({
-        "tasks": list(tasks.values()),
-        "total": len(tasks)
+        "tasks": items,
+        "total": total,
+        "limit": limit,
+        "next_cursor": next_cursor
     })
 
 
@@ -379,7 +1008,7 @@ async def delete_task(task_id: str):
     Returns:
         删除结果
     """
-    if task_id not in tasks:
+    if tasks.get(task_id, include_logs=False) is None:
         raise HTTPException(status_code=404, detail="任务不存在")
     
     # 删除文件
@@ -393,7 +1022,7 @@ async def delete_task(task_id: str):
         shutil.rmtree(output_dir)
     
     # 删除任务记录
-    del tasks[task_id]
+    tasks.delete(task_id)
     
     return JSONResponse({
         "success": True,
@@ -413,10 +1042,67 @@ async def health_check():
         "status": "healthy",
         "service": "PDF to Markdown Converter",
         "version": "1.0.0",
-        "tasks_count": len(tasks)
+        "tasks_count": tasks.count(),
+        "event_subscribers": task_events.subscriber_count(),
+        "conversion_cache": conversion_cache.get_stats(),
+        "page_cache": page_cache.get_stats() if page_cache is not None else None,
+        "vision_cache": vision_cache.get_stats() if vision_cache is not None else None,
+        "prefix_cache": prefix_cache.get_stats() if prefix_cache is not None else None,
+        "executor": executor.get_stats(),
+        "scheduler": scheduler.get_stats() if scheduler is not None else None
     })
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Prometheus 指标
+    
+    Returns:
+        Prometheus 文本格式（version 0.0.4）
+    """
+    return PlainTextResponse(
+        metrics.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.on_event("startup")
+async def bind_task_events():
+    """将任务事件中心绑定到服务事件循环"""
+    task_events.bind(asyncio.get_running_loop())
+
+
+@app.on_event("startup")
+async def recover_interrupted_tasks():
+    """服务启动时将上次运行中断的任务标记为失败（后台任务不会跨进程恢复）"""
+    interrupted = tasks.fail_interrupted("服务重启，任务已中断，请重新上传")
+    if interrupted:
+        print(f"⚠️ {interrupted} 个未完成任务因服务重启被标记为失败")
+
+
+@app.on_event("startup")
+async def warm_conversion_settings():
+    """服务启动时预先计算转换参数，上传请求直接复用"""
+    try:
+        await get_conversion_settings()
+    except HTTPException as e:
+        print(f"✗ {e.detail}")
+
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    """服务关闭时释放执行器线程"""
+    executor.shutdown(wait=False)
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+    if ocr_processor is not None and ocr_processor.compiled_decoder is not None:
+        ocr_processor.compiled_decoder.save()
+    tasks.close()
+    if page_cache is not None:
+        page_cache.close()
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+编译解码基准
+在静态KV缓存下对比 eager 解码与 torch.compile 编译解码：
+1. 校验两种方式贪心解码生成的token序列一致
+2. 统计CPU上的解码吞吐（tokens/s），以及首次编译 / 从编译缓存加载的耗时
+
+用法:
+    python bench/compile_bench.py --model-path /path/to/paddleocr-vl --cache-dir /tmp/pdf2md-compile
+    python bench/compile_bench.py --tiny   # 随机权重微型模型
+    # 用同一个 --cache-dir 再运行一次，可以看到 first_generate_seconds 明显下降（编译缓存命中）
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from statistics import median
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import torch  # noqa: E402
+
+from converter.compiled_decode import CompiledDecoder  # noqa: E402
+from converter.ocr_processor import OCRProcessor  # noqa: E402
+from converter.tiny_model import create_tiny_model  # noqa: E402
+from kv_cache_bench import make_sample_page  # noqa: E402
+
+
+def run_mode(processor: OCRProcessor, inputs, repeats: int) -> dict:
+    """解码 1 + repeats 次：第一次包含编译耗时，其余取解码吞吐的中位数"""
+    prompt_len = inputs["input_ids"].shape[1]
+
+    start = time.perf_counter()
+    outputs, _ = processor.generate_with_stats(inputs)
+    first_seconds = time.perf_counter() - start
+    tokens = outputs[0, prompt_len:].tolist()
+
+    throughput = []
+    for _ in range(repeats):
+        _, stats = processor.generate_with_stats(inputs)
+        throughput.append(stats["decode_tokens_per_second"] or 0.0)
+
+    return {
+        "generated_tokens": len(tokens),
+        "first_generate_seconds": round(first_seconds, 3),
+        "decode_tokens_per_second": round(median(throughput), 2) if throughput else None,
+        "tokens": tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PaddleOCR-VL 编译解码基准")
+    parser.add_argument("--model-path", default="/personal/1102case/models/paddleocr-vl")
+    parser.add_argument("--image", default=None, help="输入图片（默认使用合成页面）")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--repeats", type=int, default=3, help="预热后的计时次数")
+    parser.add_argument("--cache-dir", default=None, help="编译缓存目录（默认使用临时目录）")
+    parser.add_argument("--output", default=None, help="结果JSON输出路径")
+    parser.add_argument("--tiny", action="store_true", help="使用随机权重的微型模型")
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if args.tiny:
+        model_path = create_tiny_model(tempfile.mkdtemp(prefix="paddleocr-vl-tiny-"))
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="pdf2md-compile-")
+
+    processor = OCRProcessor(
+        model_path=model_path,
+        cache_implementation="static",
+        max_new_tokens=args.max_new_tokens
+    )
+    processor.load_model()
+
+    image = Image.open(args.image).convert("RGB") if args.image else make_sample_page()
+    inputs = processor.prepare_inputs(image, "ocr")
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "device": processor.device,
+            "threads": torch.get_num_threads(),
+        },
+        "prompt_tokens": int(inputs["input_ids"].shape[1]),
+        "cache_dir": cache_dir,
+        "modes": {},
+    }
+
+    eager = run_mode(processor, inputs, args.repeats)
+
+    # 在同一个模型上安装编译包装器，保证两种模式使用完全相同的权重
+    processor.compiled_decoder = CompiledDecoder(processor.model.model, cache_dir)
+    compiled = run_mode(processor, inputs, args.repeats)
+    compiled["loaded_from_cache"] = processor.compiled_decoder.loaded_from_cache
+    compiled["compiled_steps"] = processor.compiled_decoder.compiled_steps
+    processor.compiled_decoder.save()
+
+    parity = compiled.pop("tokens") == eager.pop("tokens")
+    compiled["matches_eager"] = parity
+    report["modes"] = {"eager": eager, "compiled": compiled}
+    if eager["decode_tokens_per_second"] and compiled["decode_tokens_per_second"]:
+        report["speedup"] = round(compiled["decode_tokens_per_second"] / eager["decode_tokens_per_second"], 2)
+
+    for name, mode in report["modes"].items():
+        print(f"{name:>9}: first generate {mode['first_generate_seconds']}s, "
+              f"decode {mode['decode_tokens_per_second']} tok/s", file=sys.stderr)
+    print(f"parity={'OK' if parity else 'MISMATCH'}, speedup={report.get('speedup')}", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if not parity:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+连续批处理基准
+对比两种方式识别同一组尺寸各异的页面（视觉网格、提示词长度和 rope_delta 各不相同）：
+- sequential：逐页 process_prepared（每页一次 generate）
+- continuous：全部提交给 ContinuousBatchScheduler，页面结束即退出、空出的槽位立即接纳新页面
+
+输出：
+1. 一致性：贪心解码下两种方式每页的识别文本应完全一致（不一致时以非零状态退出）
+2. 总耗时、页面吞吐与调度器的平均解码批大小
+
+用法:
+    python bench/continuous_batching_bench.py --model-path /path/to/paddleocr-vl --pages 8 --batch-size 4
+    python bench/continuous_batching_bench.py --tiny --max-new-tokens 64
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from converter.ocr_processor import OCRProcessor  # noqa: E402
+from converter.scheduler import ContinuousBatchScheduler  # noqa: E402
+from converter.tiny_model import create_tiny_model  # noqa: E402
+from kv_cache_bench import make_sample_page  # noqa: E402
+
+
+def sample_pages(processor: OCRProcessor, count: int) -> list:
+    """生成 count 张尺寸各异的页面并完成视觉预处理"""
+    pages = []
+    for idx in range(count):
+        width = 600 + 80 * (idx % 4)
+        height = 700 + 120 * (idx % 3)
+        pages.append(processor.prepare_page(make_sample_page(width, height), "ocr"))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="连续批处理解码调度基准")
+    parser.add_argument("--model-path", default="/personal/1102case/models/paddleocr-vl")
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=4, help="调度器最大解码批大小")
+    parser.add_argument("--max-new-tokens", type=int, default=512)
+    parser.add_argument("--output", default=None, help="结果JSON输出路径")
+    parser.add_argument("--tiny", action="store_true", help="使用随机权重的微型模型")
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if args.tiny:
+        model_path = create_tiny_model(tempfile.mkdtemp(prefix="paddleocr-vl-tiny-"))
+
+    processor = OCRProcessor(model_path=model_path, max_new_tokens=args.max_new_tokens)
+    processor.load_model()
+    pages = sample_pages(processor, args.pages)
+
+    print(f"sequential: {args.pages} pages...", file=sys.stderr)
+    start = time.perf_counter()
+    sequential = [processor.process_prepared([page], "ocr")[0] for page in pages]
+    sequential_seconds = time.perf_counter() - start
+
+    print(f"continuous: {args.pages} pages, batch {args.batch_size}...", file=sys.stderr)
+    scheduler = ContinuousBatchScheduler(processor, max_batch_size=args.batch_size)
+    try:
+        start = time.perf_counter()
+        futures = [scheduler.submit(page, "ocr") for page in pages]
+        continuous = [future.result() for future in futures]
+        continuous_seconds = time.perf_counter() - start
+        scheduler_stats = scheduler.get_stats()
+    finally:
+        scheduler.shutdown()
+
+    mismatched = [
+        idx for idx, (a, b) in enumerate(zip(sequential, continuous))
+        if a["result"] != b["result"]
+    ]
+    report = {
+        "settings": {
+            "model": "tiny" if args.tiny else model_path,
+            "pages": args.pages,
+            "batch_size": args.batch_size,
+            "max_new_tokens": args.max_new_tokens,
+        },
+        "generated_tokens": [result["generated_tokens"] for result in continuous],
+        "mismatched_pages": mismatched,
+        "sequential_seconds": round(sequential_seconds, 3),
+        "continuous_seconds": round(continuous_seconds, 3),
+        "speedup": round(sequential_seconds / continuous_seconds, 2),
+        "pages_per_second": {
+            "sequential": round(args.pages / sequential_seconds, 3),
+            "continuous": round(args.pages / continuous_seconds, 3),
+        },
+        "scheduler": scheduler_stats,
+    }
+    print(f"sequential {sequential_seconds:.2f}s, continuous {continuous_seconds:.2f}s "
+          f"({report['speedup']}x, avg batch {scheduler_stats['avg_batch_size']}), "
+          f"mismatched {len(mismatched)}/{args.pages}", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if mismatched:
+        print(f"✗ {len(mismatched)} 页的识别结果与逐页解码不一致", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
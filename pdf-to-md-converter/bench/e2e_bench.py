@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+端到端转换基准
+用合成PDF（纯文本 / 密集表格 / 多栏 / 扫描件）驱动完整链路：
+PDFProcessor 渲染 → SiglipImageProcessor 预处理 → OCRProcessor 推理 → MarkdownGenerator 生成，
+输出各阶段耗时（JSON）：
+- render_ms_per_page      渲染
+- preprocess_ms_per_page  视觉预处理
+- vision_ms_per_page      视觉编码器（SigLIP + 投影层）
+- prefill_ms_per_page     预填充
+- decode_tokens_per_second 解码吞吐
+- markdown_ms             Markdown生成
+- peak_rss_mb             进程峰值内存
+
+用法:
+    python bench/e2e_bench.py --model-path /path/to/paddleocr-vl --pages 2 --output bench_e2e.json
+    python bench/e2e_bench.py --tiny   # 随机权重微型模型，只看流水线开销
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from statistics import mean
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import torch  # noqa: E402
+
+from converter.pdf_processor import PDFProcessor  # noqa: E402
+from converter.ocr_processor import OCRProcessor  # noqa: E402
+from converter.markdown_generator import MarkdownGenerator  # noqa: E402
+from converter.profiling import peak_rss_mb  # noqa: E402
+from converter.tiny_model import create_tiny_model  # noqa: E402
+from synthetic_pdfs import DOCUMENT_KINDS, generate_pdf  # noqa: E402
+
+
+def bench_document(
+    pdf_path: str,
+    work_dir: Path,
+    pdf_processor: PDFProcessor,
+    ocr_processor: OCRProcessor
+) -> dict:
+    """对单个文档跑完整链路并统计各阶段耗时"""
+    render_ms, preprocess_ms, vision_ms, prefill_ms = [], [], [], []
+    decode_steps, decode_seconds = 0, 0.0
+    results = []
+
+    pages = pdf_processor.iter_pages(pdf_path, str(work_dir))
+    while True:
+        start = time.perf_counter()
+        try:
+            _, img_path, image = next(pages)
+        except StopIteration:
+            break
+        render_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        image_inputs = ocr_processor.preprocess_image(image)
+        preprocess_ms.append((time.perf_counter() - start) * 1000)
+
+        inputs = ocr_processor.prepare_batch_inputs([image_inputs], "ocr")
+        # 与服务端上报的统计口径一致（generate_with_stats 内部已安装前向钩子计时）
+        outputs, timing = ocr_processor.generate_with_stats(inputs)
+        vision_ms.append(timing["vision_ms"])
+        prefill_ms.append(timing["prefill_ms"])
+        decode_steps += timing["decode_steps"]
+        decode_seconds += timing["decode_ms"] / 1000
+
+        text = ocr_processor.processor.batch_decode(outputs, skip_special_tokens=True)[0]
+        results.append({
+            "image_path": img_path,
+            "task_type": "ocr",
+            "result": text,
+            "image_size": image.size
+        })
+
+    start = time.perf_counter()
+    MarkdownGenerator().generate_from_ocr_results(results, Path(pdf_path).stem)
+    markdown_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "pages": len(results),
+        "render_ms_per_page": round(mean(render_ms), 2),
+        "preprocess_ms_per_page": round(mean(preprocess_ms), 2),
+        "vision_ms_per_page": round(mean(vision_ms), 2),
+        "prefill_ms_per_page": round(mean(prefill_ms), 2),
+        "decode_tokens": decode_steps,
+        "decode_tokens_per_second": round(decode_steps / decode_seconds, 2) if decode_seconds > 0 else None,
+        "markdown_ms": round(markdown_ms, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF转Markdown端到端基准")
+    parser.add_argument("--model-path", default="/personal/1102case/models/paddleocr-vl")
+    parser.add_argument("--kinds", nargs="+", default=list(DOCUMENT_KINDS), choices=list(DOCUMENT_KINDS))
+    parser.add_argument("--pages", type=int, default=2, help="每份合成文档的页数")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--max-new-tokens", type=int, default=512)
+    parser.add_argument("--output", default=None, help="结果JSON输出路径（默认打印到标准输出）")
+    parser.add_argument("--tiny", action="store_true", help="使用随机权重的微型模型")
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if args.tiny:
+        model_path = create_tiny_model(tempfile.mkdtemp(prefix="paddleocr-vl-tiny-"))
+
+    # 基准只测量渲染+OCR链路，关闭文本层直出
+    pdf_processor = PDFProcessor(dpi=args.dpi, use_text_layer=False)
+    ocr_processor = OCRProcessor(model_path=model_path, max_new_tokens=args.max_new_tokens)
+
+    start = time.perf_counter()
+    ocr_processor.load_model()
+    load_seconds = time.perf_counter() - start
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "device": ocr_processor.device,
+            "threads": torch.get_num_threads(),
+        },
+        "settings": {
+            "model": "tiny" if args.tiny else model_path,
+            "dpi": args.dpi,
+            "pages_per_document": args.pages,
+            "max_new_tokens": args.max_new_tokens,
+        },
+        "model_load_seconds": round(load_seconds, 2),
+        "documents": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="pdf2md-bench-") as tmp:
+        tmp_dir = Path(tmp)
+        for kind in args.kinds:
+            pdf_path = generate_pdf(kind, str(tmp_dir / f"{kind}.pdf"), pages=args.pages)
+            stats = bench_document(pdf_path, tmp_dir / kind, pdf_processor, ocr_processor)
+            report["documents"][kind] = stats
+            print(f"{kind:>12}: render {stats['render_ms_per_page']} ms/page, "
+                  f"vision {stats['vision_ms_per_page']} ms, prefill {stats['prefill_ms_per_page']} ms, "
+                  f"decode {stats['decode_tokens_per_second']} tok/s", file=sys.stderr)
+
+    report["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
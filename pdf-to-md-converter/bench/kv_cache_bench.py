@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+KV缓存解码基准
+对比无缓存 / 动态缓存 / 静态缓存三种解码方式：
+1. 校验生成的token序列与无缓存解码完全一致（贪心解码下应逐token相同）
+2. 统计CPU上的解码吞吐（tokens/s）
+
+用法:
+    python bench/kv_cache_bench.py --model-path /path/to/paddleocr-vl [--image page.jpg]
+    python bench/kv_cache_bench.py --tiny   # 随机权重微型模型，CPU上秒级完成
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from converter.ocr_processor import OCRProcessor  # noqa: E402
+from converter.tiny_model import create_tiny_model  # noqa: E402
+
+
+def make_sample_page(width: int = 800, height: int = 1000) -> Image.Image:
+    """生成一张简单的文字页面用于基准测试"""
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    y = 40
+    for idx in range(20):
+        draw.text((40, y), f"Line {idx + 1}: The quick brown fox jumps over the lazy dog.", fill="black")
+        y += 40
+    return image
+
+
+def run_mode(processor: OCRProcessor, inputs, use_cache: bool, cache_implementation: str):
+    """按指定缓存模式解码一次，返回生成的token与耗时"""
+    processor.use_cache = use_cache
+    processor.cache_implementation = cache_implementation
+    start = time.perf_counter()
+    outputs = processor.generate(inputs)
+    elapsed = time.perf_counter() - start
+    prompt_len = inputs["input_ids"].shape[1]
+    generated = outputs[0, prompt_len:].tolist()
+    return generated, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PaddleOCR-VL KV缓存解码基准")
+    parser.add_argument("--model-path", default="/personal/1102case/models/paddleocr-vl")
+    parser.add_argument("--image", default=None, help="输入图片（默认使用合成页面）")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--output", default=None, help="结果JSON输出路径")
+    parser.add_argument("--tiny", action="store_true", help="使用随机权重的微型模型")
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if args.tiny:
+        model_path = create_tiny_model(tempfile.mkdtemp(prefix="paddleocr-vl-tiny-"))
+
+    processor = OCRProcessor(model_path=model_path, max_new_tokens=args.max_new_tokens)
+    processor.load_model()
+
+    image = Image.open(args.image).convert("RGB") if args.image else make_sample_page()
+    inputs = processor.prepare_inputs(image, "ocr")
+
+    modes = [
+        ("no_cache", False, "dynamic"),
+        ("dynamic_cache", True, "dynamic"),
+        ("static_cache", True, "static"),
+    ]
+
+    report = {"prompt_tokens": int(inputs["input_ids"].shape[1]), "modes": {}}
+    reference = None
+    for name, use_cache, cache_impl in modes:
+        tokens, elapsed = run_mode(processor, inputs, use_cache, cache_impl)
+        if reference is None:
+            reference = tokens
+        report["modes"][name] = {
+            "generated_tokens": len(tokens),
+            "seconds": round(elapsed, 3),
+            "tokens_per_second": round(len(tokens) / elapsed, 2) if elapsed > 0 else None,
+            "matches_no_cache": tokens == reference,
+        }
+        print(f"{name:>14}: {len(tokens)} tokens, {elapsed:.2f}s, "
+              f"{report['modes'][name]['tokens_per_second']} tok/s, "
+              f"parity={'OK' if tokens == reference else 'MISMATCH'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if not all(mode["matches_no_cache"] for mode in report["modes"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+图像前缀KV缓存基准
+同一页面依次用 ocr / table / formula / chart 四种提示词识别：
+- baseline：每个提示词都完整预填充（视觉编码 + 图像前缀 + 任务指令）
+- prefix：第一个提示词预填充图像前缀并保存KV快照，之后的提示词复制快照后只预填充任务指令
+
+输出每个提示词的视觉编码与预填充耗时、前缀快照占用，并校验两种方式的识别文本一致
+（不一致时以非零状态退出）。
+
+用法:
+    python bench/prefix_cache_bench.py --model-path /path/to/paddleocr-vl
+    python bench/prefix_cache_bench.py --tiny --max-new-tokens 32
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from converter.ocr_processor import OCRProcessor  # noqa: E402
+from converter.prefix_cache import PrefixKVCache  # noqa: E402
+from converter.tiny_model import create_tiny_model  # noqa: E402
+from kv_cache_bench import make_sample_page  # noqa: E402
+
+
+def run_prompts(processor: OCRProcessor, image: Image.Image) -> dict:
+    """逐个提示词识别同一页面，返回 {任务类型: 识别结果}"""
+    results = {}
+    for task_type in OCRProcessor.PROMPTS:
+        page = processor.prepare_page(image, task_type)
+        results[task_type] = processor.process_prepared([page], task_type)[0]
+    return results
+
+
+def stage_ms(result: dict, stage: str):
+    """识别结果中某阶段的墙钟耗时"""
+    return result["timings"].get(stage, {}).get("wall_ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图像前缀KV缓存基准")
+    parser.add_argument("--model-path", default="/personal/1102case/models/paddleocr-vl")
+    parser.add_argument("--image", default=None, help="输入图片（默认使用合成页面）")
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    parser.add_argument("--max-mb", type=float, default=512, help="前缀缓存占用上限（MB）")
+    parser.add_argument("--output", default=None, help="结果JSON输出路径")
+    parser.add_argument("--tiny", action="store_true", help="使用随机权重的微型模型")
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if args.tiny:
+        model_path = create_tiny_model(tempfile.mkdtemp(prefix="paddleocr-vl-tiny-"))
+    image = Image.open(args.image).convert("RGB") if args.image else make_sample_page()
+
+    processor = OCRProcessor(model_path=model_path, max_new_tokens=args.max_new_tokens)
+    processor.load_model()
+    baseline = run_prompts(processor, image)
+
+    processor.prefix_cache = PrefixKVCache(max_bytes=int(args.max_mb * 1024 ** 2))
+    prefixed = run_prompts(processor, image)
+
+    mismatched = [task for task in baseline if baseline[task]["result"] != prefixed[task]["result"]]
+    report = {
+        "settings": {
+            "model": "tiny" if args.tiny else model_path,
+            "image_size": list(image.size),
+            "max_new_tokens": args.max_new_tokens,
+        },
+        "stages_ms": {
+            task: {
+                "baseline": {"vision": stage_ms(baseline[task], "vision"), "prefill": stage_ms(baseline[task], "prefill")},
+                "prefix": {"vision": stage_ms(prefixed[task], "vision"), "prefill": stage_ms(prefixed[task], "prefill")},
+            }
+            for task in baseline
+        },
+        "cache": processor.prefix_cache.get_stats(),
+        "mismatched_prompts": mismatched,
+    }
+    for task, item in report["stages_ms"].items():
+        print(f"{task:>8}: vision+prefill "
+              f"{(item['baseline']['vision'] or 0) + (item['baseline']['prefill'] or 0):.1f} ms → "
+              f"{(item['prefix']['vision'] or 0) + (item['prefix']['prefill'] or 0):.1f} ms", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if mismatched:
+        print(f"✗ 复用前缀KV后识别结果不一致: {', '.join(mismatched)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
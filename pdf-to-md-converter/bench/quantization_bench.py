@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+量化精度基准
+用合成PDF对比 bf16 参考模型与 int8 动态量化模型：
+1. 字符错误率（CER）：两种模型各自相对PDF文本层（真值）的CER，以及量化结果相对参考结果的CER
+2. 逐页识别耗时与加速比
+
+量化后CER相对参考模型的增量超过 --tolerance 时以非零状态退出。
+
+用法:
+    python bench/quantization_bench.py --model-path /path/to/paddleocr-vl --pages 2
+    python bench/quantization_bench.py --tiny   # 随机权重微型模型，只验证流程
+"""
+
+import argparse
+import json
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from statistics import mean
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz  # noqa: E402
+
+from converter.pdf_processor import PDFProcessor  # noqa: E402
+from converter.ocr_processor import OCRProcessor  # noqa: E402
+from converter.tiny_model import create_tiny_model  # noqa: E402
+from synthetic_pdfs import DOCUMENT_KINDS, generate_pdf  # noqa: E402
+
+
+# 有文本层可作为真值的文档类型（扫描件只有图片）
+GROUND_TRUTH_KINDS = ("text", "table", "multicolumn")
+
+
+def normalize_text(text: str) -> str:
+    """去掉Markdown标记并合并空白，只比较文字内容"""
+    text = re.sub(r"<[^>]+>", " ", text)
+    text = re.sub(r"[#*|`_\-]+", " ", text)
+    return " ".join(text.split())
+
+
+def edit_distance(a: str, b: str) -> int:
+    """字符级编辑距离（逐行动态规划）"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def character_error_rate(hypothesis: str, reference: str) -> float:
+    """CER = 编辑距离 / 参考文本长度"""
+    hypothesis, reference = normalize_text(hypothesis), normalize_text(reference)
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    return edit_distance(hypothesis, reference) / len(reference)
+
+
+def recognize(processor: OCRProcessor, images) -> tuple:
+    """逐页识别，返回 (文本列表, 每页耗时秒列表)"""
+    texts, seconds = [], []
+    for image in images:
+        start = time.perf_counter()
+        texts.append(processor.process_image(image, "ocr")["result"])
+        seconds.append(time.perf_counter() - start)
+    return texts, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PaddleOCR-VL int8 动态量化精度基准")
+    parser.add_argument("--model-path", default="/personal/1102case/models/paddleocr-vl")
+    parser.add_argument("--kinds", nargs="+", default=list(DOCUMENT_KINDS), choices=list(DOCUMENT_KINDS))
+    parser.add_argument("--pages", type=int, default=1, help="每份合成文档的页数")
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--max-new-tokens", type=int, default=1024)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="允许的CER增量")
+    parser.add_argument("--cache-dir", default=None, help="量化权重缓存目录（默认使用临时目录）")
+    parser.add_argument("--output", default=None, help="结果JSON输出路径")
+    parser.add_argument("--tiny", action="store_true", help="使用随机权重的微型模型")
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if args.tiny:
+        model_path = create_tiny_model(tempfile.mkdtemp(prefix="paddleocr-vl-tiny-"))
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="pdf2md-quantized-")
+
+    reference = OCRProcessor(model_path=model_path, max_new_tokens=args.max_new_tokens)
+    quantized = OCRProcessor(
+        model_path=model_path,
+        max_new_tokens=args.max_new_tokens,
+        quantization="int8-dynamic",
+        quantization_cache_dir=cache_dir
+    )
+    reference.load_model()
+    quantized.load_model()
+    pdf_processor = PDFProcessor(dpi=args.dpi, use_text_layer=False)
+
+    report = {
+        "settings": {
+            "model": "tiny" if args.tiny else model_path,
+            "dpi": args.dpi,
+            "pages_per_document": args.pages,
+            "tolerance": args.tolerance,
+        },
+        "quantized_load_seconds": round(quantized.load_seconds, 2),
+        "documents": {},
+    }
+
+    worst_delta = 0.0
+    with tempfile.TemporaryDirectory(prefix="pdf2md-quant-bench-") as tmp:
+        tmp_dir = Path(tmp)
+        for kind in args.kinds:
+            pdf_path = generate_pdf(kind, str(tmp_dir / f"{kind}.pdf"), pages=args.pages)
+            images = [image for _, _, image in pdf_processor.iter_pages(pdf_path, str(tmp_dir / kind))]
+            with fitz.open(pdf_path) as doc:
+                truths = [page.get_text() for page in doc] if kind in GROUND_TRUTH_KINDS else None
+
+            ref_texts, ref_seconds = recognize(reference, images)
+            quant_texts, quant_seconds = recognize(quantized, images)
+
+            stats = {
+                "pages": len(images),
+                "cer_quantized_vs_reference": round(mean(
+                    character_error_rate(q, r) for q, r in zip(quant_texts, ref_texts)
+                ), 4),
+                "reference_seconds_per_page": round(mean(ref_seconds), 2),
+                "quantized_seconds_per_page": round(mean(quant_seconds), 2),
+                "speedup": round(mean(ref_seconds) / mean(quant_seconds), 2),
+            }
+            if truths is not None:
+                ref_cer = mean(character_error_rate(t, g) for t, g in zip(ref_texts, truths))
+                quant_cer = mean(character_error_rate(t, g) for t, g in zip(quant_texts, truths))
+                stats["cer_reference"] = round(ref_cer, 4)
+                stats["cer_quantized"] = round(quant_cer, 4)
+                worst_delta = max(worst_delta, quant_cer - ref_cer)
+            else:
+                # 无真值时以参考模型输出为准
+                worst_delta = max(worst_delta, stats["cer_quantized_vs_reference"])
+
+            report["documents"][kind] = stats
+            print(f"{kind:>12}: CER ref {stats.get('cer_reference', '-')}, "
+                  f"int8 {stats.get('cer_quantized', '-')}, "
+                  f"int8 vs ref {stats['cer_quantized_vs_reference']}, speedup {stats['speedup']}x",
+                  file=sys.stderr)
+
+    report["worst_cer_delta"] = round(worst_delta, 4)
+    report["within_tolerance"] = worst_delta <= args.tolerance
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if not report["within_tolerance"]:
+        print(f"✗ CER增量 {worst_delta:.4f} 超过容差 {args.tolerance}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+mRoPE 位置索引基准
+对比模型的两种 get_rope_index 实现：
+- reference：逐样本、逐图像的 Python 循环（get_rope_index_reference）
+- vectorized：整批张量运算，按图像网格形状缓存位置模板（get_rope_index）
+
+输入为合成的左填充批次：每个样本包含若干张网格大小各异的图像（vision_start + 图像token），
+图像之间夹着长度随机的文本。校验两种实现的 position_ids 与 rope_deltas 逐元素相同
+（不一致时以非零状态退出），并输出各批大小下的平均耗时。
+
+用法:
+    python bench/rope_index_bench.py --model-path /path/to/paddleocr-vl
+    python bench/rope_index_bench.py --tiny --batch-sizes 1 4 8
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from converter.ocr_processor import OCRProcessor  # noqa: E402
+from converter.tiny_model import create_tiny_model  # noqa: E402
+
+
+# 预处理后的图像网格 (t, h, w)，h、w 为 patch 数（合并前）
+SAMPLE_GRIDS = [(1, 28, 20), (1, 36, 28), (1, 44, 34), (1, 16, 64), (1, 8, 8)]
+
+
+def make_batch(config, batch_size: int, rng: random.Random):
+    """
+    构造一个左填充批次
+
+    Returns:
+        (input_ids, attention_mask, image_grid_thw)
+    """
+    merge = config.vision_config.spatial_merge_size
+    rows, grids = [], []
+    for _ in range(batch_size):
+        tokens = [rng.randrange(1000, 2000) for _ in range(rng.randint(1, 8))]
+        for _ in range(rng.randint(1, 2)):
+            grid = rng.choice(SAMPLE_GRIDS)
+            grids.append(grid)
+            tokens.append(config.vision_start_token_id)
+            tokens.extend([config.image_token_id] * (grid[0] * (grid[1] // merge) * (grid[2] // merge)))
+            tokens.extend(rng.randrange(1000, 2000) for _ in range(rng.randint(1, 12)))
+        rows.append(tokens)
+
+    length = max(len(row) for row in rows)
+    input_ids = torch.zeros(batch_size, length, dtype=torch.long)
+    attention_mask = torch.zeros(batch_size, length, dtype=torch.long)
+    for idx, row in enumerate(rows):
+        input_ids[idx, length - len(row):] = torch.tensor(row)
+        attention_mask[idx, length - len(row):] = 1
+    return input_ids, attention_mask, torch.tensor(grids, dtype=torch.long)
+
+
+def time_call(fn, repeats: int) -> float:
+    """平均单次耗时（ms）"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mRoPE 位置索引基准")
+    parser.add_argument("--model-path", default="/personal/1102case/models/paddleocr-vl")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--cases", type=int, default=20, help="每个批大小的随机批次数（用于一致性校验）")
+    parser.add_argument("--repeats", type=int, default=50, help="计时重复次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="结果JSON输出路径")
+    parser.add_argument("--tiny", action="store_true", help="使用随机权重的微型模型")
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if args.tiny:
+        model_path = create_tiny_model(tempfile.mkdtemp(prefix="paddleocr-vl-tiny-"))
+
+    processor = OCRProcessor(model_path=model_path)
+    processor.load_model()
+    model = processor.model
+    device = next(model.parameters()).device
+    rng = random.Random(args.seed)
+
+    mismatched = []
+    timings = {}
+    with torch.no_grad():
+        for batch_size in args.batch_sizes:
+            batches = [
+                tuple(t.to(device) for t in make_batch(model.config, batch_size, rng))
+                for _ in range(args.cases)
+            ]
+            for case, (input_ids, attention_mask, grid) in enumerate(batches):
+                expected = model.get_rope_index_reference(input_ids, grid, None, None, attention_mask)
+                actual = model.get_rope_index(input_ids, grid, None, None, attention_mask)
+                if not all(torch.equal(a, b) for a, b in zip(expected, actual)):
+                    mismatched.append({"batch_size": batch_size, "case": case})
+
+            input_ids, attention_mask, grid = batches[0]
+            reference_ms = time_call(
+                lambda: model.get_rope_index_reference(input_ids, grid, None, None, attention_mask), args.repeats
+            )
+            vectorized_ms = time_call(
+                lambda: model.get_rope_index(input_ids, grid, None, None, attention_mask), args.repeats
+            )
+            timings[str(batch_size)] = {
+                "seq_len": input_ids.shape[1],
+                "images": grid.shape[0],
+                "reference_ms": round(reference_ms, 3),
+                "vectorized_ms": round(vectorized_ms, 3),
+                "speedup": round(reference_ms / vectorized_ms, 2),
+            }
+            print(f"batch {batch_size}: {reference_ms:.2f} ms → {vectorized_ms:.2f} ms", file=sys.stderr)
+
+    report = {
+        "settings": {
+            "model": "tiny" if args.tiny else model_path,
+            "device": str(device),
+            "cases": args.cases,
+            "repeats": args.repeats,
+        },
+        "timings": timings,
+        "mismatched": mismatched,
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if mismatched:
+        print(f"✗ {len(mismatched)} 个批次的向量化位置索引与参考实现不一致", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+合成PDF生成工具
+用PyMuPDF在本地生成四类基准文档：纯文本、密集表格、多栏排版、扫描件风格
+
+用法:
+    python bench/synthetic_pdfs.py --output-dir bench_pdfs --pages 2
+"""
+
+import argparse
+import io
+import random
+from pathlib import Path
+from typing import Callable, Dict
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageFilter
+
+
+# A4 页面尺寸（pt）
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 56
+
+WORDS = (
+    "document layout recognition model page table formula chart text paragraph "
+    "section result analysis method data performance system processing structure "
+    "inference vision language token image column header value average total"
+).split()
+
+
+def make_sentence(rng: random.Random, words: int = 14) -> str:
+    """生成一句随机英文句子"""
+    sentence = " ".join(rng.choice(WORDS) for _ in range(words))
+    return sentence.capitalize() + "."
+
+
+def make_paragraph(rng: random.Random, sentences: int = 5) -> str:
+    """生成一段随机文本"""
+    return " ".join(make_sentence(rng) for _ in range(sentences))
+
+
+def add_text_page(doc: "fitz.Document", rng: random.Random, page_num: int):
+    """纯文本页：标题 + 若干段落"""
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_text((MARGIN, MARGIN + 10), f"Section {page_num + 1}: Benchmark Text", fontsize=18)
+    body = "\n\n".join(make_paragraph(rng) for _ in range(6))
+    page.insert_textbox(
+        fitz.Rect(MARGIN, MARGIN + 40, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - MARGIN),
+        body,
+        fontsize=10.5,
+    )
+
+
+def add_table_page(doc: "fitz.Document", rng: random.Random, page_num: int, rows: int = 28, cols: int = 6):
+    """密集表格页：带网格线的数字表格"""
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_text((MARGIN, MARGIN + 10), f"Table {page_num + 1}: Benchmark Results", fontsize=14)
+
+    top = MARGIN + 30
+    cell_w = (PAGE_WIDTH - 2 * MARGIN) / cols
+    cell_h = (PAGE_HEIGHT - top - MARGIN) / (rows + 1)
+    for r in range(rows + 1):
+        for c in range(cols):
+            rect = fitz.Rect(
+                MARGIN + c * cell_w, top + r * cell_h,
+                MARGIN + (c + 1) * cell_w, top + (r + 1) * cell_h
+            )
+            page.draw_rect(rect, color=(0, 0, 0), width=0.5)
+            if r == 0:
+                text = rng.choice(WORDS).title()
+            elif c == 0:
+                text = f"Row {r}"
+            else:
+                text = f"{rng.uniform(0, 1000):.2f}"
+            page.insert_text((rect.x0 + 3, rect.y1 - cell_h * 0.3), text, fontsize=8)
+
+
+def add_multicolumn_page(doc: "fitz.Document", rng: random.Random, page_num: int, columns: int = 2):
+    """多栏排版页：标题横跨整页，正文分两栏"""
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_text((MARGIN, MARGIN + 10), f"Article {page_num + 1}: Two Column Layout", fontsize=16)
+    gutter = 18
+    col_w = (PAGE_WIDTH - 2 * MARGIN - gutter * (columns - 1)) / columns
+    for c in range(columns):
+        x0 = MARGIN + c * (col_w + gutter)
+        body = "\n\n".join(make_paragraph(rng, sentences=4) for _ in range(5))
+        page.insert_textbox(
+            fitz.Rect(x0, MARGIN + 40, x0 + col_w, PAGE_HEIGHT - MARGIN),
+            body,
+            fontsize=9.5,
+        )
+
+
+def add_scanned_page(doc: "fitz.Document", rng: random.Random, page_num: int, dpi: int = 150):
+    """扫描件风格页：文本页栅格化后加旋转、模糊和噪点，以图片形式嵌入（无文本层）"""
+    tmp = fitz.open()
+    add_text_page(tmp, rng, page_num)
+    pix = tmp[0].get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), alpha=False)
+    tmp.close()
+
+    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples).convert("L")
+    image = image.rotate(rng.uniform(-1.5, 1.5), expand=False, fillcolor=255)
+    image = image.filter(ImageFilter.GaussianBlur(radius=0.6))
+    noise = Image.effect_noise(image.size, 18)
+    image = Image.blend(image, noise, 0.08)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=70)
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_image(page.rect, stream=buffer.getvalue())
+
+
+# 文档类型 -> 页面生成函数
+DOCUMENT_KINDS: Dict[str, Callable] = {
+    "text": add_text_page,
+    "table": add_table_page,
+    "multicolumn": add_multicolumn_page,
+    "scanned": add_scanned_page,
+}
+
+
+def generate_pdf(kind: str, output_path: str, pages: int = 2, seed: int = 0) -> str:
+    """
+    生成一份合成PDF
+
+    Args:
+        kind: 文档类型（text / table / multicolumn / scanned）
+        output_path: 输出路径
+        pages: 页数
+        seed: 随机种子（相同种子生成的文档内容一致）
+
+    Returns:
+        输出路径
+    """
+    rng = random.Random(f"{kind}-{seed}")
+    doc = fitz.open()
+    for page_num in range(pages):
+        DOCUMENT_KINDS[kind](doc, rng, page_num)
+    doc.save(output_path)
+    doc.close()
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成基准测试用合成PDF")
+    parser.add_argument("--output-dir", default="bench_pdfs")
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--kinds", nargs="+", default=list(DOCUMENT_KINDS), choices=list(DOCUMENT_KINDS))
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for kind in args.kinds:
+        path = generate_pdf(kind, str(output_dir / f"{kind}.pdf"), pages=args.pages)
+        print(f"✓ {path}")
+
+
+if __name__ == "__main__":
+    main()
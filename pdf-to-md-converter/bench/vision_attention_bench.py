@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+视觉编码器注意力基准
+对比无 flash-attention 时的两种注意力实现：
+- dense：整个打包序列一次性计算注意力（块对角掩码），分数矩阵随 patch 数平方增长
+- chunked：按 cu_seqlens 逐图、按查询分块计算（chunked_varlen_attention_forward），峰值内存线性增长
+
+输出：
+1. 数值一致性：小规模输入下 chunked 与 dense 的最大绝对误差
+2. 不同 patch 数下单层注意力的耗时与进程峰值内存（每个测量在独立子进程中运行）
+
+用法:
+    python bench/vision_attention_bench.py --patches 2000 4000 8000 14000
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import torch  # noqa: E402
+from transformers.dynamic_module_utils import get_class_from_dynamic_module  # noqa: E402
+
+from converter.profiling import peak_rss_mb  # noqa: E402
+from converter.tiny_model import DEFAULT_SOURCE  # noqa: E402
+
+
+# SigLIP 视觉编码器的注意力形状（PaddleOCR-VL：hidden 1152 = 16 头 × 72）
+NUM_HEADS, HEAD_DIM = 16, 72
+
+
+def load_attention(source: str):
+    """从模型远程代码中加载 chunked_varlen_attention_forward"""
+    return get_class_from_dynamic_module(
+        "modeling_paddleocr_vl.chunked_varlen_attention_forward", source
+    )
+
+
+def random_qkv(patches: int, seed: int = 0):
+    """随机的 (1, heads, patches, head_dim) 查询/键/值"""
+    generator = torch.Generator().manual_seed(seed)
+    shape = (1, NUM_HEADS, patches, HEAD_DIM)
+    return tuple(torch.randn(shape, generator=generator) for _ in range(3))
+
+
+def dense_attention(query, key, value, cu_seqlens, scaling):
+    """整个打包序列上的稠密注意力（块对角掩码限制在同一张图内）"""
+    segment_ids = torch.repeat_interleave(
+        torch.arange(len(cu_seqlens) - 1), cu_seqlens[1:] - cu_seqlens[:-1]
+    )
+    mask = segment_ids[:, None] == segment_ids[None, :]
+    output = torch.nn.functional.scaled_dot_product_attention(
+        query, key, value, attn_mask=mask, scale=scaling
+    )
+    return output.transpose(1, 2)
+
+
+def segments(patches: int, images: int) -> torch.Tensor:
+    """把 patches 个 patch 平均分给 images 张图的 cu_seqlens"""
+    bounds = [round(patches * i / images) for i in range(images + 1)]
+    return torch.tensor(bounds, dtype=torch.int32)
+
+
+def worker(args):
+    """子进程：测量一次注意力计算的耗时和峰值内存"""
+    query, key, value = random_qkv(args.patches)
+    cu_seqlens = segments(args.patches, args.images)
+    scaling = HEAD_DIM ** -0.5
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    with torch.no_grad():
+        if args.mode == "dense":
+            dense_attention(query, key, value, cu_seqlens, scaling)
+        else:
+            attention = load_attention(args.source)
+            attention(query, key, value, cu_seqlens, scaling, max_scores=args.max_scores)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "ms": round(elapsed * 1000, 2),
+        "peak_rss_delta_mb": round(peak_rss_mb() - baseline, 1),
+    }))
+
+
+def measure(args, mode: str, patches: int) -> dict:
+    """在独立子进程中测量，避免峰值内存互相影响"""
+    command = [
+        sys.executable, __file__, "--worker", "--mode", mode,
+        "--patches", str(patches), "--images", str(args.images),
+        "--max-scores", str(args.max_scores), "--source", args.source,
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视觉编码器分块变长注意力基准")
+    parser.add_argument("--patches", type=int, nargs="+", default=[2000, 4000, 8000, 14000])
+    parser.add_argument("--images", type=int, default=1, help="打包的图片数（cu_seqlens 段数）")
+    parser.add_argument("--max-scores", type=int, default=1 << 26, help="每块最多同时存在的注意力分数个数")
+    parser.add_argument("--modes", nargs="+", default=["dense", "chunked"], choices=["dense", "chunked"])
+    parser.add_argument("--source", default=str(DEFAULT_SOURCE), help="模型远程代码目录")
+    parser.add_argument("--output", default=None, help="结果JSON输出路径")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", default="chunked", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    # 数值一致性：两段共 1024 个 patch，强制小分块以覆盖分块边界
+    query, key, value = random_qkv(1024, seed=1)
+    cu_seqlens = segments(1024, 2)
+    scaling = HEAD_DIM ** -0.5
+    with torch.no_grad():
+        reference = dense_attention(query, key, value, cu_seqlens, scaling)
+        chunked = load_attention(args.source)(query, key, value, cu_seqlens, scaling, max_scores=NUM_HEADS * 512 * 100)
+    max_abs = float((reference - chunked).abs().max())
+
+    report = {"parity_max_abs": max_abs, "images": args.images, "max_scores": args.max_scores, "sizes": {}}
+    for patches in args.patches:
+        report["sizes"][patches] = {mode: measure(args, mode, patches) for mode in args.modes}
+        print(f"{patches:>6} patches: " + ", ".join(
+            f"{mode} {result.get('ms')} ms / +{result.get('peak_rss_delta_mb')} MB"
+            for mode, result in report["sizes"][patches].items()
+        ), file=sys.stderr)
+    print(f"parity max_abs={max_abs:.2e}", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if max_abs > 1e-4:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
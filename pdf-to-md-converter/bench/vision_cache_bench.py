@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+视觉嵌入缓存基准
+同一页面依次用 ocr / table / formula / chart 四种提示词识别：
+- baseline：每个提示词都重新计算视觉编码器和投影层
+- cached：第一个提示词计算并写入 safetensors 缓存，之后的提示词直接读取 image_embeds
+
+输出每个提示词的视觉阶段耗时，并校验两种方式的识别文本一致（不一致时以非零状态退出）。
+
+用法:
+    python bench/vision_cache_bench.py --model-path /path/to/paddleocr-vl
+    python bench/vision_cache_bench.py --tiny --max-new-tokens 32
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from converter.ocr_processor import OCRProcessor  # noqa: E402
+from converter.tiny_model import create_tiny_model  # noqa: E402
+from converter.vision_cache import VisionEmbeddingCache  # noqa: E402
+from kv_cache_bench import make_sample_page  # noqa: E402
+
+
+def run_prompts(processor: OCRProcessor, image: Image.Image) -> dict:
+    """逐个提示词识别同一页面，返回 {任务类型: (文本, 视觉阶段墙钟ms)}"""
+    runs = {}
+    for task_type in OCRProcessor.PROMPTS:
+        page = processor.prepare_page(image, task_type)
+        result = processor.process_prepared([page], task_type)[0]
+        runs[task_type] = (result["result"], result["timings"].get("vision", {}).get("wall_ms"))
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视觉嵌入缓存基准")
+    parser.add_argument("--model-path", default="/personal/1102case/models/paddleocr-vl")
+    parser.add_argument("--image", default=None, help="输入图片（默认使用合成页面）")
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    parser.add_argument("--output", default=None, help="结果JSON输出路径")
+    parser.add_argument("--tiny", action="store_true", help="使用随机权重的微型模型")
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if args.tiny:
+        model_path = create_tiny_model(tempfile.mkdtemp(prefix="paddleocr-vl-tiny-"))
+    image = Image.open(args.image).convert("RGB") if args.image else make_sample_page()
+
+    processor = OCRProcessor(model_path=model_path, max_new_tokens=args.max_new_tokens)
+    processor.load_model()
+    baseline = run_prompts(processor, image)
+
+    with tempfile.TemporaryDirectory(prefix="pdf2md-vision-cache-") as cache_dir:
+        processor.vision_cache = VisionEmbeddingCache(cache_dir)
+        cached = run_prompts(processor, image)
+        cache_stats = processor.vision_cache.get_stats()
+
+    mismatched = [task for task in baseline if baseline[task][0] != cached[task][0]]
+    report = {
+        "settings": {
+            "model": "tiny" if args.tiny else model_path,
+            "image_size": list(image.size),
+            "max_new_tokens": args.max_new_tokens,
+        },
+        "vision_ms": {
+            task: {"baseline": baseline[task][1], "cached": cached[task][1]}
+            for task in baseline
+        },
+        "cache": cache_stats,
+        "mismatched_prompts": mismatched,
+    }
+    for task, item in report["vision_ms"].items():
+        print(f"{task:>8}: vision {item['baseline']} ms → {item['cached']} ms", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if mismatched:
+        print(f"✗ 使用缓存嵌入后识别结果不一致: {', '.join(mismatched)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+视觉塔前后处理基准
+对比多图像批次在视觉编码器前后的两段胶水代码：
+- 元数据：逐图像循环构造 siglip position_ids / sample_indices / cu_seqlens（原实现）
+  与按网格签名缓存、一次构造的 _vision_metadata
+- 投影层：逐图像 rearrange + MLP（原实现）与一次 gather + 一次 MLP 的 forward_packed
+
+元数据要求逐元素相同；投影结果只允许批量矩阵乘带来的舍入误差（超出 --atol 时以非零状态退出）。
+
+用法:
+    python bench/vision_glue_bench.py --model-path /path/to/paddleocr-vl --pages 4
+    python bench/vision_glue_bench.py --tiny
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from converter.ocr_processor import OCRProcessor  # noqa: E402
+from converter.tiny_model import create_tiny_model  # noqa: E402
+
+
+# 预处理后的图像网格 (t, h, w)，h、w 为 patch 数（合并前）
+SAMPLE_GRIDS = [(1, 56, 40), (1, 72, 56), (1, 88, 68), (1, 32, 128)]
+
+
+def reference_metadata(image_grid_thw: torch.Tensor, device):
+    """原实现：逐图像构造视觉塔元数据"""
+    siglip_position_ids, image_grid_hws, sample_indices, cu_seqlens = [], [], [], [0]
+    for idx, thw in enumerate(image_grid_thw):
+        thw_tuple = tuple(thw.detach().cpu().numpy().tolist())
+        numel = np.prod(thw_tuple)
+        image_grid_hws.append(thw_tuple)
+        siglip_position_ids.append(torch.arange(numel) % np.prod(thw_tuple[1:]))
+        sample_indices.append(torch.full((numel,), idx, dtype=torch.int64))
+        cu_seqlens.append(cu_seqlens[-1] + numel)
+    return (
+        image_grid_hws,
+        torch.concat(siglip_position_ids, dim=0).to(device),
+        torch.concat(sample_indices, dim=0).to(device),
+        torch.tensor(cu_seqlens, dtype=torch.int32).to(device),
+    )
+
+
+def reference_projector(projector, image_features, image_grid_thw):
+    """原实现：逐图像 rearrange((t h p1 w p2) d -> (t h w) (p1 p2 d)) 后投影"""
+    m1, m2 = projector.merge_kernel_size
+    outputs = []
+    for feature, (t, h, w) in zip(image_features, image_grid_thw.tolist()):
+        feature = projector.pre_norm(feature)
+        feature = (
+            feature.view(t, h // m1, m1, w // m2, m2, -1)
+            .permute(0, 1, 3, 2, 4, 5)
+            .reshape(t * (h // m1) * (w // m2), -1)
+        )
+        outputs.append(projector.linear_2(projector.act(projector.linear_1(feature))))
+    return torch.cat(outputs, dim=0)
+
+
+def time_call(fn, repeats: int) -> float:
+    """平均单次耗时（ms）"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视觉塔前后处理基准")
+    parser.add_argument("--model-path", default="/personal/1102case/models/paddleocr-vl")
+    parser.add_argument("--pages", type=int, default=4, help="每批图像数")
+    parser.add_argument("--repeats", type=int, default=20, help="计时重复次数")
+    parser.add_argument("--atol", type=float, default=1e-2, help="投影结果允许的最大绝对误差")
+    parser.add_argument("--output", default=None, help="结果JSON输出路径")
+    parser.add_argument("--tiny", action="store_true", help="使用随机权重的微型模型")
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if args.tiny:
+        model_path = create_tiny_model(tempfile.mkdtemp(prefix="paddleocr-vl-tiny-"))
+
+    processor = OCRProcessor(model_path=model_path)
+    processor.load_model()
+    model = processor.model
+    projector = model.mlp_AR
+    device = next(model.parameters()).device
+    dtype = projector.linear_1.weight.dtype
+
+    grid = torch.tensor(
+        [SAMPLE_GRIDS[idx % len(SAMPLE_GRIDS)] for idx in range(args.pages)], device=device
+    )
+    signature = tuple(tuple(g) for g in grid.tolist())
+    numels = [t * h * w for t, h, w in signature]
+    features = torch.randn(sum(numels), projector.vision_config.hidden_size, device=device, dtype=dtype)
+    per_image = list(features.split(numels, dim=0))
+
+    with torch.no_grad():
+        expected_meta = reference_metadata(grid, device)
+        actual_meta = model._vision_metadata(signature, device)
+        metadata_match = expected_meta[0] == list(actual_meta[0]) and all(
+            torch.equal(a, b) for a, b in zip(expected_meta[1:], actual_meta[1:])
+        )
+        expected_proj = reference_projector(projector, per_image, grid)
+        actual_proj = projector.forward_packed(features, signature)
+        max_abs_diff = (expected_proj.float() - actual_proj.float()).abs().max().item()
+
+        model._vision_metadata_cache.clear()
+        timings = {
+            "metadata": {
+                "reference_ms": time_call(lambda: reference_metadata(grid, device), args.repeats),
+                "first_call_ms": time_call(lambda: model._vision_metadata(signature, device), 1),
+                "cached_ms": time_call(lambda: model._vision_metadata(signature, device), args.repeats),
+            },
+            "projector": {
+                "reference_ms": time_call(lambda: reference_projector(projector, per_image, grid), args.repeats),
+                "packed_ms": time_call(lambda: projector.forward_packed(features, signature), args.repeats),
+            },
+        }
+    timings = {stage: {k: round(v, 3) for k, v in item.items()} for stage, item in timings.items()}
+
+    report = {
+        "settings": {
+            "model": "tiny" if args.tiny else model_path,
+            "device": str(device),
+            "dtype": str(dtype),
+            "images": args.pages,
+            "patches": sum(numels),
+        },
+        "timings": timings,
+        "metadata_match": metadata_match,
+        "projector_max_abs_diff": max_abs_diff,
+    }
+    print(f"metadata {timings['metadata']['reference_ms']:.2f} ms → {timings['metadata']['cached_ms']:.3f} ms, "
+          f"projector {timings['projector']['reference_ms']:.2f} ms → {timings['projector']['packed_ms']:.2f} ms",
+          file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if not metadata_match or max_abs_diff > args.atol:
+        print(f"✗ 批量实现与逐图像实现不一致（元数据一致: {metadata_match}，投影最大误差: {max_abs_diff:.2e}）",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+视觉编码器量化基准
+对比原精度（bf16 / fp32）与 int8 仅权重量化的 SigLIP 视觉编码器：
+1. 逐层数值一致性：每个 SiglipEncoderLayer 输出及投影层输出相对参考的相对L2误差、余弦相似度、最大绝对误差
+2. 延迟：不同输入尺寸下视觉编码（SigLIP + 投影层）耗时，折算为每百万像素毫秒数
+
+语言模型保持加载时的配置（可以用 --quantization 同时开启 int8 动态量化，两者互不影响）。
+
+用法:
+    python bench/vision_quant_bench.py --model-path /path/to/paddleocr-vl --megapixels 0.5 1 2
+    python bench/vision_quant_bench.py --tiny --dtype float32
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from statistics import median
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import torch  # noqa: E402
+
+from converter.ocr_processor import OCRProcessor  # noqa: E402
+from converter.profiling import GenerationProfiler  # noqa: E402
+from converter.quantization import quantize_vision_tower  # noqa: E402
+from converter.tiny_model import create_tiny_model  # noqa: E402
+from kv_cache_bench import make_sample_page  # noqa: E402
+
+
+def page_of_megapixels(megapixels: float):
+    """生成指定像素数的合成页面（3:4 竖版）"""
+    height = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    width = int(height * 3 / 4)
+    return make_sample_page(width, height)
+
+
+def encode(model, inputs, capture: bool = False):
+    """
+    执行一次预填充前向，返回 (视觉编码耗时ms, 各层输出列表或None)
+
+    逐层输出通过前向钩子截取，只在 capture=True 时保存
+    """
+    layer_outputs = []
+    handles = []
+    if capture:
+        for layer in model.visual.vision_model.encoder.layers:
+            handles.append(layer.register_forward_hook(
+                lambda module, args, output: layer_outputs.append(output[0].detach().float().cpu())
+            ))
+        handles.append(model.mlp_AR.register_forward_hook(
+            lambda module, args, output: layer_outputs.append(torch.cat(output, dim=0).detach().float().cpu())
+        ))
+    try:
+        with torch.no_grad(), GenerationProfiler(model) as profiler:
+            model(**inputs, use_cache=False)
+    finally:
+        for handle in handles:
+            handle.remove()
+    return profiler.vision_seconds * 1000, (layer_outputs if capture else None)
+
+
+def compare(reference: torch.Tensor, candidate: torch.Tensor) -> dict:
+    """单层输出的数值差异"""
+    diff = candidate - reference
+    return {
+        "rel_l2": round(float(diff.norm() / reference.norm().clamp(min=1e-12)), 6),
+        "cosine": round(float(torch.nn.functional.cosine_similarity(
+            candidate.flatten(), reference.flatten(), dim=0
+        )), 6),
+        "max_abs": round(float(diff.abs().max()), 6),
+    }
+
+
+def time_sizes(processor: OCRProcessor, sizes: dict, repeats: int) -> dict:
+    """各输入尺寸下视觉编码耗时的中位数"""
+    timings = {}
+    for megapixels, inputs in sizes.items():
+        runs = [encode(processor.model, inputs)[0] for _ in range(repeats)]
+        vision_ms = median(runs)
+        timings[megapixels] = {
+            "vision_ms": round(vision_ms, 2),
+            "ms_per_megapixel": round(vision_ms / megapixels, 2),
+        }
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SigLIP 视觉编码器 int8 仅权重量化基准")
+    parser.add_argument("--model-path", default="/personal/1102case/models/paddleocr-vl")
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[0.5, 1.0, 2.0])
+    parser.add_argument("--dtype", choices=["bfloat16", "float32"], default="bfloat16",
+                        help="参考视觉编码器精度")
+    parser.add_argument("--quantization", default="none", help="语言模型量化模式（与视觉量化独立）")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None, help="结果JSON输出路径")
+    parser.add_argument("--tiny", action="store_true", help="使用随机权重的微型模型")
+    args = parser.parse_args()
+
+    model_path = args.model_path
+    if args.tiny:
+        model_path = create_tiny_model(tempfile.mkdtemp(prefix="paddleocr-vl-tiny-"))
+
+    processor = OCRProcessor(model_path=model_path, quantization=args.quantization)
+    processor.load_model()
+    dtype = getattr(torch, args.dtype)
+    processor.model.visual.to(dtype)
+    processor.model.mlp_AR.to(dtype)
+
+    sizes = {}
+    for megapixels in args.megapixels:
+        inputs = processor.prepare_inputs(page_of_megapixels(megapixels), "ocr")
+        sizes[megapixels] = inputs
+    parity_size = args.megapixels[0]
+
+    # 参考：先预热一次，再截取逐层输出并计时
+    encode(processor.model, sizes[parity_size])
+    _, reference_layers = encode(processor.model, sizes[parity_size], capture=True)
+    reference_timings = time_sizes(processor, sizes, args.repeats)
+
+    start = time.perf_counter()
+    quantize_vision_tower(processor.model)
+    quantize_seconds = time.perf_counter() - start
+
+    encode(processor.model, sizes[parity_size])
+    _, quantized_layers = encode(processor.model, sizes[parity_size], capture=True)
+    quantized_timings = time_sizes(processor, sizes, args.repeats)
+
+    layer_names = [f"encoder.layers.{idx}" for idx in range(len(reference_layers) - 1)] + ["mlp_AR"]
+    parity = {
+        name: compare(ref, quant)
+        for name, ref, quant in zip(layer_names, reference_layers, quantized_layers)
+    }
+
+    report = {
+        "settings": {
+            "model": "tiny" if args.tiny else model_path,
+            "reference_dtype": args.dtype,
+            "language_model_quantization": args.quantization,
+            "threads": torch.get_num_threads(),
+            "parity_megapixels": parity_size,
+        },
+        "vision_tokens": {
+            mp: int(inputs["image_grid_thw"].prod(dim=-1).sum()) for mp, inputs in sizes.items()
+        },
+        "quantize_seconds": round(quantize_seconds, 3),
+        "layer_parity": parity,
+        "latency": {
+            mp: {
+                "reference": reference_timings[mp],
+                "int8_weight_only": quantized_timings[mp],
+                "speedup": round(reference_timings[mp]["vision_ms"] / quantized_timings[mp]["vision_ms"], 2),
+            }
+            for mp in sizes
+        },
+    }
+
+    worst = max(parity.values(), key=lambda item: item["rel_l2"])
+    print(f"worst layer rel_l2 {worst['rel_l2']}, final cosine {parity['mlp_AR']['cosine']}", file=sys.stderr)
+    for mp, item in report["latency"].items():
+        print(f"{mp:>5} MP: {item['reference']['ms_per_megapixel']} → "
+              f"{item['int8_weight_only']['ms_per_megapixel']} ms/MP ({item['speedup']}x)", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ 结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+编译解码模块
+用 torch.compile（inductor）编译语言模型的单token解码步，消除逐token的Python框架开销：
+- 只替换静态KV缓存下 seq_len == 1 的前向，预填充和其他情况仍走原始 eager 路径
+- 解码步的形状（batch, 1, hidden）与预分配的静态缓存都固定，编译一次后反复复用
+- 编译产物持久化到磁盘（inductor FX图缓存 + 编译产物缓存），服务重启后无需重新编译
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+import torch
+from transformers import StaticCache
+from transformers.modeling_outputs import BaseModelOutputWithPast
+
+
+# 编译产物缓存文件名（torch.compiler.save_cache_artifacts 的输出，torch>=2.7）
+ARTIFACTS_FILE = "compile_artifacts.bin"
+
+
+def configure_compile_cache(cache_dir: str) -> bool:
+    """
+    配置编译缓存目录并加载上次保存的编译产物
+
+    必须在第一次编译之前调用。
+
+    Args:
+        cache_dir: 缓存目录
+
+    Returns:
+        是否加载了已保存的编译产物
+    """
+    path = Path(cache_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    # inductor 生成的内核与FX图缓存
+    import torch._inductor.config as inductor_config
+    os.environ["TORCHINDUCTOR_CACHE_DIR"] = str(path / "inductor")
+    inductor_config.fx_graph_cache = True
+
+    artifacts = path / ARTIFACTS_FILE
+    if artifacts.exists() and hasattr(torch.compiler, "load_cache_artifacts"):
+        try:
+            torch.compiler.load_cache_artifacts(artifacts.read_bytes())
+            return True
+        except Exception as e:
+            print(f"⚠️ 编译缓存加载失败，将重新编译: {e}")
+    return False
+
+
+def save_compile_cache(cache_dir: str) -> bool:
+    """
+    保存本进程的编译产物，供下次启动直接加载
+
+    Args:
+        cache_dir: 缓存目录
+
+    Returns:
+        是否保存成功（torch 版本不支持或尚未编译时返回False）
+    """
+    if not hasattr(torch.compiler, "save_cache_artifacts"):
+        return False
+    saved = torch.compiler.save_cache_artifacts()
+    if saved is None:
+        return False
+    artifact_bytes, _ = saved
+    path = Path(cache_dir) / ARTIFACTS_FILE
+    tmp = path.with_suffix(".part")
+    tmp.write_bytes(artifact_bytes)
+    os.replace(tmp, path)
+    return True
+
+
+def inductor_compile_count() -> int:
+    """
+    本进程中 inductor 实际新编译的图数（FX图缓存未命中或绕过缓存的次数）
+
+    从编译缓存加载的图只计为命中，不计入。
+    """
+    from torch._dynamo.utils import counters
+    return counters["inductor"]["fxgraph_cache_miss"] + counters["inductor"]["fxgraph_cache_bypass"]
+
+
+class CompiledDecoder:
+    """
+    解码步编译包装器
+
+    接管 Ernie4_5Model.forward：静态缓存下的单token前向进入编译后的
+    「旋转位置编码 + 全部解码层 + 末层RMSNorm」，注意力掩码仍在 eager 中构造。
+    """
+
+    def __init__(self, decoder: torch.nn.Module, cache_dir: Optional[str] = None):
+        """
+        初始化并安装到语言模型上
+
+        Args:
+            decoder: PaddleOCRVLForConditionalGeneration.model（Ernie4_5Model）
+            cache_dir: 编译缓存目录（为None时使用 torch 默认的临时目录，不跨重启保留）
+        """
+        self.decoder = decoder
+        self.cache_dir = cache_dir
+        self.loaded_from_cache = configure_compile_cache(cache_dir) if cache_dir else False
+        self.compiled_steps = 0
+        # 上次保存时的新编译图数，之后又有新编译时才需要再次保存
+        self._saved_compiles = 0
+        self._eager_forward = decoder.forward
+        # 不同页面的提示词长度不同，静态缓存长度随之变化：
+        # dynamic=None 时第一次形状变化会重编译为符号长度，之后不再重编译
+        self._step = torch.compile(self._decode_step, dynamic=None)
+        decoder.forward = self.forward
+
+    def _decode_step(self, hidden_states, position_ids, causal_mask, past_key_values, cache_position):
+        """单token解码步（被编译的部分）"""
+        decoder = self.decoder
+        position_embeddings = decoder.rotary_emb(hidden_states, position_ids)
+        for decoder_layer in decoder.layers[: decoder.config.num_hidden_layers]:
+            hidden_states = decoder_layer(
+                hidden_states,
+                attention_mask=causal_mask,
+                position_ids=position_ids,
+                past_key_value=past_key_values,
+                cache_position=cache_position,
+                position_embeddings=position_embeddings,
+            )
+        return decoder.norm(hidden_states)
+
+    def forward(
+        self,
+        input_ids=None,
+        attention_mask=None,
+        position_ids=None,
+        past_key_values=None,
+        inputs_embeds=None,
+        cache_position=None,
+        use_cache=None,
+        output_attentions=None,
+        **kwargs
+    ):
+        """与 Ernie4_5Model.forward 相同的接口"""
+        if (
+            not isinstance(past_key_values, StaticCache)
+            or inputs_embeds is None
+            or inputs_embeds.shape[1] != 1
+            or output_attentions
+            or kwargs.get("output_hidden_states")
+        ):
+            return self._eager_forward(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=past_key_values,
+                inputs_embeds=inputs_embeds,
+                cache_position=cache_position,
+                use_cache=use_cache,
+                output_attentions=output_attentions,
+                **kwargs
+            )
+
+        if cache_position is None:
+            past_seen_tokens = past_key_values.get_seq_length()
+            cache_position = torch.arange(
+                past_seen_tokens, past_seen_tokens + 1, device=inputs_embeds.device
+            )
+        if position_ids is None:
+            position_ids = cache_position.view(1, 1, -1).expand(3, inputs_embeds.shape[0], -1)
+        elif position_ids.dim() == 2:
+            position_ids = position_ids[None, ...].expand(3, position_ids.shape[0], -1)
+
+        causal_mask = self.decoder._update_causal_mask(
+            attention_mask, inputs_embeds, cache_position, past_key_values, False
+        )
+        hidden_states = self._step(inputs_embeds, position_ids, causal_mask, past_key_values, cache_position)
+        self.compiled_steps += 1
+        return BaseModelOutputWithPast(last_hidden_state=hidden_states, past_key_values=past_key_values)
+
+    def after_generate(self):
+        """
+        每次 generate 结束后调用：自上次保存以来有新编译的图（首次编译、新的批大小、
+        形状变化后的符号化重编译）时保存编译产物，让它们尽早落盘。
+        启动时已加载缓存也照常保存之后新编译的图
+        """
+        if self.cache_dir and self.compiled_steps and inductor_compile_count() > self._saved_compiles:
+            self.save()
+
+    def save(self) -> bool:
+        """
+        保存编译产物（服务关闭时调用）
+
+        Returns:
+            是否保存成功
+        """
+        if not self.cache_dir or not self.compiled_steps:
+            return False
+        try:
+            # 保存失败时也记下当前编译数，直到再有新编译前不反复重试
+            self._saved_compiles = inductor_compile_count()
+            return save_compile_cache(self.cache_dir)
+        except Exception as e:
+            print(f"⚠️ 编译缓存保存失败: {e}")
+            return False
+
+    def remove(self):
+        """恢复原始 eager 前向"""
+        self.decoder.forward = self._eager_forward
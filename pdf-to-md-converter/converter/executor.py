@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+执行器模块
+将PDF渲染与模型推理从FastAPI事件循环中剥离，通过Future桥接回asyncio
+"""
+
+import os
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Optional
+
+
+class InferenceExecutor:
+    """
+    推理执行器
+
+    - 渲染/Markdown生成等CPU任务运行在线程池中（PyMuPDF和PIL在C层释放GIL）
+    - 模型推理运行在单独的专用工作线程中，保证同一时刻只有一个推理调用占用模型
+    - 启用连续批处理时，各任务的流水线运行在 pipeline 线程池中（模型调用由调度器线程统一执行），
+      多个任务的页面可以同时进入解码批
+    - 所有调用都以 asyncio Future 的形式返回，事件循环本身不做任何阻塞工作
+    """
+
+    def __init__(self, render_workers: Optional[int] = None, pipeline_workers: int = 1):
+        """
+        初始化执行器
+
+        Args:
+            render_workers: 渲染线程池大小（默认取CPU核数的一半，至少为1）
+            pipeline_workers: 可同时运行的任务流水线数（仅连续批处理模式使用）
+        """
+        if render_workers is None:
+            render_workers = max(1, (os.cpu_count() or 2) // 2)
+
+        self.render_workers = render_workers
+        self._render_pool = ThreadPoolExecutor(
+            max_workers=render_workers,
+            thread_name_prefix="render"
+        )
+        # 专用推理线程：单线程保证模型调用串行执行
+        self._inference_pool = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="inference"
+        )
+
+        self.pipeline_workers = max(1, pipeline_workers)
+        self._pipeline_pool = ThreadPoolExecutor(
+            max_workers=self.pipeline_workers,
+            thread_name_prefix="pipeline"
+        )
+
+        self._lock = threading.Lock()
+        self._pending = {"render": 0, "inference": 0, "pipeline": 0}
+        self._completed = {"render": 0, "inference": 0, "pipeline": 0}
+        self._busy_seconds = {"render": 0.0, "inference": 0.0, "pipeline": 0.0}
+        self._closed = False
+
+    def _submit(self, kind: str, pool: ThreadPoolExecutor, fn: Callable, *args, **kwargs) -> Future:
+        """提交任务到指定线程池，并记录排队和耗时统计"""
+        if self._closed:
+            raise RuntimeError("执行器已关闭")
+
+        with self._lock:
+            self._pending[kind] += 1
+
+        def run():
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._pending[kind] -= 1
+                    self._completed[kind] += 1
+                    self._busy_seconds[kind] += elapsed
+
+        return pool.submit(run)
+
+    def submit_render(self, fn: Callable, *args, **kwargs) -> Future:
+        """提交渲染类任务，返回 concurrent.futures.Future"""
+        return self._submit("render", self._render_pool, fn, *args, **kwargs)
+
+    def submit_inference(self, fn: Callable, *args, **kwargs) -> Future:
+        """提交推理任务到专用推理线程，返回 concurrent.futures.Future"""
+        return self._submit("inference", self._inference_pool, fn, *args, **kwargs)
+
+    def submit_pipeline(self, fn: Callable, *args, **kwargs) -> Future:
+        """提交任务流水线到 pipeline 线程池，返回 concurrent.futures.Future"""
+        return self._submit("pipeline", self._pipeline_pool, fn, *args, **kwargs)
+
+    async def run_render(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        在渲染线程池中执行函数并等待结果
+
+        Args:
+            fn: 要执行的函数
+            *args, **kwargs: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        return await asyncio.wrap_future(self.submit_render(fn, *args, **kwargs))
+
+    async def run_inference(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        在专用推理线程中执行函数并等待结果
+
+        Args:
+            fn: 要执行的函数
+            *args, **kwargs: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        return await asyncio.wrap_future(self.submit_inference(fn, *args, **kwargs))
+
+    async def run_pipeline(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        在 pipeline 线程池中执行函数并等待结果（连续批处理模式下运行任务流水线）
+
+        Args:
+            fn: 要执行的函数
+            *args, **kwargs: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        return await asyncio.wrap_future(self.submit_pipeline(fn, *args, **kwargs))
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop, callback: Callable) -> Callable:
+        """
+        包装回调，使其可以从工作线程安全地调度回事件循环执行
+
+        Args:
+            loop: 目标事件循环
+            callback: 需要在事件循环线程执行的回调
+
+        Returns:
+            线程安全的回调函数
+        """
+        def threadsafe(*args, **kwargs):
+            loop.call_soon_threadsafe(functools.partial(callback, *args, **kwargs))
+        return threadsafe
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取执行器统计信息
+
+        Returns:
+            各队列的排队数、完成数与累计耗时
+        """
+        with self._lock:
+            return {
+                "render_workers": self.render_workers,
+                "pipeline_workers": self.pipeline_workers,
+                "pending": dict(self._pending),
+                "completed": dict(self._completed),
+                "busy_seconds": {k: round(v, 3) for k, v in self._busy_seconds.items()},
+            }
+
+    def shutdown(self, wait: bool = True):
+        """
+        关闭执行器
+
+        Args:
+            wait: 是否等待正在执行的任务完成
+        """
+        self._closed = True
+        self._render_pool.shutdown(wait=wait)
+        self._inference_pool.shutdown(wait=wait)
+        self._pipeline_pool.shutdown(wait=wait)
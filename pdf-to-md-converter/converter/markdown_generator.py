@@ -6,12 +6,22 @@ Markdown生成器模块
 
 from pathlib import Path
 from typing import List, Dict, Any
+import math
 import re
 
 
 class MarkdownGenerator:
     """Markdown生成器，将OCR结果转换为结构化文档"""
     
+    # 结果本身已是Markdown的页面路由（文本层直出、空白页、纯图片页占位）
+    DIRECT_ROUTES = ("text", "blank", "picture")
+    
+    # 摘要中统计耗时分布的阶段（顺序即处理顺序）
+    TIMING_STAGES = ("render", "preprocess", "vision", "prefill", "decode")
+    
+    # 摘要中列出的最慢页面数
+    SLOWEST_PAGES = 3
+    
     def __init__(self):
         """初始化Markdown生成器"""
         self.content = []
@@ -156,7 +166,10 @@ class MarkdownGenerator:
             self.add_title("识别内容", level=3)
             
             ocr_text = result.get("result", "")
-            if ocr_text:
+            if ocr_text and result.get("route") in self.DIRECT_ROUTES:
+                # 文本层直出或占位内容已经是Markdown，无需再合并断行
+                self.add_text(ocr_text)
+            elif ocr_text:
                 processed_text = self.process_ocr_result(ocr_text)
                 
                 # 检查是否包含表格、公式等特殊内容
@@ -218,11 +231,83 @@ class MarkdownGenerator:
             if "result" in result:
                 total_chars += len(result["result"])
         
+        # 统计页面路由（文本层直出 / OCR）
+        routes: Dict[str, int] = {}
+        for result in ocr_results:
+            route = result.get("route", "ocr")
+            routes[route] = routes.get(route, 0) + 1
+        
+        # 解码被截断的页面（重复循环 / 超时 / 达到token上限），可换参数重试
+        truncated_pages = [
+            {"page": page_num, "reason": result["truncated"]["reason"]}
+            for page_num, result in enumerate(ocr_results, 1)
+            if result.get("truncated")
+        ]
+        
         return {
             "total_pages": total_pages,
             "successful_pages": successful_pages,
             "failed_pages": failed_pages,
             "total_characters": total_chars,
-            "success_rate": f"{(successful_pages / total_pages * 100):.1f}%" if total_pages > 0 else "0%"
+            "routes": routes,
+            "truncated_pages": truncated_pages,
+            "success_rate": f"{(successful_pages / total_pages * 100):.1f}%" if total_pages > 0 else "0%",
+            "timings": self.summarize_timings(ocr_results)
+        }
+    
+    @staticmethod
+    def _distribution(values: List[float]) -> Dict[str, float]:
+        """计算 p50 / p95 / max（最近秩法）"""
+        ordered = sorted(values)
+        
+        def percentile(q: float) -> float:
+            return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+        
+        return {
+            "count": len(ordered),
+            "p50": round(percentile(0.50), 2),
+            "p95": round(percentile(0.95), 2),
+            "max": round(ordered[-1], 2),
+        }
+    
+    def summarize_timings(self, ocr_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        汇总逐页计时：每个阶段墙钟耗时（毫秒）与token数的 p50 / p95 / max，以及最慢的几页
+        
+        vision / prefill / decode 是整批 generate 的耗时，批处理时同批页面记录相同的值；
+        命中页面缓存或无需OCR的页面没有这三个阶段。
+        
+        Args:
+            ocr_results: OCR识别结果列表（按页码排序）
+            
+        Returns:
+            计时摘要字典（没有任何计时信息时为空字典）
+        """
+        stages: Dict[str, List[float]] = {}
+        tokens: Dict[str, List[float]] = {}
+        page_totals = []
+        for page_num, result in enumerate(ocr_results, 1):
+            timings = result.get("timings") or {}
+            for stage in self.TIMING_STAGES:
+                if stage in timings:
+                    stages.setdefault(stage, []).append(timings[stage]["wall_ms"])
+            for key in ("vision_tokens", "generated_tokens"):
+                if key in result:
+                    tokens.setdefault(key, []).append(result[key])
+            if timings:
+                total = sum(t["wall_ms"] for t in timings.values())
+                page_totals.append((total, page_num, result.get("route", "ocr")))
+        
+        if not page_totals:
+            return {}
+        
+        page_totals.sort(reverse=True)
+        return {
+            "stages_ms": {stage: self._distribution(values) for stage, values in stages.items()},
+            "tokens": {key: self._distribution(values) for key, values in tokens.items()},
+            "slowest_pages": [
+                {"page": page_num, "route": route, "total_ms": round(total, 2)}
+                for total, page_num, route in page_totals[:self.SLOWEST_PAGES]
+            ],
         }
 
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+指标模块
+轻量的 Prometheus 文本格式指标（计数器 / 仪表 / 直方图），无第三方依赖
+
+采集开销：每次记录只是一次加锁的字典更新（直方图额外一次二分查找），可以常驻在逐页处理的热路径中
+"""
+
+import bisect
+import os
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+# 默认耗时直方图分桶（秒）：覆盖毫秒级的渲染到分钟级的长页面解码
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+
+def _format_value(value: float) -> str:
+    """格式化数值（整数不带小数点，无穷大使用 +Inf）"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """格式化标签集合"""
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class _Metric:
+    """指标基类"""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        初始化指标
+
+        Args:
+            name: 指标名
+            documentation: 指标说明（HELP）
+            labelnames: 标签名列表
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """按标签名顺序生成样本键"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], **extra) -> str:
+        """样本键转换为标签文本"""
+        return _format_labels({**dict(zip(self.labelnames, key)), **extra})
+
+    def render(self) -> List[str]:
+        """生成该指标的文本行"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, value: float = 1.0, **labels):
+        """
+        增加计数
+
+        Args:
+            value: 增量（不能为负）
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        """
+        设置当前值
+
+        Args:
+            value: 数值
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每个标签组合：[各分桶计数(非累积)..., +Inf桶计数], 总和
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        """
+        记录一次观测值
+
+        Args:
+            value: 观测值
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(key, le=_format_value(bound))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    瞬时值（队列深度、任务状态分布、缓存命中率、进程内存等）通过采集回调在抓取时计算，
+    热路径只负责计数器和直方图的记录。
+    """
+
+    def __init__(self):
+        """初始化注册表"""
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """注册计数器"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """注册仪表"""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        """注册直方图"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """
+        注册采集回调（每次抓取前调用，用于刷新仪表）
+
+        Args:
+            collector: 无参回调
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        生成 Prometheus 文本格式（version 0.0.4）
+
+        Returns:
+            指标文本
+        """
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"⚠️ 指标采集失败: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def process_rss_bytes() -> int:
+    """
+    当前进程的常驻内存（字节）
+
+    Returns:
+        RSS，无法读取 /proc 时返回0
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
@@ -5,28 +5,131 @@ OCR处理模块
 """
 
 import os
+import sys
+import time
+import hashlib
 import torch
 from PIL import Image, ImageDraw, ImageFont
-from transformers import AutoModelForCausalLM, AutoProcessor
+from transformers import AutoModelForCausalLM, AutoProcessor, BatchFeature, DynamicCache, StoppingCriteriaList
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 import json
 
+from .compiled_decode import CompiledDecoder
+from .page_cache import PageResultCache
+from .prefix_cache import PrefixKVCache
+from .profiling import GenerationProfiler, stage_timer
+from .quantization import (
+    QUANTIZATION_MODES,
+    VISION_QUANTIZATION_MODES,
+    load_quantized_model,
+    quantize_language_model,
+    quantize_vision_tower,
+    quantized_cache_path,
+    save_quantized_state,
+)
+from .stopping import RepetitionStoppingCriteria, TimeBudgetStoppingCriteria
+from .vision_cache import VisionEmbeddingCache
+
 
 class OCRProcessor:
     """OCR处理器，使用VL模型进行文档结构化识别"""
     
-    def __init__(self, model_path: str = "/personal/1102case/models/paddleocr-vl"):
+    # 任务提示词映射
+    PROMPTS = {
+        "ocr": "OCR with format:",  # 结构化OCR
+        "table": "Table Recognition:",
+        "formula": "Formula Recognition:",
+        "chart": "Chart Recognition:",
+    }
+    
+    # 支持的KV缓存实现：dynamic（按需增长）/ static（预分配，形状固定）
+    CACHE_IMPLEMENTATIONS = ("dynamic", "static")
+    
+    def __init__(
+        self,
+        model_path: str = "/personal/1102case/models/paddleocr-vl",
+        use_cache: bool = True,
+        cache_implementation: str = "dynamic",
+        max_new_tokens: int = 2048,
+        batch_size: int = 1,
+        page_cache: Optional[PageResultCache] = None,
+        compile_decode: bool = False,
+        compile_cache_dir: Optional[str] = None,
+        quantization: str = "none",
+        quantization_cache_dir: Optional[str] = None,
+        vision_quantization: str = "none",
+        stop_on_repetition: bool = True,
+        page_time_budget: Optional[float] = None,
+        vision_cache: Optional[VisionEmbeddingCache] = None,
+        prefix_cache: Optional[PrefixKVCache] = None
+    ):
         """
         初始化OCR处理器
         
         Args:
             model_path: VL模型路径
+            use_cache: 是否启用KV缓存解码（关闭时每个token都会重算整个前缀）
+            cache_implementation: KV缓存实现，dynamic 或 static（预分配）
+            max_new_tokens: 单页最多生成的token数
+            batch_size: 批量识别时单次 generate 打包的页数
+            page_cache: 页面级识别结果缓存（为None时不缓存）
+            compile_decode: 是否用 torch.compile 编译单token解码步（需要静态KV缓存，开启时自动切换）
+            compile_cache_dir: 编译产物的持久化目录（为None时不跨重启保留）
+            quantization: 语言模型量化模式，none（bf16）或 int8-dynamic（仅CPU，其余部分使用fp32）
+            quantization_cache_dir: 量化权重缓存目录（默认为模型目录下的 quantized/）
+            vision_quantization: 视觉编码器量化模式，none 或 int8-weight-only（与语言模型量化相互独立）
+            stop_on_repetition: 检测到输出陷入重复循环时提前停止（结果只保留第一个周期并标记为截断）
+            page_time_budget: 单次 generate 的墙钟预算（秒），超时停止并标记为截断；为None时不限制
+            vision_cache: 视觉嵌入缓存（同一页面换提示词时跳过视觉编码器，为None时不缓存）
+            prefix_cache: 图像前缀KV缓存（同一页面换任务类型时只预填充任务指令，为None时不缓存；
+                只用于单页 generate 和 dynamic KV缓存）
         """
+        if cache_implementation not in self.CACHE_IMPLEMENTATIONS:
+            raise ValueError(
+                f"不支持的缓存实现: {cache_implementation}，可选: {', '.join(self.CACHE_IMPLEMENTATIONS)}"
+            )
+        
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(
+                f"不支持的量化模式: {quantization}，可选: {', '.join(QUANTIZATION_MODES)}"
+            )
+        if vision_quantization not in VISION_QUANTIZATION_MODES:
+            raise ValueError(
+                f"不支持的视觉量化模式: {vision_quantization}，可选: {', '.join(VISION_QUANTIZATION_MODES)}"
+            )
+        if quantization != "none" and torch.cuda.is_available():
+            raise ValueError(f"量化模式 {quantization} 只支持CPU推理")
+        
+        if compile_decode and cache_implementation != "static":
+            print("⚠️ 编译解码需要固定形状的静态KV缓存，已切换为 static")
+            cache_implementation = "static"
+        
         self.model_path = model_path
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.model = None
         self.processor = None
+        self.use_cache = use_cache
+        self.cache_implementation = cache_implementation
+        self.max_new_tokens = max_new_tokens
+        self.batch_size = max(1, batch_size)
+        self.page_cache = page_cache
+        self.compile_decode = compile_decode and use_cache
+        self.compile_cache_dir = compile_cache_dir
+        # 编译解码包装器（load_model 时安装），未开启时为None
+        self.compiled_decoder: Optional[CompiledDecoder] = None
+        self.quantization = quantization
+        self.quantization_cache_dir = quantization_cache_dir or str(Path(model_path) / "quantized")
+        self.vision_quantization = vision_quantization
+        self.stop_on_repetition = stop_on_repetition
+        self.page_time_budget = page_time_budget if page_time_budget and page_time_budget > 0 else None
+        self.vision_cache = vision_cache
+        self.prefix_cache = prefix_cache
+        self._model_revision = None
+        # 模型加载耗时（秒），加载前为None
+        self.load_seconds: Optional[float] = None
+        # 每次 generate 完成后接收耗时和token统计的回调（用于指标采集），为None时不做分析
+        self.generation_observer: Optional[Callable[[Dict[str, Any]], None]] = None
         
         print(f"使用设备: {self.device}")
         if torch.cuda.is_available():
@@ -36,80 +139,724 @@ class OCRProcessor:
         """加载VL模型（延迟加载）"""
         if self.model is None:
             print(f"正在加载模型: {self.model_path}")
+            start = time.perf_counter()
             
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_path,
-                trust_remote_code=True,
-                torch_dtype=torch.bfloat16
-            ).to(self.device).eval()
+            if self.quantization == "none":
+                self.model = AutoModelForCausalLM.from_pretrained(
+                    self.model_path,
+                    trust_remote_code=True,
+                    torch_dtype=torch.bfloat16
+                ).to(self.device).eval()
+            else:
+                self.model = self._load_quantized_model()
+            if self.vision_quantization == "int8-weight-only":
+                quantize_vision_tower(self.model)
+                print("✓ 视觉编码器已量化为 int8-weight-only")
             
             self.processor = AutoProcessor.from_pretrained(
                 self.model_path,
                 trust_remote_code=True
             )
+            # 批量生成使用左填充，保证每条序列的最后一个位置都是真实token
+            self.processor.tokenizer.padding_side = "left"
+            if self.compile_decode:
+                # 只做包装，真正的编译发生在第一次解码时（或从编译缓存加载）
+                self.compiled_decoder = CompiledDecoder(self.model.model, self.compile_cache_dir)
+                print(f"✓ 已启用编译解码 (缓存: {self.compile_cache_dir or '无'}"
+                      f"{'，已加载编译产物' if self.compiled_decoder.loaded_from_cache else ''})")
+            self.load_seconds = time.perf_counter() - start
             
-            print("✓ 模型加载完成")
+            print(f"✓ 模型加载完成 ({self.load_seconds:.1f}s)")
             if torch.cuda.is_available():
                 print(f"  显存占用: {torch.cuda.memory_allocated(0) / 1024**3:.2f} GB")
-                
-    def process_image(self, image_path: str, task_type: str = "ocr") -> Dict[str, Any]:
+    
+    def _load_quantized_model(self) -> torch.nn.Module:
+        """加载 int8 动态量化模型：优先读取量化缓存，未命中时从原始权重量化并写入缓存"""
+        cache_path = quantized_cache_path(
+            self.quantization_cache_dir, self.quantization, self.model_revision()
+        )
+        model = load_quantized_model(self.model_path, cache_path)
+        if model is not None:
+            print(f"✓ 已从缓存加载量化模型: {cache_path}")
+            return model
+        
+        # 动态量化需要fp32权重和激活
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_path,
+            trust_remote_code=True,
+            torch_dtype=torch.float32
+        ).eval()
+        start = time.perf_counter()
+        quantize_language_model(model)
+        print(f"✓ 语言模型已量化为 {self.quantization} ({time.perf_counter() - start:.1f}s)")
+        if save_quantized_state(model, cache_path) is not None:
+            print(f"✓ 量化权重已缓存: {cache_path}")
+        return model
+    
+    def inference_variant(self) -> str:
         """
-        处理单张图片
+        影响识别输出的推理数值配置（参与页面缓存和转换缓存键计算）
+        
+        Returns:
+            配置描述字符串
+        """
+        variant = "bf16" if self.quantization == "none" else f"lm={self.quantization}"
+        if self.vision_quantization != "none":
+            variant += f"|vision={self.vision_quantization}"
+        return variant
+    
+    # 决定模型输出的配置文件（参与模型版本指纹计算）
+    REVISION_FILES = (
+        "config.json",
+        "generation_config.json",
+        "preprocessor_config.json",
+        "processor_config.json",
+        "tokenizer_config.json",
+        "chat_template.jinja",
+    )
+    
+    def model_revision(self) -> str:
+        """
+        计算模型版本指纹（无需加载模型）
+        
+        配置文件按内容计算，权重文件按文件名、大小和修改时间计算，
+        替换权重或修改预处理配置后指纹随之改变。
+        
+        Returns:
+            十六进制指纹字符串
+        """
+        if self._model_revision is None:
+            digest = hashlib.sha256()
+            model_dir = Path(self.model_path)
+            for name in self.REVISION_FILES:
+                path = model_dir / name
+                if path.exists():
+                    digest.update(name.encode("utf-8"))
+                    digest.update(path.read_bytes())
+            for path in sorted(model_dir.glob("*.safetensors")) + sorted(model_dir.glob("*.bin")):
+                stat = path.stat()
+                digest.update(f"{path.name}:{stat.st_size}:{int(stat.st_mtime)}".encode("utf-8"))
+            self._model_revision = digest.hexdigest()[:16]
+        return self._model_revision
+    
+    def generation_kwargs(self) -> Dict[str, Any]:
+        """
+        获取传给 model.generate 的解码参数
+        
+        Returns:
+            解码参数字典
+        """
+        kwargs = {
+            "max_new_tokens": self.max_new_tokens,
+            "use_cache": self.use_cache,
+        }
+        if self.use_cache and self.cache_implementation == "static":
+            kwargs["cache_implementation"] = "static"
+        return kwargs
+    
+    def stopping_criteria(self, prompt_length: int) -> StoppingCriteriaList:
+        """
+        为一次 generate 创建停止条件（每次调用都是新实例，记录各自的触发情况）
         
         Args:
-            image_path: 图片路径
+            prompt_length: 提示词长度
+            
+        Returns:
+            停止条件列表
+        """
+        criteria = StoppingCriteriaList()
+        if self.stop_on_repetition:
+            tokenizer = self.processor.tokenizer
+            criteria.append(RepetitionStoppingCriteria(
+                prompt_length,
+                ignore_token_ids=[tokenizer.pad_token_id] + self.eos_token_ids()
+            ))
+        if self.page_time_budget is not None:
+            criteria.append(TimeBudgetStoppingCriteria(self.page_time_budget))
+        return criteria
+    
+    def eos_token_ids(self) -> List[int]:
+        """生成配置中的结束token列表"""
+        eos = self.model.generation_config.eos_token_id
+        if eos is None:
+            return []
+        return list(eos) if isinstance(eos, (list, tuple)) else [eos]
+    
+    def preprocess_image(self, image: Image.Image) -> Dict[str, torch.Tensor]:
+        """
+        对单张图像做视觉预处理（缩放、归一化、切patch）
+        
+        Args:
+            image: RGB图像
+            
+        Returns:
+            包含 pixel_values 和 image_grid_thw 的字典
+        """
+        self.load_model()
+        image_inputs = self.processor.image_processor(images=image, return_tensors="pt")
+        return {
+            "pixel_values": image_inputs["pixel_values"],
+            "image_grid_thw": image_inputs["image_grid_thw"],
+        }
+    
+    def prepare_batch_inputs(
+        self,
+        image_inputs: List[Dict[str, torch.Tensor]],
+        task_type: str = "ocr"
+    ) -> BatchFeature:
+        """
+        将多张已预处理的图像打包为一次 generate 的输入
+        
+        Args:
+            image_inputs: preprocess_image 的返回值列表
             task_type: 任务类型 (ocr, table, formula, chart)
             
         Returns:
-            包含识别结果的字典
+            左填充后的批量模型输入（已移动到目标设备）
         """
         self.load_model()
         
-        # 任务提示词映射
-        prompts = {
-            "ocr": "OCR with format:",  # 结构化OCR
-            "table": "Table Recognition:",
-            "formula": "Formula Recognition:",
-            "chart": "Chart Recognition:",
+        prompt = self.PROMPTS.get(task_type, self.PROMPTS["ocr"])
+        conversations = [
+            [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "image"},
+                        {"type": "text", "text": prompt},
+                    ]
+                }
+            ]
+            for _ in image_inputs
+        ]
+        texts = self.processor.apply_chat_template(
+            conversations,
+            tokenize=False,
+            add_generation_prompt=True
+        )
+        if isinstance(texts, str):
+            texts = [texts]
+        
+        # 按每张图像的网格大小展开图像占位符（与处理器 __call__ 的逻辑一致）
+        image_token = self.processor.image_token
+        merge_length = self.processor.image_processor.merge_size ** 2
+        expanded_texts = []
+        for text, inputs in zip(texts, image_inputs):
+            num_image_tokens = int(inputs["image_grid_thw"][0].prod()) // merge_length
+            expanded_texts.append(text.replace(image_token, image_token * num_image_tokens, 1))
+        
+        text_inputs = self.processor.tokenizer(
+            expanded_texts,
+            padding=True,
+            return_tensors="pt"
+        )
+        
+        return BatchFeature(data={
+            **text_inputs,
+            "pixel_values": torch.cat([inputs["pixel_values"] for inputs in image_inputs], dim=0),
+            "image_grid_thw": torch.cat([inputs["image_grid_thw"] for inputs in image_inputs], dim=0),
+        }).to(self.device)
+    
+    def prepare_inputs(self, image: Image.Image, task_type: str = "ocr") -> BatchFeature:
+        """
+        构造单张图片的模型输入
+        
+        Args:
+            image: RGB图像
+            task_type: 任务类型 (ocr, table, formula, chart)
+            
+        Returns:
+            已移动到目标设备的模型输入
+        """
+        return self.prepare_batch_inputs([self.preprocess_image(image)], task_type)
+    
+    def attach_image_embeds(self, inputs: BatchFeature):
+        """
+        用视觉嵌入缓存替换模型输入中的像素：命中的图像直接读取缓存的投影层输出，
+        未命中的图像一次性计算后写入缓存，输出中以 image_embeds 代替 pixel_values
+        
+        Args:
+            inputs: prepare_batch_inputs 返回的模型输入
+            
+        Returns:
+            (模型输入, 命中缓存的图像数)；未启用缓存时原样返回
+        """
+        if self.vision_cache is None or "pixel_values" not in inputs:
+            return inputs, 0
+        
+        grids = inputs["image_grid_thw"]
+        patch_counts = grids.prod(dim=-1).tolist()
+        patches = torch.split(inputs["pixel_values"], patch_counts)
+        namespace = f"{self.model_revision()}|vision={self.vision_quantization}|{self.model.visual.dtype}"
+        keys = [VisionEmbeddingCache.make_key(p, grid, namespace) for p, grid in zip(patches, grids)]
+        embeds = [self.vision_cache.get(key) for key in keys]
+        
+        missing = [i for i, e in enumerate(embeds) if e is None]
+        if missing:
+            with torch.no_grad():
+                computed = self.model.get_image_features(
+                    torch.cat([patches[i] for i in missing], dim=0), grids[missing]
+                )
+            merge_length = self.processor.image_processor.merge_size ** 2
+            computed = torch.split(computed, [patch_counts[i] // merge_length for i in missing])
+            for i, image_embeds in zip(missing, computed):
+                embeds[i] = image_embeds
+                self.vision_cache.put(keys[i], image_embeds)
+        
+        data = {key: value for key, value in inputs.items() if key != "pixel_values"}
+        data["image_embeds"] = torch.cat([e.to(self.device) for e in embeds], dim=0)
+        return BatchFeature(data=data), len(keys) - len(missing)
+    
+    def shared_prefix_length(self, inputs: BatchFeature) -> int:
+        """
+        可复用的图像前缀长度：到最后一个图像token为止（之后是随任务类型变化的指令）
+        
+        Args:
+            inputs: prepare_batch_inputs 返回的模型输入
+            
+        Returns:
+            前缀token数；未启用前缀缓存或不适用（多页批量、静态KV缓存、编译解码）时为0
+        """
+        if (
+            self.prefix_cache is None
+            or not self.use_cache
+            or self.cache_implementation != "dynamic"
+            or self.compiled_decoder is not None
+            or inputs["input_ids"].shape[0] != 1
+            or "pixel_values" not in inputs
+        ):
+            return 0
+        positions = (inputs["input_ids"][0] == self.model.config.image_token_id).nonzero()
+        if len(positions) == 0:
+            return 0
+        return int(positions[-1]) + 1
+    
+    def prefix_cache_key(self, inputs: BatchFeature, prefix_len: int) -> str:
+        """
+        计算图像前缀的缓存键
+        
+        Args:
+            inputs: 单页模型输入
+            prefix_len: 前缀长度
+            
+        Returns:
+            缓存键
+        """
+        namespace = f"{self.model_revision()}|{self.inference_variant()}"
+        return PrefixKVCache.make_key(inputs["input_ids"][0, :prefix_len], inputs["pixel_values"], namespace)
+    
+    def _prefill_prefix(self, inputs: BatchFeature, prefix_len: int):
+        """
+        单独预填充图像前缀
+        
+        Args:
+            inputs: 单页模型输入（包含 pixel_values 或 image_embeds）
+            prefix_len: 前缀长度
+            
+        Returns:
+            (前缀KV缓存, 该次前向的耗时统计)
+        """
+        prefix_inputs = {
+            key: value[:, :prefix_len] if key in ("input_ids", "attention_mask") else value
+            for key, value in inputs.items()
         }
+        cache = DynamicCache()
+        with torch.no_grad(), GenerationProfiler(self.model, synchronize=False) as profiler:
+            self.model(**prefix_inputs, past_key_values=cache, use_cache=True)
+        return cache, profiler.summary()
+    
+    def _rope_deltas(self, inputs: BatchFeature) -> torch.Tensor:
+        """按完整提示词计算 mRoPE 偏移（后缀与解码位置 = 缓存位置 + 偏移）"""
+        _, rope_deltas = self.model.get_rope_index(
+            inputs["input_ids"], inputs["image_grid_thw"], None, None, inputs["attention_mask"]
+        )
+        return rope_deltas
+    
+    def _kv_bytes(self, length: int) -> int:
+        """length 个token在语言模型各层KV缓存中占用的字节数"""
+        config = self.model.config
+        head_dim = getattr(config, "head_dim", None) or config.hidden_size // config.num_attention_heads
+        element_size = self.model.model.embed_tokens.weight.element_size()
+        return length * config.num_hidden_layers * 2 * config.num_key_value_heads * head_dim * element_size
+    
+    def generate(self, inputs) -> torch.Tensor:
+        """
+        执行自回归解码
         
-        prompt = prompts.get(task_type, prompts["ocr"])
+        Args:
+            inputs: prepare_inputs / prepare_batch_inputs 返回的模型输入
+            
+        Returns:
+            包含提示词在内的完整输出token序列
+        """
+        outputs, _ = self.generate_with_stats(inputs)
+        return outputs
+    
+    def generate_with_stats(self, inputs):
+        """
+        执行自回归解码并统计各阶段耗时（前向钩子计时，不同步设备，开销可忽略）
         
-        # 加载图像
-        image = Image.open(image_path).convert("RGB")
+        Args:
+            inputs: prepare_inputs / prepare_batch_inputs 返回的模型输入
+            
+        Returns:
+            (完整输出token序列, 统计信息)
+            统计信息包含 vision/prefill/decode 的墙钟与CPU耗时（整批）、batch_size，
+            逐条序列的 generated_tokens 与 vision_tokens 列表，
+            以及逐条序列的截断信息 truncated（未截断为None）；
+            启用视觉嵌入缓存时 vision 为查缓存加计算未命中图像的耗时，另有 vision_cache_hits；
+            使用前缀缓存时另有 prefix_cache_hit，prefill 包含前缀（未命中时）和任务指令后缀的预填充
+        """
+        self.load_model()
+        prompt_len = inputs["input_ids"].shape[1]
+        
+        # 前缀缓存命中时不需要图像输入，视觉嵌入缓存也不必查询
+        prefix_len = self.shared_prefix_length(inputs)
+        past_key_values = None
+        if prefix_len:
+            prefix_key = self.prefix_cache_key(inputs, prefix_len)
+            past_key_values = self.prefix_cache.get(prefix_key)
+        
+        vision: Dict[str, Any] = {}
+        if self.vision_cache is not None and past_key_values is None:
+            with stage_timer(vision, "vision", thread_cpu=False):
+                inputs, vision_hits = self.attach_image_embeds(inputs)
+        
+        prefix_stats: Dict[str, Any] = {}
+        extra_kwargs: Dict[str, Any] = {}
+        if prefix_len:
+            if past_key_values is None:
+                snapshot, prefix_stats = self._prefill_prefix(inputs, prefix_len)
+                self.prefix_cache.put(prefix_key, snapshot, self._kv_bytes(prefix_len))
+                past_key_values = PrefixKVCache.fork(snapshot)
+            # 后缀从缓存长度处开始预填充，mRoPE 偏移需要按完整提示词预先算好传入
+            extra_kwargs = {"past_key_values": past_key_values, "rope_deltas": self._rope_deltas(inputs)}
+        
+        criteria = self.stopping_criteria(prompt_len)
+        with torch.no_grad(), GenerationProfiler(self.model, synchronize=False) as profiler:
+            outputs = self.model.generate(
+                **inputs, **self.generation_kwargs(), **extra_kwargs, stopping_criteria=criteria
+            )
+        if self.compiled_decoder is not None:
+            self.compiled_decoder.after_generate()
+        
+        merge_length = self.processor.image_processor.merge_size ** 2
+        stats = profiler.summary()
+        if prefix_len:
+            stats["prefix_cache_hit"] = not prefix_stats
+            for key in ("vision_ms", "vision_cpu_ms", "prefill_ms", "prefill_cpu_ms"):
+                if key in prefix_stats:
+                    stats[key] = round(stats.get(key, 0.0) + prefix_stats[key], 2)
+        if vision:
+            # 视觉编码在 generate 之外完成，预填充前向中不再包含视觉编码耗时
+            stats["vision_ms"] = vision["vision"]["wall_ms"]
+            stats["vision_cpu_ms"] = vision["vision"]["cpu_ms"]
+            stats["vision_cache_hits"] = vision_hits
+        stats["batch_size"] = outputs.shape[0]
+        stats["generated_tokens"] = (
+            outputs[:, prompt_len:] != self.processor.tokenizer.pad_token_id
+        ).sum(dim=1).tolist()
+        stats["vision_tokens"] = [
+            int(grid.prod()) // merge_length for grid in inputs["image_grid_thw"]
+        ]
+        stats["truncated"] = self._truncation_info(outputs[:, prompt_len:], criteria)
+        if self.generation_observer is not None:
+            self.generation_observer(stats)
+        return outputs, stats
+    
+    def _truncation_info(self, generated: torch.Tensor, criteria: StoppingCriteriaList) -> List[Optional[Dict[str, Any]]]:
+        """
+        判断每条序列是否被截断
         
-        # 准备输入
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image", "image": image},
-                    {"type": "text", "text": prompt},
-                ]
+        - repetition: 输出陷入重复循环被提前停止（cut_at 为保留到的生成token数，只保留第一个周期）
+        - time_budget: 超过墙钟预算时尚未结束
+        - max_new_tokens: 生成到上限仍未结束
+        
+        Args:
+            generated: 生成部分的token（不含提示词）
+            criteria: 本次 generate 使用的停止条件
+            
+        Returns:
+            与批内序列一一对应的截断信息，未截断为None
+        """
+        repetition = next((c for c in criteria if isinstance(c, RepetitionStoppingCriteria)), None)
+        time_budget = next((c for c in criteria if isinstance(c, TimeBudgetStoppingCriteria)), None)
+        eos_ids = set(self.eos_token_ids())
+        
+        infos = []
+        for row, tokens in enumerate(generated.tolist()):
+            finished = any(token in eos_ids for token in tokens)
+            if repetition is not None and row in repetition.triggered:
+                period, start = repetition.triggered[row]
+                infos.append({"reason": "repetition", "period": period, "cut_at": start + period})
+            elif finished:
+                infos.append(None)
+            elif time_budget is not None and time_budget.triggered:
+                infos.append({"reason": "time_budget", "budget_seconds": time_budget.max_seconds})
+            elif len(tokens) >= self.max_new_tokens:
+                infos.append({"reason": "max_new_tokens"})
+            else:
+                infos.append(None)
+        return infos
+    
+    def page_cache_key(self, image: Image.Image, task_type: str) -> Optional[str]:
+        """
+        计算页面缓存键（未启用页面缓存时返回None）
+        
+        Args:
+            image: 渲染后的页面图像
+            task_type: 任务类型
+            
+        Returns:
+            缓存键
+        """
+        if self.page_cache is None:
+            return None
+        namespace = f"{task_type}|{self.model_revision()}|{self.inference_variant()}|{self.max_new_tokens}"
+        return PageResultCache.make_key(image, namespace)
+    
+    def prepare_page(
+        self,
+        image: Image.Image,
+        task_type: str = "ocr",
+        image_path: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        为识别准备单页：先查页面缓存，未命中时做视觉预处理
+        
+        Args:
+            image: RGB图像
+            task_type: 任务类型
+            image_path: 页面图片路径
+            
+        Returns:
+            process_prepared 所需的页面字典（命中缓存时包含 cached_result，否则包含 image_inputs）
+        """
+        page = {"image_path": image_path, "image_size": image.size, "timings": {}}
+        cache_key = self.page_cache_key(image, task_type)
+        if cache_key is not None:
+            page["cache_key"] = cache_key
+            cached = self.page_cache.get(cache_key)
+            if cached is not None:
+                page["cached_result"] = cached
+                return page
+        with stage_timer(page["timings"], "preprocess"):
+            page["image_inputs"] = self.preprocess_image(image)
+        return page
+    
+    @staticmethod
+    def _load_image(image: Union[str, Image.Image]) -> Image.Image:
+        """加载图像并转换为RGB"""
+        if isinstance(image, Image.Image):
+            return image.convert("RGB")
+        return Image.open(image).convert("RGB")
+    
+    def process_prepared(
+        self,
+        pages: List[Dict[str, Any]],
+        task_type: str = "ocr"
+    ) -> List[Dict[str, Any]]:
+        """
+        对已完成视觉预处理的一批页面执行一次 generate（出错时直接抛出异常）
+        
+        Args:
+            pages: prepare_page 返回的页面列表；命中页面缓存的页面不参与 generate
+            task_type: 任务类型
+            
+        Returns:
+            与输入顺序一致的识别结果列表（命中缓存的结果带 cached=True）
+        """
+        texts: List[Optional[str]] = [page.get("cached_result") for page in pages]
+        pending = [i for i, text in enumerate(texts) if text is None]
+        page_stats: Dict[int, Dict[str, Any]] = {}
+        
+        if pending:
+            inputs = self.prepare_batch_inputs([pages[i]["image_inputs"] for i in pending], task_type)
+            outputs, stats = self.generate_with_stats(inputs)
+            
+            # 左填充和EOS之后的填充都是特殊token，解码时会被跳过；
+            # 重复循环的序列只保留到第一个周期结束
+            prompt_len = inputs["input_ids"].shape[1]
+            sequences = [
+                outputs[row, :prompt_len + info["cut_at"]] if info and info["reason"] == "repetition" else outputs[row]
+                for row, info in enumerate(stats["truncated"])
+            ]
+            decoded = self.processor.batch_decode(sequences, skip_special_tokens=True)
+            for row, (i, text) in enumerate(zip(pending, decoded)):
+                texts[i] = text
+                # 截断页面不写入缓存，便于换参数重试
+                if self.page_cache is not None and pages[i].get("cache_key") and not stats["truncated"][row]:
+                    self.page_cache.put(pages[i]["cache_key"], text)
+                # vision/prefill/decode 是整批一次 generate 的耗时，batch_size 记录同批页数
+                page_stats[i] = {
+                    "timings": {
+                        stage: {"wall_ms": stats[f"{stage}_ms"], "cpu_ms": stats[f"{stage}_cpu_ms"]}
+                        for stage in ("vision", "prefill", "decode")
+                        if f"{stage}_ms" in stats
+                    },
+                    "batch_size": stats["batch_size"],
+                    "vision_tokens": stats["vision_tokens"][row],
+                    "generated_tokens": stats["generated_tokens"][row],
+                    "truncated": stats["truncated"][row],
+                }
+        
+        results = []
+        for i, (page, text) in enumerate(zip(pages, texts)):
+            result = {
+                "image_path": page.get("image_path"),
+                "task_type": task_type,
+                "result": text,
+                "image_size": page["image_size"],
+                "timings": dict(page.get("timings", {}))
             }
+            if i in page_stats:
+                result["timings"].update(page_stats[i]["timings"])
+                result["batch_size"] = page_stats[i]["batch_size"]
+                result["vision_tokens"] = page_stats[i]["vision_tokens"]
+                result["generated_tokens"] = page_stats[i]["generated_tokens"]
+                if page_stats[i]["truncated"]:
+                    result["truncated"] = page_stats[i]["truncated"]
+            if "cached_result" in page:
+                result["cached"] = True
+            results.append(result)
+        return results
+    
+    def _process_batch(
+        self,
+        images: List[Union[str, Image.Image]],
+        task_type: str
+    ) -> List[Dict[str, Any]]:
+        """
+        一次 generate 处理一批图像（出错时直接抛出异常）
+        
+        Args:
+            images: 图片路径或PIL图像列表
+            task_type: 任务类型
+            
+        Returns:
+            与输入顺序一致的识别结果列表
+        """
+        pages = [
+            self.prepare_page(
+                self._load_image(image),
+                task_type,
+                image_path=image if isinstance(image, str) else None
+            )
+            for image in images
         ]
+        return self.process_prepared(pages, task_type)
+    
+    def _bucket_by_grid(
+        self,
+        images: List[Union[str, Image.Image]],
+        batch_size: int
+    ) -> Tuple[List[List[int]], Dict[int, str]]:
+        """
+        按视觉网格大小分桶，使同一批次内的序列长度尽量接近，减少填充浪费
         
-        inputs = self.processor.apply_chat_template(
-            messages,
-            tokenize=True,
-            add_generation_prompt=True,
-            return_dict=True,
-            return_tensors="pt"
-        ).to(self.device)
+        Args:
+            images: 图片路径或PIL图像列表
+            batch_size: 每批页数
+            
+        Returns:
+            (每个批次包含的输入下标列表, {无法读取尺寸的图片下标: 错误信息})
+        """
+        image_processor = self.processor.image_processor
+        # smart_resize 与图像处理器定义在同一个远程代码模块中
+        smart_resize = sys.modules[type(image_processor).__module__].smart_resize
         
-        # 生成输出
-        with torch.no_grad():
-            outputs = self.model.generate(**inputs, max_new_tokens=2048)
+        def grid_key(index: int):
+            image = images[index]
+            if isinstance(image, str):
+                with Image.open(image) as img:
+                    width, height = img.size
+            else:
+                width, height = image.size
+            resized_height, resized_width = smart_resize(
+                height,
+                width,
+                factor=image_processor.patch_size * image_processor.merge_size,
+                min_pixels=image_processor.min_pixels,
+                max_pixels=image_processor.max_pixels,
+            )
+            return (resized_height * resized_width, resized_height, resized_width)
         
-        # 解码结果
-        result = self.processor.batch_decode(outputs, skip_special_tokens=True)[0]
+        keys: Dict[int, tuple] = {}
+        failures: Dict[int, str] = {}
+        # 单张图片缺失或损坏时只让该页失败，其余页面照常分桶
+        for index in range(len(images)):
+            try:
+                keys[index] = grid_key(index)
+            except Exception as e:
+                failures[index] = str(e)
         
-        return {
-            "image_path": image_path,
-            "task_type": task_type,
-            "result": result,
-            "image_size": image.size
-        }
+        order = sorted(keys, key=keys.get)
+        batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+        return batches, failures
+    
+    def process_images(
+        self,
+        images: List[Union[str, Image.Image]],
+        task_type: str = "ocr",
+        batch_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        批量识别多张图片，每批打包为一次 generate 调用
+        
+        Args:
+            images: 图片路径或PIL图像列表
+            task_type: 任务类型 (ocr, table, formula, chart)
+            batch_size: 单次 generate 的页数（默认使用初始化时的 batch_size）
+            
+        Returns:
+            与输入顺序一致的识别结果列表，失败的页面包含 error 字段
+        """
+        self.load_model()
+        batch_size = max(1, batch_size or self.batch_size)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+        
+        batches, failures = self._bucket_by_grid(images, batch_size)
+        for index, error in failures.items():
+            image = images[index]
+            print(f"✗ 无法读取图片: {error}")
+            results[index] = {
+                "image_path": image if isinstance(image, str) else None,
+                "error": error
+            }
+        
+        for indices in batches:
+            batch = [images[i] for i in indices]
+            try:
+                batch_results = self._process_batch(batch, task_type)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch_results = [{
+                        "image_path": batch[0] if isinstance(batch[0], str) else None,
+                        "error": str(e)
+                    }]
+                else:
+                    # 批次失败时退回逐页处理，避免一页异常拖累整批
+                    print(f"✗ 批量识别失败，退回逐页处理: {e}")
+                    batch_results = self.process_images(batch, task_type, batch_size=1)
+            for index, result in zip(indices, batch_results):
+                results[index] = result
+        
+        return results
+                
+    def process_image(self, image_path: str, task_type: str = "ocr") -> Dict[str, Any]:
+        """
+        处理单张图片
+        
+        Args:
+            image_path: 图片路径
+            task_type: 任务类型 (ocr, table, formula, chart)
+            
+        Returns:
+            包含识别结果的字典
+        """
+        self.load_model()
+        return self._process_batch([image_path], task_type)[0]
     
     def create_annotated_image(
         self, 
@@ -195,14 +942,18 @@ class OCRProcessor:
         
         print(f"\n开始批量处理 {total} 张图片...")
         
-        for idx, img_path in enumerate(image_paths, 1):
+        ocr_results = self.process_images(image_paths, task_type)
+        
+        for idx, (img_path, ocr_result) in enumerate(zip(image_paths, ocr_results), 1):
             print(f"\n处理进度: {idx}/{total}")
             print(f"当前图片: {Path(img_path).name}")
             
+            if "error" in ocr_result:
+                print(f"✗ 处理失败: {ocr_result['error']}")
+                results.append(ocr_result)
+                continue
+            
             try:
-                # 执行OCR识别
-                ocr_result = self.process_image(img_path, task_type)
-                
                 # 创建带标注的图片
                 img_filename = Path(img_path).stem
                 annotated_path = output_dir / f"{img_filename}_annotated.jpg"
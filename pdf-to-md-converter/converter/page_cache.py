@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+页面级OCR结果缓存模块
+以渲染后页面像素的哈希为键跨文档复用识别结果（封面、法律声明、空白分隔页、信头页等）
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+
+class PageResultCache:
+    """
+    页面识别结果缓存（SQLite存储，按最近访问时间LRU淘汰）
+
+    - 键：页面像素的 BLAKE2b 哈希 + 任务类型 + 模型版本等生成参数
+    - 值：识别文本，命中时跳过视觉编码和解码
+    - 总大小超过 max_bytes 时删除最久未访问的条目
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS page_results (
+        key          TEXT PRIMARY KEY,
+        result       TEXT NOT NULL,
+        size_bytes   INTEGER NOT NULL,
+        last_access  REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_page_results_last_access ON page_results (last_access);
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = 256 * 1024 ** 2):
+        """
+        初始化页面缓存
+
+        Args:
+            db_path: SQLite数据库文件路径
+            max_bytes: 缓存文本总大小上限（字节）
+        """
+        self.db_path = str(db_path)
+        self.max_bytes = max_bytes
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        # 连接在流水线线程和推理线程之间共享，由锁保证串行访问
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            self._total_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(size_bytes), 0) FROM page_results"
+            ).fetchone()[0]
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(image: Image.Image, namespace: str) -> str:
+        """
+        计算页面缓存键
+
+        Args:
+            image: 渲染后的页面图像
+            namespace: 生成参数标识（任务类型、模型版本等）
+
+        Returns:
+            缓存键（十六进制字符串）
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{namespace}|{image.mode}|{image.size[0]}x{image.size[1]}|".encode("utf-8"))
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查找缓存的识别结果（命中时刷新访问时间）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            识别文本，未命中返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM page_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._conn.execute(
+                "UPDATE page_results SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+        return row[0]
+
+    def put(self, key: str, result: str):
+        """
+        写入识别结果
+
+        Args:
+            key: 缓存键
+            result: 识别文本
+        """
+        size = len(result.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size_bytes FROM page_results WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO page_results (key, result, size_bytes, last_access) VALUES (?, ?, ?, ?)",
+                (key, result, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _evict_locked(self):
+        """按最近访问时间淘汰，直到总大小不超过上限（调用方需持有锁）"""
+        rows = self._conn.execute(
+            "SELECT key, size_bytes FROM page_results ORDER BY last_access"
+        )
+        to_delete = []
+        for key, size in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM page_results WHERE key = ?", to_delete)
+        self._evictions += len(to_delete)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            命中/未命中次数、淘汰次数、当前大小
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+                "evictions": self._evictions,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
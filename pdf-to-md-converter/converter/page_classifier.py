@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+页面分类模块
+在推理前用OpenCV对缩小后的页面做廉价统计，识别空白页和纯图片页，跳过视觉编码和解码
+"""
+
+from typing import Any, Dict
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class PageClassifier:
+    """
+    页面分类器
+
+    基于缩小后灰度图的三类统计：
+    - 墨迹密度：暗像素占比
+    - 边缘密度：Canny边缘像素占比
+    - 连通域：二值化后尺寸和长宽比接近字符的连通域数量
+
+    分类结果：
+    - blank：墨迹和边缘都几乎为零（空白页、扫描底噪）
+    - picture：中间调像素占比高且类字符连通域很少（满版照片、插图页）
+    - text：其余页面，正常送入OCR
+    阈值偏保守，拿不准的页面一律判为 text。
+    """
+
+    # 跳过推理的页面使用的占位Markdown
+    PLACEHOLDERS = {
+        "blank": "*（空白页）*",
+        "picture": "*（图片页，未识别文字，请参考页面原图）*",
+    }
+
+    # 默认阈值（可通过构造参数覆盖）
+    DEFAULT_THRESHOLDS = {
+        # 缩放后长边像素数
+        "max_side": 512,
+        # 灰度低于该值视为墨迹
+        "ink_level": 160,
+        # 空白页：墨迹密度与边缘密度上限
+        "blank_max_ink_density": 0.002,
+        "blank_max_edge_density": 0.003,
+        # 纯图片页：中间调像素占比下限、类字符连通域数量上限
+        "picture_min_midtone_ratio": 0.35,
+        "picture_max_text_components": 25,
+        # 类字符连通域的尺寸范围（缩放后像素）与最大长宽比
+        "char_min_height": 3,
+        "char_max_height": 40,
+        "char_max_aspect": 8.0,
+    }
+
+    def __init__(self, **thresholds):
+        """
+        初始化页面分类器
+
+        Args:
+            **thresholds: 覆盖 DEFAULT_THRESHOLDS 中的阈值
+        """
+        unknown = set(thresholds) - set(self.DEFAULT_THRESHOLDS)
+        if unknown:
+            raise ValueError(f"未知的页面分类阈值: {', '.join(sorted(unknown))}")
+        self.thresholds = {**self.DEFAULT_THRESHOLDS, **thresholds}
+
+    def _downscale(self, image: Image.Image) -> np.ndarray:
+        """转换为灰度并按长边缩小"""
+        gray = np.asarray(image.convert("L"))
+        height, width = gray.shape
+        scale = self.thresholds["max_side"] / max(height, width)
+        if scale < 1.0:
+            gray = cv2.resize(
+                gray,
+                (max(1, int(width * scale)), max(1, int(height * scale))),
+                interpolation=cv2.INTER_AREA
+            )
+        return gray
+
+    def _count_text_components(self, gray: np.ndarray) -> int:
+        """统计尺寸和长宽比接近字符的连通域数量"""
+        t = self.thresholds
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        # 第0个连通域是背景
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        aspect = np.maximum(widths, heights) / np.maximum(1, np.minimum(widths, heights))
+        text_like = (
+            (heights >= t["char_min_height"])
+            & (heights <= t["char_max_height"])
+            & (aspect <= t["char_max_aspect"])
+        )
+        return int(text_like.sum())
+
+    def classify(self, image: Image.Image) -> Dict[str, Any]:
+        """
+        对页面分类
+
+        Args:
+            image: 渲染后的页面图像
+
+        Returns:
+            分类结果：kind（blank / picture / text）以及各项统计值
+        """
+        t = self.thresholds
+        gray = self._downscale(image)
+
+        ink_density = float((gray < t["ink_level"]).mean())
+        edge_density = float((cv2.Canny(gray, 50, 150) > 0).mean())
+        midtone_ratio = float(((gray >= 40) & (gray <= 215)).mean())
+
+        stats = {
+            "ink_density": round(ink_density, 5),
+            "edge_density": round(edge_density, 5),
+            "midtone_ratio": round(midtone_ratio, 4),
+        }
+
+        if ink_density <= t["blank_max_ink_density"] and edge_density <= t["blank_max_edge_density"]:
+            return {"kind": "blank", **stats}
+
+        text_components = self._count_text_components(gray)
+        stats["text_components"] = text_components
+
+        if midtone_ratio >= t["picture_min_midtone_ratio"] and text_components <= t["picture_max_text_components"]:
+            return {"kind": "picture", **stats}
+
+        return {"kind": "text", **stats}
@@ -1,71 +1,302 @@
 #!/usr/bin/env python3
 """
 PDF处理模块
-将PDF文件转换为JPG图片
+将PDF文件转换为JPG图片，并识别带有可用文本层的页面（原生数字PDF）
 """
 
 import fitz  # PyMuPDF
+from PIL import Image
 from pathlib import Path
-from typing import List, Tuple
+from statistics import median
+from typing import Any, Dict, Iterator, List, Tuple
 import os
+import re
+
+
+# 页面路由：text（文本层直出Markdown）/ scanned（扫描页，走OCR）/ mixed（文本层+大图，走OCR）/ ocr（未分类，走OCR）
+PAGE_ROUTES = ("text", "scanned", "mixed", "ocr")
+
+# 列表项目符号
+_BULLET_PATTERN = re.compile(r"^[•●▪◦·‣\-\*]\s*")
+
+# 中日韩字符（行间合并时不插入空格）
+_CJK_PATTERN = re.compile(r"[\u3000-\u30ff\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
 
 
 class PDFProcessor:
     """PDF处理器，负责将PDF转换为图片"""
     
-    def __init__(self, dpi: int = 300):
+    def __init__(
+        self,
+        dpi: int = 300,
+        use_text_layer: bool = True,
+        min_text_chars: int = 50,
+        max_image_coverage: float = 0.5,
+        max_invalid_char_ratio: float = 0.05
+    ):
         """
         初始化PDF处理器
         
         Args:
             dpi: 输出图片的DPI（默认300）
+            use_text_layer: 是否对文本层可用的页面直接提取文本（跳过OCR）
+            min_text_chars: 文本层至少包含的字符数，低于该值视为扫描页
+            max_image_coverage: 图片覆盖页面面积的比例上限，超过时视为图文混合页
+            max_invalid_char_ratio: 无法映射为Unicode的字符比例上限（字体缺少ToUnicode时文本层不可用）
         """
         self.dpi = dpi
         self.zoom = dpi / 72  # PDF默认72 DPI
+        self.use_text_layer = use_text_layer
+        self.min_text_chars = min_text_chars
+        self.max_image_coverage = max_image_coverage
+        self.max_invalid_char_ratio = max_invalid_char_ratio
         
-    def pdf_to_images(self, pdf_path: str, output_dir: str) -> List[str]:
+    def classify_page(self, page: "fitz.Page") -> Dict[str, Any]:
         """
-        将PDF转换为JPG图片
+        判断页面的文本层是否可用
+        
+        Args:
+            page: PyMuPDF页面对象
+            
+        Returns:
+            路由信息：route（text / scanned / mixed）以及判断依据
+        """
+        text = page.get_text("text")
+        chars = len("".join(text.split()))
+        invalid_ratio = text.count("\ufffd") / chars if chars else 0.0
+        
+        page_rect = page.rect
+        page_area = abs(page_rect) or 1.0
+        image_area = 0.0
+        for info in page.get_image_info():
+            bbox = fitz.Rect(info["bbox"]) & page_rect
+            image_area += abs(bbox)
+        image_coverage = min(1.0, image_area / page_area)
+        
+        if chars < self.min_text_chars or invalid_ratio > self.max_invalid_char_ratio:
+            route = "scanned"
+        elif image_coverage > self.max_image_coverage:
+            route = "mixed"
+        else:
+            route = "text"
+        
+        return {
+            "route": route,
+            "text_chars": chars,
+            "invalid_char_ratio": round(invalid_ratio, 4),
+            "image_coverage": round(image_coverage, 4),
+        }
+    
+    @staticmethod
+    def _format_span(span: Dict[str, Any]) -> str:
+        """格式化单个文本片段（粗体/斜体）"""
+        text = span["text"]
+        stripped = text.strip()
+        if not stripped:
+            return text
+        flags = span["flags"]
+        if flags & 16:  # 粗体
+            stripped = f"**{stripped}**"
+        elif flags & 2:  # 斜体
+            stripped = f"*{stripped}*"
+        # 保留首尾空白，避免相邻片段粘连
+        leading = text[:len(text) - len(text.lstrip())]
+        trailing = text[len(text.rstrip()):]
+        return f"{leading}{stripped}{trailing}"
+    
+    def page_to_markdown(self, page: "fitz.Page") -> str:
+        """
+        从文本层生成结构化Markdown
+        
+        - 以字符数加权的中位字号作为正文字号，明显更大的短文本块作为标题
+        - 粗体/斜体片段保留为 **粗体** / *斜体*
+        - 项目符号开头的行转换为列表项
+        
+        Args:
+            page: PyMuPDF页面对象
+            
+        Returns:
+            Markdown文本
+        """
+        blocks = [
+            block for block in page.get_text("dict", sort=True)["blocks"]
+            if block.get("type") == 0
+        ]
+        
+        sizes = []
+        for block in blocks:
+            for line in block["lines"]:
+                for span in line["spans"]:
+                    sizes.extend([round(span["size"], 1)] * len(span["text"].strip()))
+        body_size = median(sizes) if sizes else 0.0
+        
+        parts = []
+        for block in blocks:
+            lines = []
+            max_size = 0.0
+            for line in block["lines"]:
+                spans = [span for span in line["spans"] if span["text"]]
+                if not spans:
+                    continue
+                max_size = max(max_size, max(span["size"] for span in spans))
+                lines.append((
+                    "".join(span["text"] for span in spans).strip(),
+                    "".join(self._format_span(span) for span in spans).strip()
+                ))
+            lines = [(plain, formatted) for plain, formatted in lines if plain]
+            if not lines:
+                continue
+            
+            plain_text = " ".join(plain for plain, _ in lines)
+            
+            # 标题：字号明显大于正文的短文本块
+            if body_size and len(plain_text) <= 200 and max_size >= body_size * 1.15:
+                ratio = max_size / body_size
+                level = 1 if ratio >= 1.8 else 2 if ratio >= 1.4 else 3
+                parts.append(f"{'#' * level} {plain_text}")
+                continue
+            
+            # 列表：每行都以项目符号开头
+            if all(_BULLET_PATTERN.match(plain) for plain, _ in lines):
+                parts.append("\n".join(
+                    f"- {_BULLET_PATTERN.sub('', formatted, count=1)}"
+                    for _, formatted in lines
+                ))
+                continue
+            
+            # 段落：合并块内的行，处理行尾连字符断词，中文行之间不加空格
+            paragraph = ""
+            for _, formatted in lines:
+                if not paragraph:
+                    paragraph = formatted
+                elif paragraph.endswith("-") and not paragraph.endswith(" -"):
+                    paragraph = paragraph[:-1] + formatted
+                elif _CJK_PATTERN.match(paragraph[-1]) and _CJK_PATTERN.match(formatted[0]):
+                    paragraph += formatted
+                else:
+                    paragraph += " " + formatted
+            parts.append(paragraph)
+        
+        return "\n\n".join(parts)
+        
+    def render_page(self, page: "fitz.Page", output_dir: Path) -> Tuple[str, Image.Image]:
+        """
+        渲染单个页面并保存为JPG
+        
+        Args:
+            page: PyMuPDF页面对象
+            output_dir: 输出目录
+            
+        Returns:
+            (图片路径, 渲染得到的RGB图像)
+        """
+        # 设置缩放矩阵（提高分辨率）
+        mat = fitz.Matrix(self.zoom, self.zoom)
+        
+        # 渲染页面为图像
+        pix = page.get_pixmap(matrix=mat, alpha=False)
+        
+        # 保存为JPG
+        img_filename = f"page_{page.number + 1:03d}.jpg"
+        img_path = output_dir / img_filename
+        pix.save(str(img_path))
+        
+        image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        return str(img_path), image
+    
+    def iter_pages(self, pdf_path: str, output_dir: str) -> Iterator[Tuple[int, str, Image.Image]]:
+        """
+        逐页渲染PDF（流式），每渲染完一页立即产出
         
         Args:
             pdf_path: PDF文件路径
             output_dir: 输出目录路径
             
-        Returns:
-            生成的图片路径列表
+        Yields:
+            (页码下标, 图片路径, 渲染得到的RGB图像)
         """
-        pdf_path = Path(pdf_path)
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        # 打开PDF文档
         doc = fitz.open(str(pdf_path))
-        image_paths = []
+        try:
+            for page_num in range(len(doc)):
+                page = doc.load_page(page_num)
+                img_path, image = self.render_page(page, output_dir)
+                yield page_num, img_path, image
+        finally:
+            doc.close()
+    
+    def iter_routed_pages(
+        self,
+        pdf_path: str,
+        output_dir: str
+    ) -> Iterator[Tuple[int, str, Image.Image, Dict[str, Any]]]:
+        """
+        逐页渲染PDF并判断路由；文本层可用的页面同时产出文本层Markdown
         
-        print(f"正在转换PDF: {pdf_path.name}")
-        print(f"总页数: {len(doc)}")
+        页面仍然会被渲染，Markdown中的原始图片引用和标注图片保持不变。
+        
+        Args:
+            pdf_path: PDF文件路径
+            output_dir: 输出目录路径
+            
+        Yields:
+            (页码下标, 图片路径, 渲染得到的RGB图像, 路由信息)
+            路由为 text 时路由信息中包含 markdown 字段
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
         
+        doc = fitz.open(str(pdf_path))
         try:
             for page_num in range(len(doc)):
-                # 加载页面
                 page = doc.load_page(page_num)
-                
-                # 设置缩放矩阵（提高分辨率）
-                mat = fitz.Matrix(self.zoom, self.zoom)
-                
-                # 渲染页面为图像
-                pix = page.get_pixmap(matrix=mat, alpha=False)
-                
-                # 保存为JPG
-                img_filename = f"page_{page_num + 1:03d}.jpg"
-                img_path = output_dir / img_filename
-                pix.save(str(img_path))
-                
-                image_paths.append(str(img_path))
-                print(f"  ✓ 页面 {page_num + 1}/{len(doc)} 已转换")
-                
+                if self.use_text_layer:
+                    routing = self.classify_page(page)
+                    if routing["route"] == "text":
+                        routing["markdown"] = self.page_to_markdown(page)
+                else:
+                    routing = {"route": "ocr"}
+                img_path, image = self.render_page(page, output_dir)
+                yield page_num, img_path, image, routing
         finally:
             doc.close()
+    
+    def get_page_count(self, pdf_path: str) -> int:
+        """
+        获取PDF页数
+        
+        Args:
+            pdf_path: PDF文件路径
+            
+        Returns:
+            页数
+        """
+        with fitz.open(str(pdf_path)) as doc:
+            return len(doc)
+    
+    def pdf_to_images(self, pdf_path: str, output_dir: str) -> List[str]:
+        """
+        将PDF转换为JPG图片
+        
+        Args:
+            pdf_path: PDF文件路径
+            output_dir: 输出目录路径
+            
+        Returns:
+            生成的图片路径列表
+        """
+        pdf_path = Path(pdf_path)
+        total = self.get_page_count(str(pdf_path))
+        image_paths = []
+        
+        print(f"正在转换PDF: {pdf_path.name}")
+        print(f"总页数: {total}")
+        
+        for page_num, img_path, _ in self.iter_pages(str(pdf_path), output_dir):
+            image_paths.append(img_path)
+            print(f"  ✓ 页面 {page_num + 1}/{total} 已转换")
             
         print(f"✓ PDF转换完成！生成 {len(image_paths)} 张图片")
         return image_paths
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+流水线模块
+渲染 → 预处理 → OCR推理 三个阶段通过有界队列串联，
+第 N 页解码时第 N+1 页已经在渲染和预处理
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .pdf_processor import PDFProcessor
+from .ocr_processor import OCRProcessor
+from .page_classifier import PageClassifier
+from .profiling import stage_timer
+from .scheduler import ContinuousBatchScheduler
+
+
+# 队列结束标记
+_DONE = object()
+
+
+class StageStats:
+    """单个流水线阶段的统计信息"""
+
+    def __init__(self, name: str, queue_capacity: int = 0):
+        """
+        初始化阶段统计
+
+        Args:
+            name: 阶段名称
+            queue_capacity: 阶段输出队列容量（0表示无输出队列）
+        """
+        self.name = name
+        self.queue_capacity = queue_capacity
+        self.processed = 0
+        self.busy_seconds = 0.0
+        # 等待上游产出（输入队列为空）的时间
+        self.starved_seconds = 0.0
+        # 等待下游消费（输出队列已满）的时间
+        self.blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self._depth_samples = 0
+        self._depth_total = 0
+
+    def observe_depth(self, depth: int):
+        """记录一次输出队列深度采样"""
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._depth_samples += 1
+        self._depth_total += depth
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        导出统计信息
+
+        Returns:
+            可JSON序列化的统计字典
+        """
+        avg_depth = self._depth_total / self._depth_samples if self._depth_samples else 0.0
+        return {
+            "processed": self.processed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "stall_seconds": round(self.starved_seconds + self.blocked_seconds, 3),
+            "starved_seconds": round(self.starved_seconds, 3),
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "queue_capacity": self.queue_capacity,
+            "max_queue_depth": self.max_queue_depth,
+            "avg_queue_occupancy": round(avg_depth / self.queue_capacity, 3) if self.queue_capacity else None,
+        }
+
+
+class PagePipeline:
+    """
+    PDF页面流水线
+
+    - render: PDFProcessor 逐页渲染并判断路由（独立线程），文本层可用的页面直接得到Markdown
+    - preprocess: 需要OCR的页面先经 PageClassifier 过滤空白页/纯图片页，再查询页面缓存，
+      未命中时做 SiglipImageProcessor 视觉预处理（独立线程）
+    - inference: VLM推理（调用 run 的线程，通常是执行器的专用推理线程）；
+      设置了连续批处理调度器时，页面提交给调度线程，与其他任务的页面共享解码批
+
+    阶段之间使用有界队列，内存中同时存在的页面数不超过队列容量之和。
+    每页的 render / preprocess 墙钟与线程CPU耗时记录在识别结果的 timings 中。
+    """
+
+    def __init__(
+        self,
+        pdf_processor: PDFProcessor,
+        ocr_processor: OCRProcessor,
+        task_type: str = "ocr",
+        queue_size: int = 2,
+        page_classifier: Optional[PageClassifier] = None,
+        stage_observer: Optional[Callable[[str, float], None]] = None,
+        scheduler: Optional[ContinuousBatchScheduler] = None
+    ):
+        """
+        初始化流水线
+
+        Args:
+            pdf_processor: PDF处理器
+            ocr_processor: OCR处理器
+            task_type: 任务类型
+            queue_size: 每个阶段间队列的容量
+            page_classifier: 推理前的页面分类器（为None时所有页面都送入OCR）
+            stage_observer: 每页每个阶段完成后接收 (阶段名, 耗时秒) 的回调（用于指标采集）
+            scheduler: 连续批处理调度器（设置后页面逐个提交给调度器，与其他任务的页面一起解码）
+        """
+        self.pdf_processor = pdf_processor
+        self.ocr_processor = ocr_processor
+        self.task_type = task_type
+        self.queue_size = max(1, queue_size)
+        self.page_classifier = page_classifier
+        self.stage_observer = stage_observer
+        self.scheduler = scheduler
+        self.stats: Dict[str, StageStats] = {}
+
+    def _put(self, q: queue.Queue, item: Any, stats: StageStats, stop: threading.Event) -> bool:
+        """向有界队列放入数据，队列满时计入阻塞时间；流水线中止时返回False"""
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                stats.blocked_seconds += time.perf_counter() - start
+                stats.observe_depth(q.qsize())
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue, stats: StageStats, stop: threading.Event) -> Any:
+        """从队列取数据，队列空时计入饥饿时间；流水线中止时返回结束标记"""
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                stats.starved_seconds += time.perf_counter() - start
+                return item
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _render_stage(
+        self,
+        pdf_path: str,
+        output_dir: str,
+        out_queue: queue.Queue,
+        stop: threading.Event,
+        errors: List[BaseException]
+    ):
+        """渲染阶段：逐页渲染并放入预处理队列"""
+        stats = self.stats["render"]
+        try:
+            pages = self.pdf_processor.iter_routed_pages(pdf_path, output_dir)
+            while not stop.is_set():
+                timings: Dict[str, Any] = {}
+                try:
+                    with stage_timer(timings, "render"):
+                        item = next(pages)
+                except StopIteration:
+                    break
+                elapsed = timings["render"]["wall_ms"] / 1000
+                stats.busy_seconds += elapsed
+                stats.processed += 1
+                if self.stage_observer is not None:
+                    self.stage_observer("render", elapsed)
+                if not self._put(out_queue, item + (timings,), stats, stop):
+                    break
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            self._put(out_queue, _DONE, stats, stop)
+
+    def _preprocess_stage(
+        self,
+        in_queue: queue.Queue,
+        out_queue: queue.Queue,
+        stop: threading.Event
+    ):
+        """预处理阶段：对渲染好的页面做视觉预处理并放入推理队列"""
+        stats = self.stats["preprocess"]
+        render_stats = self.stats["render"]
+        try:
+            while True:
+                item = self._get(in_queue, stats, stop)
+                if item is _DONE:
+                    break
+                render_stats.observe_depth(in_queue.qsize())
+                page_index, img_path, image, routing, timings = item
+                # 整个阶段（分类 + 缓存查询 + 视觉预处理）计入 preprocess，覆盖 prepare_page 内部的计时
+                with stage_timer(timings, "preprocess"):
+                    if "markdown" in routing:
+                        # 文本层直出，不经过视觉预处理和推理
+                        page = {"image_path": img_path, "image_size": image.size, "text_result": routing.pop("markdown")}
+                    else:
+                        try:
+                            page = self._prepare_ocr_page(image, img_path, routing)
+                        except Exception as e:
+                            page = {"image_path": img_path, "image_size": image.size, "error": str(e)}
+                page["index"] = page_index
+                page["routing"] = routing
+                page["timings"] = timings
+                elapsed = timings["preprocess"]["wall_ms"] / 1000
+                stats.busy_seconds += elapsed
+                stats.processed += 1
+                if self.stage_observer is not None:
+                    self.stage_observer("preprocess", elapsed)
+                if not self._put(out_queue, page, stats, stop):
+                    break
+        finally:
+            self._put(out_queue, _DONE, stats, stop)
+
+    def _prepare_ocr_page(self, image, img_path: str, routing: Dict[str, Any]) -> Dict[str, Any]:
+        """为需要OCR的页面做分类和预处理；空白页/纯图片页直接给出占位Markdown"""
+        if self.page_classifier is not None:
+            page_class = self.page_classifier.classify(image)
+            routing["page_class"] = page_class
+            placeholder = PageClassifier.PLACEHOLDERS.get(page_class["kind"])
+            if placeholder is not None:
+                routing["route"] = page_class["kind"]
+                return {"image_path": img_path, "image_size": image.size, "text_result": placeholder}
+        return self.ocr_processor.prepare_page(image, self.task_type, image_path=img_path)
+    
+    def _next_batch(self, in_queue: queue.Queue, stop: threading.Event) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        取出下一批待推理页面：阻塞等待第一页，其余页只取已就绪的，不为凑批而等待
+
+        Returns:
+            (页面列表, 上游是否已结束)
+        """
+        stats = self.stats["inference"]
+        batch = []
+        item = self._get(in_queue, stats, stop)
+        if item is _DONE:
+            return batch, True
+        batch.append(item)
+        while len(batch) < self.ocr_processor.batch_size:
+            try:
+                item = in_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    @staticmethod
+    def _settled_result(page: Dict[str, Any], task_type: str) -> Optional[Dict[str, Any]]:
+        """不需要推理的页面（预处理失败、文本层直出、空白页/纯图片页）直接给出结果，其余返回None"""
+        if "error" in page:
+            return {"image_path": page["image_path"], "error": page["error"]}
+        if "text_result" in page:
+            return {
+                "image_path": page["image_path"],
+                "task_type": task_type,
+                "result": page["text_result"],
+                "image_size": page["image_size"],
+                "timings": page["timings"]
+            }
+        return None
+
+    def _run_batches(self, in_queue: queue.Queue, stop: threading.Event, finish: Callable):
+        """推理阶段：在当前线程中逐批 generate"""
+        stats = self.stats["inference"]
+        done = False
+        while not done:
+            batch, done = self._next_batch(in_queue, stop)
+            self.stats["preprocess"].observe_depth(in_queue.qsize())
+            if not batch:
+                continue
+
+            batch_results = []
+            ready = []
+            for page in batch:
+                result = self._settled_result(page, self.task_type)
+                if result is None:
+                    ready.append(page)
+                else:
+                    batch_results.append((page, result))
+
+            if ready:
+                start = time.perf_counter()
+                try:
+                    ocr_results = self.ocr_processor.process_prepared(ready, self.task_type)
+                except Exception as e:
+                    ocr_results = [
+                        {"image_path": page["image_path"], "error": str(e)}
+                        for page in ready
+                    ]
+                stats.busy_seconds += time.perf_counter() - start
+                batch_results.extend(zip(ready, ocr_results))
+
+            for page, result in batch_results:
+                finish(page, result)
+
+    def _run_scheduled(self, in_queue: queue.Queue, stop: threading.Event, finish: Callable):
+        """
+        推理阶段：页面就绪后立即提交给连续批处理调度器，不等待前一页完成
+
+        同时在途的页面数不超过调度器批大小加队列容量；inference 的 busy_seconds
+        为各页从提交到完成的时间之和（页面之间相互重叠）
+        """
+        stats = self.stats["inference"]
+        completed: queue.Queue = queue.Queue()
+        submitted: Dict[int, float] = {}
+        futures: Dict[int, Any] = {}
+        limit = self.scheduler.max_batch_size + self.queue_size
+        upstream_done = False
+
+        def collect(page: Dict[str, Any], future):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"image_path": page["image_path"], "error": str(e)}
+            completed.put((page, result))
+
+        def drain(block: bool):
+            while submitted:
+                try:
+                    page, result = completed.get(block=block)
+                except queue.Empty:
+                    return
+                stats.busy_seconds += time.perf_counter() - submitted.pop(page["index"])
+                futures.pop(page["index"], None)
+                finish(page, result)
+                block = False
+
+        try:
+            while not upstream_done or submitted:
+                drain(block=upstream_done or len(submitted) >= limit)
+                if upstream_done or len(submitted) >= limit:
+                    continue
+
+                start = time.perf_counter()
+                try:
+                    page = in_queue.get(timeout=0.05)
+                except queue.Empty:
+                    if not submitted:
+                        stats.starved_seconds += time.perf_counter() - start
+                    if stop.is_set():
+                        break
+                    continue
+                if page is _DONE:
+                    upstream_done = True
+                    continue
+                self.stats["preprocess"].observe_depth(in_queue.qsize())
+
+                result = self._settled_result(page, self.task_type)
+                if result is not None:
+                    finish(page, result)
+                    continue
+                submitted[page["index"]] = time.perf_counter()
+                try:
+                    future = self.scheduler.submit(page, self.task_type)
+                except Exception as e:
+                    submitted.pop(page["index"])
+                    finish(page, {"image_path": page["image_path"], "error": str(e)})
+                    continue
+                futures[page["index"]] = future
+                future.add_done_callback(lambda f, page=page: collect(page, f))
+        finally:
+            # 提前退出（渲染出错或回调异常）时取消仍在调度器中的页面，
+            # 并等它们的回调全部触发，避免 run 返回后还占用解码槽位或写入结果
+            for future in list(futures.values()):
+                self.scheduler.cancel(future)
+            while submitted:
+                page, _ = completed.get()
+                submitted.pop(page["index"], None)
+
+    def run(
+        self,
+        pdf_path: str,
+        output_dir: str,
+        on_page: Optional[Callable[[int, int, Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        运行流水线（推理阶段在当前线程执行，或提交给连续批处理调度器）
+
+        Args:
+            pdf_path: PDF文件路径
+            output_dir: 页面图片输出目录
+            on_page: 每页识别完成后的回调 (页码下标, 总页数, 识别结果)
+
+        Returns:
+            按页码排序的识别结果列表
+        """
+        self.ocr_processor.load_model()
+        total = self.pdf_processor.get_page_count(pdf_path)
+
+        self.stats = {
+            "render": StageStats("render", self.queue_size),
+            "preprocess": StageStats("preprocess", self.queue_size),
+            "inference": StageStats("inference"),
+        }
+
+        render_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        preprocess_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        threads = [
+            threading.Thread(
+                target=self._render_stage,
+                args=(pdf_path, output_dir, render_queue, stop, errors),
+                name="pipeline-render",
+                daemon=True,
+            ),
+            threading.Thread(
+                target=self._preprocess_stage,
+                args=(render_queue, preprocess_queue, stop),
+                name="pipeline-preprocess",
+                daemon=True,
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+
+        stats = self.stats["inference"]
+        results: Dict[int, Dict[str, Any]] = {}
+
+        def finish(page: Dict[str, Any], result: Dict[str, Any]):
+            # 记录页面路由决策和各阶段耗时，随识别结果一起写入 ocr_results.json
+            result["route"] = page["routing"]["route"]
+            result["routing"] = page["routing"]
+            result.setdefault("timings", page["timings"])
+            stats.processed += 1
+            results[page["index"]] = result
+            if on_page is not None:
+                on_page(page["index"], total, result)
+
+        try:
+            if self.scheduler is not None:
+                self._run_scheduled(preprocess_queue, stop, finish)
+            else:
+                self._run_batches(preprocess_queue, stop, finish)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+        return [results[index] for index in sorted(results)]
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各阶段统计
+
+        Returns:
+            {阶段名: 统计字典}
+        """
+        return {name: stage.to_dict() for name, stage in self.stats.items()}
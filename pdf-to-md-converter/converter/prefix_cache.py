@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+前缀KV缓存模块
+对话模板中图像token位于任务指令（如 "OCR with format:"）之前，同一页面换任务类型时
+整段图像前缀的KV完全相同。这里缓存预填充图像前缀后的KV快照：
+之后同一页面的每个任务只需复制一份快照，再预填充几个token的任务指令后缀即可开始解码。
+快照常驻在模型所在设备上，按内存占用LRU淘汰。
+"""
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import torch
+
+
+class PrefixKVCache:
+    """
+    图像前缀KV缓存（内存LRU，按KV张量字节数计算占用）
+
+    - 键：前缀token序列 + 图像像素的 BLAKE2b 哈希 + 模型版本与推理数值配置
+    - 值：预填充前缀后的 DynamicCache 快照（只读，使用时通过 fork 复制）
+    - 总占用超过 max_bytes 时淘汰最久未使用的快照
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 ** 2):
+        """
+        初始化前缀缓存
+
+        Args:
+            max_bytes: 快照总占用上限（字节）
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(prefix_ids: torch.Tensor, pixel_values: torch.Tensor, namespace: str) -> str:
+        """
+        计算前缀缓存键
+
+        Args:
+            prefix_ids: 前缀token序列
+            pixel_values: 前缀中图像的 patch 像素
+            namespace: 模型版本与推理数值配置标识
+
+        Returns:
+            缓存键（十六进制字符串）
+        """
+        pixels = pixel_values.detach().contiguous().cpu()
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{namespace}|{tuple(pixels.shape)}|{pixels.dtype}|".encode("utf-8"))
+        digest.update(",".join(str(t) for t in prefix_ids.reshape(-1).tolist()).encode("utf-8"))
+        digest.update(pixels.view(torch.uint8).numpy().tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def fork(snapshot: Any) -> Any:
+        """
+        复制快照供一次 generate 使用（generate 会向缓存追加后缀和生成的token）
+
+        Args:
+            snapshot: 前缀KV快照
+
+        Returns:
+            独立的KV缓存副本
+        """
+        return copy.deepcopy(snapshot)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        查找前缀快照（命中时移到LRU末尾）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            可直接传给 generate 的KV缓存副本，未命中返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return self.fork(entry[0])
+
+    def put(self, key: str, snapshot: Any, size_bytes: int):
+        """
+        保存前缀快照（调用方之后不得再修改该快照）
+
+        Args:
+            key: 缓存键
+            snapshot: 预填充前缀后的KV缓存
+            size_bytes: 快照中KV张量的总字节数
+        """
+        if size_bytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (snapshot, size_bytes)
+            self._total_bytes += size_bytes
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted
+                self._evictions += 1
+
+    def clear(self):
+        """清空所有快照"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            命中/未命中次数、淘汰次数、快照数与当前占用
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+                "evictions": self._evictions,
+                "entries": len(self._entries),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+性能分析模块
+通过前向钩子拆分一次 generate 的耗时：视觉编码 / 预填充 / 逐token解码
+"""
+
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+import torch
+
+
+def peak_rss_mb() -> float:
+    """
+    当前进程的峰值常驻内存（MB）
+
+    Returns:
+        峰值RSS
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位是KB，macOS 上单位是字节
+    if sys.platform == "darwin":
+        return peak / 1024 ** 2
+    return peak / 1024
+
+
+@contextmanager
+def stage_timer(timings: Dict[str, Any], stage: str, thread_cpu: bool = True) -> Iterator[None]:
+    """
+    记录一个阶段的墙钟时间和CPU时间，写入 timings[stage]
+
+    Args:
+        timings: 计时结果字典
+        stage: 阶段名
+        thread_cpu: True 时统计当前线程的CPU时间；False 时统计整个进程的CPU时间
+            （适用于内部使用多线程的计算，如 torch 算子）
+    """
+    cpu_clock = time.thread_time if thread_cpu else time.process_time
+    wall_start, cpu_start = time.perf_counter(), cpu_clock()
+    try:
+        yield
+    finally:
+        timings[stage] = {
+            "wall_ms": round((time.perf_counter() - wall_start) * 1000, 2),
+            "cpu_ms": round((cpu_clock() - cpu_start) * 1000, 2),
+        }
+
+
+class GenerationProfiler:
+    """
+    generate 耗时分析器（上下文管理器）
+
+    - 视觉编码：model.visual 与 model.mlp_AR 的前向耗时之和
+    - 预填充：第一次整体前向耗时减去视觉编码耗时
+    - 解码：其余每次整体前向各生成一个token
+    每个阶段同时记录墙钟时间和进程CPU时间（torch算子在内部线程池中执行，按进程统计）
+
+    用法:
+        with GenerationProfiler(model) as profiler:
+            model.generate(...)
+        stats = profiler.summary()
+    """
+
+    def __init__(self, model: torch.nn.Module, synchronize: bool = True):
+        """
+        初始化分析器
+
+        Args:
+            model: PaddleOCRVLForConditionalGeneration 模型
+            synchronize: GPU上每次计时前是否同步设备（基准测试开启以保证准确；
+                线上常驻采集时关闭，避免打断异步执行）
+        """
+        self.model = model
+        self._sync = synchronize and torch.cuda.is_available()
+        self._handles = []
+        self._starts: Dict[int, Tuple[float, float]] = {}
+        self.vision_seconds = 0.0
+        self.vision_cpu_seconds = 0.0
+        self.forward_seconds: List[float] = []
+        self.forward_cpu_seconds: List[float] = []
+
+    def _now(self) -> Tuple[float, float]:
+        """同步设备后取 (墙钟时间, 进程CPU时间)，保证GPU上的计时准确"""
+        if self._sync:
+            torch.cuda.synchronize()
+        return time.perf_counter(), time.process_time()
+
+    def _elapsed(self, module) -> Tuple[float, float]:
+        """模块本次前向的 (墙钟耗时, CPU耗时)"""
+        wall_start, cpu_start = self._starts.pop(id(module))
+        wall_end, cpu_end = self._now()
+        return wall_end - wall_start, cpu_end - cpu_start
+
+    def _pre_hook(self, module, args):
+        self._starts[id(module)] = self._now()
+
+    def _vision_hook(self, module, args, output):
+        wall, cpu = self._elapsed(module)
+        self.vision_seconds += wall
+        self.vision_cpu_seconds += cpu
+
+    def _forward_hook(self, module, args, output):
+        wall, cpu = self._elapsed(module)
+        self.forward_seconds.append(wall)
+        self.forward_cpu_seconds.append(cpu)
+
+    def __enter__(self) -> "GenerationProfiler":
+        self.reset()
+        for module in (self.model.visual, self.model.mlp_AR):
+            self._handles.append(module.register_forward_pre_hook(self._pre_hook))
+            self._handles.append(module.register_forward_hook(self._vision_hook))
+        self._handles.append(self.model.register_forward_pre_hook(self._pre_hook))
+        self._handles.append(self.model.register_forward_hook(self._forward_hook))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+        return False
+
+    def reset(self):
+        """清空已记录的耗时"""
+        self._starts.clear()
+        self.vision_seconds = 0.0
+        self.vision_cpu_seconds = 0.0
+        self.forward_seconds = []
+        self.forward_cpu_seconds = []
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        汇总一次 generate 的耗时
+
+        Returns:
+            vision_ms / prefill_ms / decode_ms（墙钟）、对应的 *_cpu_ms（CPU）、
+            decode_steps / decode_tokens_per_second
+        """
+        if not self.forward_seconds:
+            return {}
+        prefill = self.forward_seconds[0] - self.vision_seconds
+        prefill_cpu = self.forward_cpu_seconds[0] - self.vision_cpu_seconds
+        decode = sum(self.forward_seconds[1:])
+        decode_cpu = sum(self.forward_cpu_seconds[1:])
+        steps = len(self.forward_seconds) - 1
+        return {
+            "vision_ms": round(self.vision_seconds * 1000, 2),
+            "prefill_ms": round(prefill * 1000, 2),
+            "decode_ms": round(decode * 1000, 2),
+            "vision_cpu_ms": round(self.vision_cpu_seconds * 1000, 2),
+            "prefill_cpu_ms": round(prefill_cpu * 1000, 2),
+            "decode_cpu_ms": round(decode_cpu * 1000, 2),
+            "decode_steps": steps,
+            "decode_tokens_per_second": round(steps / decode, 2) if decode > 0 else None,
+        }
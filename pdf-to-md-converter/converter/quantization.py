@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+量化模块
+CPU推理节点上 bf16 矩阵乘通常很慢（部分CPU只能软件模拟），
+int8 动态量化把语言模型中的线性层换成 int8 权重 + 运行时按行量化激活的 fbgemm/qnnpack 内核：
+- 量化范围：每个 Ernie4_5DecoderLayer 的 self_attn（q/k/v/o 投影）与 mlp（gate/up/down 投影），以及 lm_head
+- 视觉编码器、投影层、词嵌入和 RMSNorm 保持 fp32
+- 量化后的完整 state dict 缓存在磁盘上，之后加载时直接构造量化结构并载入，
+  跳过原始权重读取、随机初始化和逐层量化
+
+视觉编码器另有独立的 int8 仅权重量化：SiglipAttention 与 SiglipMLP 的投影层权重按输出通道对称量化为 int8，
+激活保持原精度（bf16/fp32），与语言模型的量化模式可以任意组合。
+"""
+
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.ao.nn.quantized import dynamic as nnqd
+from torch.ao.quantization import quantize_dynamic
+from transformers import AutoConfig, AutoModelForCausalLM
+from transformers.modeling_utils import no_init_weights
+
+
+# 支持的语言模型量化模式
+QUANTIZATION_MODES = ("none", "int8-dynamic")
+
+# 支持的视觉编码器量化模式
+VISION_QUANTIZATION_MODES = ("none", "int8-weight-only")
+
+# 量化缓存文件格式版本（量化范围或存储格式变化时递增）
+QUANTIZED_FORMAT_VERSION = 1
+
+
+def language_model_linear_scopes(model: nn.Module) -> List[str]:
+    """
+    需要量化的语言模型子模块名
+
+    Args:
+        model: PaddleOCRVLForConditionalGeneration 模型
+
+    Returns:
+        子模块全名列表（注意力、MLP 与 lm_head）
+    """
+    scopes = []
+    for idx, layer in enumerate(model.model.layers):
+        scopes.append(f"model.layers.{idx}.self_attn")
+        scopes.append(f"model.layers.{idx}.mlp")
+    scopes.append("lm_head")
+    return scopes
+
+
+def _iter_scope_linears(model: nn.Module, scopes: List[str]) -> Iterator[tuple]:
+    """遍历量化范围内的 nn.Linear，产出 (父模块, 属性名)"""
+    for scope in scopes:
+        module = model.get_submodule(scope)
+        if isinstance(module, nn.Linear):
+            parent_name, _, attr = scope.rpartition(".")
+            yield (model.get_submodule(parent_name) if parent_name else model), attr
+            continue
+        for name, child in list(module.named_modules()):
+            if isinstance(child, nn.Linear):
+                parent_name, _, attr = name.rpartition(".")
+                yield (module.get_submodule(parent_name) if parent_name else module), attr
+
+
+def quantize_language_model(model: nn.Module) -> nn.Module:
+    """
+    对语言模型做 int8 动态量化（原地修改）
+
+    Args:
+        model: fp32 的 PaddleOCRVLForConditionalGeneration 模型
+
+    Returns:
+        量化后的模型
+    """
+    return quantize_dynamic(
+        model,
+        qconfig_spec=set(language_model_linear_scopes(model)),
+        dtype=torch.qint8,
+        inplace=True,
+    )
+
+
+def build_quantized_skeleton(model: nn.Module) -> nn.Module:
+    """
+    把量化范围内的 nn.Linear 换成空的动态量化线性层（不做校准，只搭结构），
+    随后用 load_state_dict 载入缓存的量化权重
+
+    Args:
+        model: fp32 的 PaddleOCRVLForConditionalGeneration 模型
+
+    Returns:
+        结构与 quantize_language_model 结果一致的模型
+    """
+    for parent, attr in list(_iter_scope_linears(model, language_model_linear_scopes(model))):
+        linear = getattr(parent, attr)
+        setattr(parent, attr, nnqd.Linear(
+            linear.in_features,
+            linear.out_features,
+            bias_=linear.bias is not None,
+            dtype=torch.qint8,
+        ))
+    return model
+
+
+def quantized_cache_path(cache_dir: str, mode: str, revision: str) -> Path:
+    """
+    量化state dict缓存文件路径（按模型版本指纹和 torch 版本区分）
+
+    Args:
+        cache_dir: 缓存目录
+        mode: 量化模式
+        revision: 模型版本指纹
+
+    Returns:
+        缓存文件路径
+    """
+    torch_version = torch.__version__.split("+")[0]
+    return Path(cache_dir) / f"{mode}-v{QUANTIZED_FORMAT_VERSION}-{revision}-torch{torch_version}.pt"
+
+
+def load_quantized_model(model_path: str, path: Path) -> Optional[nn.Module]:
+    """
+    从缓存加载量化模型：按配置构造模型结构（跳过随机初始化和原始权重读取），
+    替换为量化线性层后载入缓存的完整 state dict
+
+    Args:
+        model_path: 模型目录（提供配置和远程代码）
+        path: 缓存文件路径
+
+    Returns:
+        量化后的模型，缓存不存在或加载失败时返回None
+    """
+    if not path.exists():
+        return None
+    try:
+        config = AutoConfig.from_pretrained(model_path, trust_remote_code=True)
+        with no_init_weights():
+            model = AutoModelForCausalLM.from_config(
+                config, trust_remote_code=True, torch_dtype=torch.float32
+            )
+        build_quantized_skeleton(model)
+        state = torch.load(path, map_location="cpu", weights_only=False)
+        model.load_state_dict(state, strict=True)
+        return model.eval()
+    except Exception as e:
+        print(f"⚠️ 量化缓存加载失败，将重新量化: {e}")
+        return None
+
+
+def save_quantized_state(model: nn.Module, path: Path) -> Optional[Path]:
+    """
+    保存量化后的 state dict（原子写入，目录不可写时跳过）
+
+    Args:
+        model: 量化后的模型
+        path: 缓存文件路径
+
+    Returns:
+        写入的路径，失败时返回None
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".part")
+        torch.save(model.state_dict(), tmp)
+        tmp.replace(path)
+        return path
+    except OSError as e:
+        print(f"⚠️ 量化缓存保存失败: {e}")
+        return None
+
+
+class WeightOnlyInt8Linear(nn.Module):
+    """
+    int8 仅权重量化线性层
+
+    权重按输出通道对称量化（scale = absmax / 127），前向时激活保持输入精度：
+    - CPU上优先使用 torch._weight_int8pack_mm 内核，直接以 int8 权重计算
+    - 内核不可用（GPU，或 torch 版本不支持）时按输出通道分块反量化：每次只把 fallback_chunk_rows 行权重
+      转为激活精度参与矩阵乘，常驻内存仍是 int8 权重，临时占用与整块权重无关；
+      但每次前向都要重新反量化，速度比不量化更慢，只适合内存受限的场景
+    """
+
+    # 当前 torch 是否可以使用 int8pack 内核（首次调用失败后关闭）
+    use_int8pack_kernel = hasattr(torch, "_weight_int8pack_mm")
+
+    # 回退路径每块反量化的输出通道数
+    fallback_chunk_rows = 1024
+
+    def __init__(self, linear: nn.Linear):
+        """
+        由浮点线性层构造
+
+        Args:
+            linear: 原始 nn.Linear
+        """
+        super().__init__()
+        self.in_features = linear.in_features
+        self.out_features = linear.out_features
+        weight = linear.weight.detach().float()
+        scale = weight.abs().amax(dim=1).clamp(min=1e-8) / 127.0
+        # 量化权重和scale作为缓冲区保存，不计入浮点参数（模型 dtype 推断不受影响）
+        self.register_buffer("weight_int8", torch.round(weight / scale[:, None]).clamp(-127, 127).to(torch.int8))
+        self.register_buffer("scale", scale)
+        self.bias = linear.bias
+
+    def dequantize(self) -> torch.Tensor:
+        """还原为fp32权重（用于数值对比）"""
+        return self.weight_int8.float() * self.scale[:, None]
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        scale = self.scale.to(x.dtype)
+        out = None
+        if x.device.type == "cpu" and WeightOnlyInt8Linear.use_int8pack_kernel:
+            try:
+                out = torch._weight_int8pack_mm(x.reshape(-1, self.in_features), self.weight_int8, scale)
+                out = out.reshape(*x.shape[:-1], self.out_features)
+            except RuntimeError as e:
+                print(f"⚠️ int8pack 内核不可用，回退到分块反量化矩阵乘: {e}")
+                WeightOnlyInt8Linear.use_int8pack_kernel = False
+        if out is None:
+            out = self._chunked_linear(x, scale)
+        if self.bias is not None:
+            out = out + self.bias
+        return out
+
+    def _chunked_linear(self, x: torch.Tensor, scale: torch.Tensor) -> torch.Tensor:
+        """逐块反量化输出通道并做矩阵乘，避免一次性生成整块浮点权重"""
+        rows = self.fallback_chunk_rows
+        if self.out_features <= rows:
+            return F.linear(x, self.weight_int8.to(x.dtype)) * scale
+        return torch.cat(
+            [
+                F.linear(x, self.weight_int8[start:start + rows].to(x.dtype)) * scale[start:start + rows]
+                for start in range(0, self.out_features, rows)
+            ],
+            dim=-1,
+        )
+
+    @staticmethod
+    def int8_kernel_available(device: torch.device) -> bool:
+        """
+        该设备上是否可以直接用 int8 权重计算（否则走分块反量化回退路径）
+
+        Args:
+            device: 模型所在设备
+
+        Returns:
+            CPU 且 torch 提供 _weight_int8pack_mm 时为True
+        """
+        return torch.device(device).type == "cpu" and WeightOnlyInt8Linear.use_int8pack_kernel
+
+    def extra_repr(self) -> str:
+        return f"in_features={self.in_features}, out_features={self.out_features}, bias={self.bias is not None}"
+
+
+def vision_linear_scopes(model: nn.Module) -> List[str]:
+    """
+    视觉编码器中需要量化的子模块名
+
+    Args:
+        model: PaddleOCRVLForConditionalGeneration 模型
+
+    Returns:
+        子模块全名列表（每层的 self_attn 与 mlp）
+    """
+    scopes = []
+    for idx, _ in enumerate(model.visual.vision_model.encoder.layers):
+        scopes.append(f"visual.vision_model.encoder.layers.{idx}.self_attn")
+        scopes.append(f"visual.vision_model.encoder.layers.{idx}.mlp")
+    return scopes
+
+
+def quantize_vision_tower(model: nn.Module) -> nn.Module:
+    """
+    对视觉编码器做 int8 仅权重量化（原地修改，逐通道absmax，耗时很短，无需缓存）
+
+    Args:
+        model: PaddleOCRVLForConditionalGeneration 模型
+
+    Returns:
+        量化后的模型
+    """
+    device = next(model.visual.parameters()).device
+    if not WeightOnlyInt8Linear.int8_kernel_available(device):
+        print(f"⚠️ {device} 上没有可用的 int8 仅权重矩阵乘内核，视觉编码器将在每次前向时分块反量化："
+              f"只节省权重内存，推理会比不量化更慢")
+    for parent, attr in list(_iter_scope_linears(model, vision_linear_scopes(model))):
+        setattr(parent, attr, WeightOnlyInt8Linear(getattr(parent, attr)))
+    return model
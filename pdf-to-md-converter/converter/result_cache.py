@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+转换结果缓存模块
+以 PDF内容的SHA-256 + 处理参数 为键缓存完整的输出目录，重复上传同一文件时直接复用
+"""
+
+import hashlib
+import json
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+# 缓存条目格式版本，输出目录结构变化时递增以废弃旧条目
+CACHE_FORMAT_VERSION = 1
+
+# 条目元数据文件名（与输出文件放在同一目录中）
+ENTRY_FILE = "cache_entry.json"
+
+
+class ConversionCache:
+    """
+    转换结果缓存
+
+    - 每个缓存键对应 cache_dir 下的一个目录，保存一次成功转换的全部输出文件
+    - 条目写入先落到临时目录再原子重命名，并发写入同一键时后到者直接放弃
+    - 淘汰策略：超过 max_age_seconds 未访问的条目过期；总大小超过 max_bytes 时按最近访问时间淘汰
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 2 * 1024 ** 3,
+        max_age_seconds: float = 30 * 24 * 3600
+    ):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存根目录
+            max_bytes: 缓存总大小上限（字节）
+            max_age_seconds: 条目最长保留时间（按最近访问时间计算）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(content_sha256: str, settings: Dict[str, Any]) -> str:
+        """
+        计算缓存键
+
+        Args:
+            content_sha256: PDF文件内容的SHA-256
+            settings: 影响输出的处理参数（DPI、任务类型、模型版本、预处理配置等）
+
+        Returns:
+            缓存键（十六进制字符串）
+        """
+        payload = json.dumps(
+            {"version": CACHE_FORMAT_VERSION, "content": content_sha256, "settings": settings},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        """缓存键对应的条目目录"""
+        return self.cache_dir / key[:2] / key
+
+    @staticmethod
+    def _read_entry(entry_dir: Path) -> Optional[Dict[str, Any]]:
+        """读取条目元数据，条目不存在或损坏时返回None"""
+        try:
+            with open(entry_dir / ENTRY_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_entry(entry_dir: Path, entry: Dict[str, Any]):
+        """写入条目元数据"""
+        tmp_path = entry_dir / f"{ENTRY_FILE}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(entry_dir / ENTRY_FILE)
+
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        """目录下所有文件的总大小"""
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        查找缓存条目（命中时刷新访问时间）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            条目元数据（包含 source_task_id、size_bytes 等），未命中返回None
+        """
+        entry_dir = self._entry_dir(key)
+        entry = self._read_entry(entry_dir)
+        now = time.time()
+
+        if entry is not None and now - entry["last_access"] > self.max_age_seconds:
+            self._remove(entry_dir)
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+
+        entry["last_access"] = now
+        entry["hits"] = entry.get("hits", 0) + 1
+        self._write_entry(entry_dir, entry)
+        return entry
+
+    def materialize(self, key: str, dest_dir: str) -> bool:
+        """
+        将缓存条目复制为新任务的输出目录
+
+        Args:
+            key: 缓存键
+            dest_dir: 目标输出目录（不能已存在）
+
+        Returns:
+            是否复制成功（条目在此期间被淘汰时返回False）
+        """
+        entry_dir = self._entry_dir(key)
+        try:
+            shutil.copytree(entry_dir, dest_dir, ignore=shutil.ignore_patterns(f"{ENTRY_FILE}*"))
+        except (OSError, shutil.Error):
+            shutil.rmtree(dest_dir, ignore_errors=True)
+            return False
+        return True
+
+    def store(self, key: str, output_dir: str, source_task_id: str) -> bool:
+        """
+        将一次成功转换的输出目录写入缓存
+
+        Args:
+            key: 缓存键
+            output_dir: 任务输出目录
+            source_task_id: 产生该输出的任务ID
+
+        Returns:
+            是否写入（条目已存在时返回False）
+        """
+        entry_dir = self._entry_dir(key)
+        if (entry_dir / ENTRY_FILE).exists():
+            return False
+
+        entry_dir.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dir = entry_dir.parent / f".{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copytree(output_dir, tmp_dir)
+            now = time.time()
+            self._write_entry(tmp_dir, {
+                "key": key,
+                "source_task_id": source_task_id,
+                "created_at": now,
+                "last_access": now,
+                "hits": 0,
+                "size_bytes": self._dir_size(tmp_dir),
+            })
+            tmp_dir.rename(entry_dir)
+        except OSError:
+            # 并发写入同一键时目标目录已存在，放弃本次写入
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+
+        with self._lock:
+            self._stores += 1
+        self.evict()
+        return True
+
+    def _remove(self, entry_dir: Path):
+        """删除条目目录"""
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        with self._lock:
+            self._evictions += 1
+
+    def evict(self) -> int:
+        """
+        执行淘汰：先删除过期条目，再按最近访问时间淘汰直到总大小不超过上限
+
+        Returns:
+            淘汰的条目数
+        """
+        now = time.time()
+        entries = []
+        removed = 0
+        for entry_dir in self.cache_dir.glob("*/*"):
+            if not entry_dir.is_dir() or entry_dir.name.startswith("."):
+                continue
+            entry = self._read_entry(entry_dir)
+            if entry is None or now - entry["last_access"] > self.max_age_seconds:
+                self._remove(entry_dir)
+                removed += 1
+                continue
+            entries.append((entry["last_access"], entry["size_bytes"], entry_dir))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            self._remove(entry_dir)
+            total -= size
+            removed += 1
+
+        if removed:
+            print(f"✓ 转换缓存淘汰 {removed} 个条目，当前大小 {total / 1024 ** 2:.1f} MB")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            命中/未命中次数、写入与淘汰次数、命中率
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age_seconds,
+            }
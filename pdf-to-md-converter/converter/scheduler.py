@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""
+连续批处理调度模块
+多个任务同时在跑时，每个任务各自逐页 generate，模型在 Python 层的逐步循环之间大部分时间处于空闲。
+ContinuousBatchScheduler 在模型前面维护一个跨任务的解码批：
+- 新页面在有空闲槽位时立即预填充并加入正在运行的解码批，不必等整批结束
+- 每条序列独立判断结束（EOS、max_new_tokens、重复循环、单页时间预算），
+  结束的序列立即退出并交付结果，其余序列继续解码
+- mRoPE 位置由调度器逐序列记录：预填充时由 get_rope_index 得到每条序列自己的 rope_delta，
+  解码时按 (缓存长度 + rope_delta) 显式构造 position_ids，不依赖模型上的单序列 rope_deltas 状态
+
+只支持贪心解码（与模型的生成配置一致）。
+"""
+
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from typing import Any, Dict, List, Optional
+
+import torch
+
+from .ocr_processor import OCRProcessor
+from .profiling import GenerationProfiler, stage_timer
+from .stopping import RepetitionStoppingCriteria
+
+
+class SlotKVCache:
+    """
+    按槽位组织的KV缓存
+
+    每层一块 [槽位数, kv头数, 容量, head_dim] 的缓冲区，活跃序列始终占用 0..n-1 号槽位
+    （序列退出时把最后一个槽位搬到空出的位置），解码时直接返回前 n 个槽位的视图，不做拷贝。
+    容量按需倍增（不超过 max_len），各序列长度不同的部分由注意力掩码屏蔽。
+    实现了模型注意力层用到的 update / get_seq_length 接口。
+    """
+
+    def __init__(self, num_layers: int, max_slots: int, max_len: int, block_size: int = 256):
+        """
+        初始化缓存（缓冲区在第一次写入时按KV张量的 dtype 和设备分配）
+
+        Args:
+            num_layers: 语言模型层数
+            max_slots: 槽位数（最大并发序列数）
+            max_len: 单条序列的最大长度（提示词 + 生成）
+            block_size: 容量增长的粒度
+        """
+        self.num_layers = num_layers
+        self.max_slots = max_slots
+        self.max_len = max_len
+        self.block_size = block_size
+        self.keys: List[Optional[torch.Tensor]] = [None] * num_layers
+        self.values: List[Optional[torch.Tensor]] = [None] * num_layers
+        self.capacity = 0
+        self.lengths = [0] * max_slots
+        # 当前前向的写入方式：("prefill", 槽位, 长度) 或 ("decode", 序列数, 各序列写入位置, 注意力长度)
+        self._step = None
+
+    def _grow(self, length: int):
+        """保证容量不小于 length（已分配的缓冲区按新容量重新分配并拷贝）"""
+        if length <= self.capacity:
+            return
+        if length > self.max_len:
+            raise ValueError(f"序列长度 {length} 超过KV缓存上限 {self.max_len}")
+        capacity = max(length, self.capacity * 2)
+        capacity = min(self.max_len, -(-capacity // self.block_size) * self.block_size)
+        for buffers in (self.keys, self.values):
+            for idx, buffer in enumerate(buffers):
+                if buffer is None:
+                    continue
+                grown = buffer.new_zeros(buffer.shape[0], buffer.shape[1], capacity, buffer.shape[3])
+                grown[:, :, :self.capacity] = buffer
+                buffers[idx] = grown
+        self.capacity = capacity
+
+    def _buffers(self, layer_idx: int, states: torch.Tensor):
+        """取某层的K/V缓冲区，首次使用时分配"""
+        if self.keys[layer_idx] is None:
+            shape = (self.max_slots, states.shape[1], self.capacity, states.shape[3])
+            self.keys[layer_idx] = states.new_zeros(shape)
+            self.values[layer_idx] = states.new_zeros(shape)
+        return self.keys[layer_idx], self.values[layer_idx]
+
+    def prepare_prefill(self, slot: int, length: int):
+        """
+        下一次前向是单条序列的预填充
+
+        Args:
+            slot: 写入的槽位
+            length: 提示词长度
+        """
+        self._grow(length)
+        self._step = ("prefill", slot, length)
+
+    def prepare_decode(self, count: int) -> int:
+        """
+        下一次前向是前 count 个槽位各解码一个token
+
+        Args:
+            count: 活跃序列数
+
+        Returns:
+            本步注意力覆盖的长度（最长序列长度 + 1）
+        """
+        span = max(self.lengths[:count]) + 1
+        self._grow(span)
+        self._step = ("decode", count, torch.tensor(self.lengths[:count]), span)
+        return span
+
+    def get_seq_length(self, layer_idx: int = 0) -> int:
+        """已缓存的token数（解码时按最长序列计，用于模型内部的 cache_position 推断）"""
+        if self._step is None or self._step[0] == "prefill":
+            return 0
+        return self._step[3] - 1
+
+    def update(
+        self,
+        key_states: torch.Tensor,
+        value_states: torch.Tensor,
+        layer_idx: int,
+        cache_kwargs: Optional[Dict[str, Any]] = None
+    ):
+        """写入本步的K/V并返回注意力所需的完整K/V"""
+        keys, values = self._buffers(layer_idx, key_states)
+        if self._step[0] == "prefill":
+            _, slot, length = self._step
+            keys[slot, :, :length] = key_states[0]
+            values[slot, :, :length] = value_states[0]
+            return keys[slot:slot + 1, :, :length], values[slot:slot + 1, :, :length]
+
+        _, count, positions, span = self._step
+        if positions.device != keys.device:
+            positions = positions.to(keys.device)
+            self._step = ("decode", count, positions, span)
+        # 每个槽位写到各自的当前长度处
+        rows = torch.arange(count, device=keys.device)
+        keys[rows, :, positions] = key_states[:, :, 0]
+        values[rows, :, positions] = value_states[:, :, 0]
+        return keys[:count, :, :span], values[:count, :, :span]
+
+    def move(self, src: int, dst: int):
+        """把 src 槽位的缓存搬到 dst 槽位（序列退出后压紧活跃槽位）"""
+        length = self.lengths[src]
+        for buffers in (self.keys, self.values):
+            for buffer in buffers:
+                if buffer is not None:
+                    buffer[dst, :, :length] = buffer[src, :, :length]
+        self.lengths[dst] = length
+        self.lengths[src] = 0
+
+    def reset(self):
+        """清空所有槽位（出错后重新开始）"""
+        self.lengths = [0] * self.max_slots
+        self._step = None
+
+
+class _Sequence:
+    """调度器中一个页面的解码状态"""
+
+    def __init__(self, page: Dict[str, Any], task_type: str, future: Future):
+        self.page = page
+        self.task_type = task_type
+        self.future = future
+        self.prompt_ids: List[int] = []
+        self.tokens: List[int] = []
+        self.next_token: Optional[int] = None
+        self.rope_delta = 0
+        self.max_new_tokens = 0
+        self.vision_tokens = 0
+        self.started = 0.0
+        self.prefill_stats: Dict[str, Any] = {}
+        self.decode_seconds = 0.0
+        self.decode_cpu_seconds = 0.0
+        self.decode_steps = 0
+        self.max_batch = 1
+        self.finished = False
+        self.cancelled = False
+        self.truncated: Optional[Dict[str, Any]] = None
+
+
+class ContinuousBatchScheduler:
+    """
+    连续批处理解码调度器
+
+    所有模型调用都在调度器自己的线程中执行；各任务的流水线通过 submit 提交已预处理的页面，
+    得到与 OCRProcessor.process_prepared 单页结果格式一致的 Future。
+    每轮循环先为空闲槽位预填充排队页面，再让所有活跃序列一起解码一步。
+    """
+
+    def __init__(self, ocr_processor: OCRProcessor, max_batch_size: int = 4, max_seq_len: int = 8192):
+        """
+        初始化调度器并启动调度线程
+
+        Args:
+            ocr_processor: OCR处理器（提供模型、分词器、停止条件参数和页面缓存）
+            max_batch_size: 同时解码的最大序列数
+            max_seq_len: 单条序列的最大长度（提示词 + 生成），超出部分按 max_new_tokens 截断处理
+        """
+        self.ocr_processor = ocr_processor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_seq_len = max_seq_len
+        self.cache: Optional[SlotKVCache] = None
+        self._active: List[_Sequence] = []
+        self._waiting: List[_Sequence] = []
+        self._condition = threading.Condition()
+        self._closed = False
+        # 解码中被取消的页面，调度线程在下一步解码前让它们退出
+        self._cancelled: set = set()
+        # 重复循环检测参数与 generate 使用的停止条件一致
+        self._detector = RepetitionStoppingCriteria(0) if ocr_processor.stop_on_repetition else None
+        self._stats = {"admitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "decode_steps": 0, "batch_total": 0}
+        self._thread = threading.Thread(target=self._loop, name="decode-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, page: Dict[str, Any], task_type: str = "ocr") -> Future:
+        """
+        提交一个已预处理的页面（prepare_page 的返回值）
+
+        Args:
+            page: 页面字典；命中页面缓存的页面直接返回缓存结果
+            task_type: 任务类型
+
+        Returns:
+            识别结果的 Future（出错时 Future 携带异常）
+        """
+        future: Future = Future()
+        if "cached_result" in page:
+            future.set_result(self.ocr_processor.process_prepared([page], task_type)[0])
+            return future
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("调度器已关闭")
+            self._waiting.append(_Sequence(page, task_type, future))
+            self._condition.notify()
+        return future
+
+    def cancel(self, future: Future):
+        """
+        取消一个已提交的页面：排队中的不再预填充，解码中的在下一步解码前退出并释放槽位
+
+        Args:
+            future: submit 返回的 Future（以 CancelledError 结束）
+        """
+        if future.cancel() or future.done():
+            return
+        with self._condition:
+            self._cancelled.add(future)
+            self._condition.notify()
+
+    def _loop(self):
+        """调度线程：预填充排队页面 → 活跃序列解码一步，循环直到关闭"""
+        while True:
+            with self._condition:
+                while not self._closed and not self._waiting and not self._active:
+                    self._condition.wait()
+                if self._closed:
+                    break
+                free = self.max_batch_size - len(self._active)
+                admitted, self._waiting = self._waiting[:free], self._waiting[free:]
+                cancelled, self._cancelled = self._cancelled, set()
+            if cancelled:
+                for seq in self._active:
+                    if seq.future in cancelled:
+                        seq.finished = seq.cancelled = True
+                self._retire()
+            with torch.no_grad():
+                for seq in admitted:
+                    self._prefill(seq)
+                if self._active:
+                    self._decode_step()
+
+        error = RuntimeError("调度器已关闭")
+        for seq in self._active + self._waiting:
+            if not seq.future.done():
+                seq.future.set_exception(error)
+        self._active, self._waiting = [], []
+
+    def _ensure_cache(self):
+        """模型加载后按语言模型层数创建槽位缓存"""
+        if self.cache is None:
+            self.ocr_processor.load_model()
+            self.cache = SlotKVCache(
+                len(self.ocr_processor.model.model.layers), self.max_batch_size, self.max_seq_len
+            )
+
+    def _prefill(self, seq: _Sequence):
+        """单条序列预填充并加入解码批（预填充失败只影响该页面）"""
+        if not seq.future.set_running_or_notify_cancel():
+            return
+        try:
+            self._ensure_cache()
+            processor = self.ocr_processor
+            model = processor.model
+            inputs = processor.prepare_batch_inputs([seq.page["image_inputs"]], seq.task_type)
+            prompt_len = inputs["input_ids"].shape[1]
+            seq.prompt_ids = inputs["input_ids"][0].tolist()
+            seq.max_new_tokens = min(processor.max_new_tokens, self.max_seq_len - prompt_len)
+            if seq.max_new_tokens <= 0:
+                raise ValueError(f"提示词长度 {prompt_len} 超过单序列上限 {self.max_seq_len}")
+
+            slot = len(self._active)
+            seq.started = time.perf_counter()
+            vision: Dict[str, Any] = {}
+            if processor.vision_cache is not None:
+                with stage_timer(vision, "vision", thread_cpu=False):
+                    inputs, _ = processor.attach_image_embeds(inputs)
+            self.cache.prepare_prefill(slot, prompt_len)
+            with GenerationProfiler(model, synchronize=False) as profiler:
+                outputs = model(
+                    **inputs,
+                    past_key_values=self.cache,
+                    use_cache=True,
+                    cache_position=torch.arange(prompt_len, device=inputs["input_ids"].device)
+                )
+            self.cache.lengths[slot] = prompt_len
+            # 每条序列自己的 mRoPE 偏移：解码位置 = 已缓存长度 + rope_delta
+            seq.rope_delta = int(outputs.rope_deltas.reshape(-1)[0])
+            seq.prefill_stats = profiler.summary()
+            if vision:
+                seq.prefill_stats["vision_ms"] = vision["vision"]["wall_ms"]
+                seq.prefill_stats["vision_cpu_ms"] = vision["vision"]["cpu_ms"]
+            merge_length = processor.processor.image_processor.merge_size ** 2
+            seq.vision_tokens = int(inputs["image_grid_thw"][0].prod()) // merge_length
+            token = int(outputs.logits[0, -1].argmax())
+        except Exception as e:
+            seq.future.set_exception(e)
+            self._stats["failed"] += 1
+            return
+
+        self._stats["admitted"] += 1
+        self._active.append(seq)
+        self._accept(seq, token)
+        self._retire()
+
+    def _decode_step(self):
+        """所有活跃序列一起解码一步；出错时整批失败"""
+        model = self.ocr_processor.model
+        count = len(self._active)
+        device = model.model.embed_tokens.weight.device
+        try:
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            lengths = torch.tensor(self.cache.lengths[:count], device=device)
+            span = self.cache.prepare_decode(count)
+            tokens = torch.tensor([[seq.next_token] for seq in self._active], device=device)
+            inputs_embeds = model.model.embed_tokens(tokens)
+
+            # 各序列已缓存长度不同：只允许关注自己的前 lengths[i] 个位置和当前token
+            visible = torch.arange(span, device=device)[None, :] <= lengths[:, None]
+            attention_mask = torch.zeros((count, 1, 1, span), dtype=inputs_embeds.dtype, device=device)
+            attention_mask.masked_fill_(~visible[:, None, None, :], torch.finfo(inputs_embeds.dtype).min)
+
+            deltas = torch.tensor([seq.rope_delta for seq in self._active], device=device)
+            position_ids = (lengths + deltas).view(1, count, 1).expand(3, count, 1)
+
+            outputs = model.model(
+                inputs_embeds=inputs_embeds,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=self.cache,
+                use_cache=True,
+                cache_position=lengths.max().view(1)
+            )
+            next_tokens = model.lm_head(outputs.last_hidden_state[:, -1]).argmax(dim=-1).tolist()
+        except Exception as e:
+            for seq in self._active:
+                seq.future.set_exception(e)
+            self._stats["failed"] += count
+            self._active = []
+            self.cache.reset()
+            return
+
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        self._stats["decode_steps"] += 1
+        self._stats["batch_total"] += count
+        for slot, (seq, token) in enumerate(zip(self._active, next_tokens)):
+            self.cache.lengths[slot] += 1
+            seq.decode_seconds += wall
+            seq.decode_cpu_seconds += cpu
+            seq.decode_steps += 1
+            seq.max_batch = max(seq.max_batch, count)
+            self._accept(seq, token)
+        self._retire()
+
+    def _accept(self, seq: _Sequence, token: int):
+        """记录新生成的token并判断该序列是否结束"""
+        processor = self.ocr_processor
+        if token in processor.eos_token_ids():
+            seq.finished = True
+            return
+        seq.tokens.append(token)
+        seq.next_token = token
+
+        detector = self._detector
+        generated = len(seq.tokens)
+        if detector is not None and generated >= detector.min_tokens and generated % detector.check_every == 0:
+            window = detector.max_period * detector.min_repeats + detector.min_tokens
+            tail = seq.tokens[-window:]
+            cycle = detector.find_cycle(tail)
+            if cycle is not None:
+                period, start = cycle
+                seq.finished = True
+                seq.truncated = {"reason": "repetition", "period": period, "cut_at": generated - len(tail) + start + period}
+                return
+        if generated >= seq.max_new_tokens:
+            seq.finished = True
+            seq.truncated = {"reason": "max_new_tokens"}
+        elif processor.page_time_budget is not None and time.perf_counter() - seq.started > processor.page_time_budget:
+            seq.finished = True
+            seq.truncated = {"reason": "time_budget", "budget_seconds": processor.page_time_budget}
+
+    def _retire(self):
+        """交付已结束的序列，并把末尾槽位搬入空位保持活跃槽位连续"""
+        slot = 0
+        while slot < len(self._active):
+            seq = self._active[slot]
+            if not seq.finished:
+                slot += 1
+                continue
+            last = len(self._active) - 1
+            if slot != last:
+                self.cache.move(last, slot)
+                self._active[slot] = self._active[last]
+            else:
+                self.cache.lengths[slot] = 0
+            self._active.pop()
+            if seq.cancelled:
+                self._stats["cancelled"] += 1
+                seq.future.set_exception(CancelledError())
+            else:
+                self._deliver(seq)
+
+    def _deliver(self, seq: _Sequence):
+        """解码整条序列并构造与 process_prepared 一致的单页结果"""
+        processor = self.ocr_processor
+        try:
+            tokens = seq.tokens
+            if seq.truncated and seq.truncated["reason"] == "repetition":
+                tokens = tokens[:seq.truncated["cut_at"]]
+            # 与 process_prepared 一样连同提示词一起解码（"User: ...\nAssistant: ..."），
+            # 两种解码模式的识别文本、Markdown 中的任务类型判断和缓存内容保持一致
+            text = processor.processor.batch_decode([seq.prompt_ids + tokens], skip_special_tokens=True)[0]
+            page = seq.page
+            # 截断页面不写入缓存，便于换参数重试
+            if processor.page_cache is not None and page.get("cache_key") and not seq.truncated:
+                processor.page_cache.put(page["cache_key"], text)
+
+            stats = dict(seq.prefill_stats)
+            stats["decode_ms"] = round(seq.decode_seconds * 1000, 2)
+            stats["decode_cpu_ms"] = round(seq.decode_cpu_seconds * 1000, 2)
+            stats["decode_steps"] = seq.decode_steps
+            generated = len(seq.tokens) + (1 if seq.finished and not seq.truncated else 0)
+            # decode 是该序列所在各步的耗时之和（同一步由批内所有序列共享），batch_size 为期间的最大并发数
+            result = {
+                "image_path": page.get("image_path"),
+                "task_type": seq.task_type,
+                "result": text,
+                "image_size": page["image_size"],
+                "timings": dict(page.get("timings", {})),
+                "batch_size": seq.max_batch,
+                "vision_tokens": seq.vision_tokens,
+                "generated_tokens": generated,
+            }
+            result["timings"].update({
+                stage: {"wall_ms": stats[f"{stage}_ms"], "cpu_ms": stats[f"{stage}_cpu_ms"]}
+                for stage in ("vision", "prefill", "decode")
+                if f"{stage}_ms" in stats
+            })
+            if seq.truncated:
+                result["truncated"] = seq.truncated
+            if processor.generation_observer is not None:
+                stats.update(
+                    batch_size=seq.max_batch,
+                    generated_tokens=[generated],
+                    vision_tokens=[seq.vision_tokens],
+                    truncated=[seq.truncated]
+                )
+                processor.generation_observer(stats)
+        except Exception as e:
+            seq.future.set_exception(e)
+            self._stats["failed"] += 1
+            return
+        self._stats["completed"] += 1
+        seq.future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取调度统计
+
+        Returns:
+            活跃/排队序列数、累计完成数、解码步数与平均批大小
+        """
+        with self._condition:
+            waiting = len(self._waiting)
+        steps = self._stats["decode_steps"]
+        return {
+            "max_batch_size": self.max_batch_size,
+            "active": len(self._active),
+            "waiting": waiting,
+            "admitted": self._stats["admitted"],
+            "completed": self._stats["completed"],
+            "failed": self._stats["failed"],
+            "cancelled": self._stats["cancelled"],
+            "decode_steps": steps,
+            "avg_batch_size": round(self._stats["batch_total"] / steps, 2) if steps else None,
+        }
+
+    def shutdown(self, wait: bool = True):
+        """
+        关闭调度器（排队和解码中的页面以异常结束）
+
+        Args:
+            wait: 是否等待调度线程退出
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            self._thread.join()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+解码停止条件模块
+识别结果陷入循环（同一表格行、同一字符反复输出）的页面会一直解码到 max_new_tokens，
+这些少数页面占了大部分解码时间。这里提供两个逐序列生效的停止条件：
+- RepetitionStoppingCriteria：生成尾部出现足够长的周期性重复时停止该序列
+- TimeBudgetStoppingCriteria：单次 generate 超过墙钟预算时停止所有序列
+两者都记录触发原因，供识别结果标记为截断页面
+"""
+
+import time
+from typing import Dict, Iterable, Optional
+
+import torch
+from transformers import StoppingCriteria
+
+
+class RepetitionStoppingCriteria(StoppingCriteria):
+    """
+    重复循环检测
+
+    对每条未结束的序列，检查生成部分的尾部是否由周期为 p（1 ≤ p ≤ max_period）的片段
+    连续重复构成：至少 min_repeats 个周期，且重复部分总长不少于 min_tokens 个token
+    （避免把 "---" 这类短的合法重复误判为循环）。
+    """
+
+    def __init__(
+        self,
+        prompt_length: int,
+        max_period: int = 200,
+        min_repeats: int = 4,
+        min_tokens: int = 64,
+        check_every: int = 8,
+        ignore_token_ids: Iterable[int] = ()
+    ):
+        """
+        初始化检测器
+
+        Args:
+            prompt_length: 提示词长度（只检查生成部分）
+            max_period: 最长检测周期（token数）
+            min_repeats: 判定为循环所需的最少重复次数
+            min_tokens: 判定为循环所需的最少重复token数
+            check_every: 每生成多少个token检查一次（摊薄检测开销）
+            ignore_token_ids: 出现在末尾时跳过检测的token（已结束序列的EOS/填充）
+        """
+        self.prompt_length = prompt_length
+        self.max_period = max_period
+        self.min_repeats = max(2, min_repeats)
+        self.min_tokens = min_tokens
+        self.check_every = max(1, check_every)
+        self.ignore_token_ids = set(ignore_token_ids)
+        # 行号 -> (周期, 循环开始位置（生成部分内的下标）)
+        self.triggered: Dict[int, tuple] = {}
+
+    def find_cycle(self, tokens: list) -> Optional[tuple]:
+        """返回尾部循环的 (周期, 开始位置)，没有循环时返回None"""
+        n = len(tokens)
+        for period in range(1, min(self.max_period, n // self.min_repeats) + 1):
+            span = max(period * (self.min_repeats - 1), self.min_tokens - period)
+            if span + period > n:
+                continue
+            # tokens[i] == tokens[i - period] 对尾部 span 个位置成立，即尾部至少 span + period 个token呈周期重复
+            if tokens[n - span:] != tokens[n - span - period:n - period]:
+                continue
+            # 向前延伸找到循环的起点
+            start = n - span - period
+            while start > 0 and tokens[start - 1] == tokens[start - 1 + period]:
+                start -= 1
+            return period, start
+        return None
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        is_done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        generated = input_ids.shape[1] - self.prompt_length
+        if generated < self.min_tokens or generated % self.check_every:
+            return is_done
+        # 循环检测只需要尾部窗口
+        window = self.max_period * self.min_repeats + self.min_tokens
+        tails = input_ids[:, -min(window, generated):].tolist()
+        offset = generated - len(tails[0])
+        for row, tokens in enumerate(tails):
+            if row in self.triggered or tokens[-1] in self.ignore_token_ids:
+                continue
+            cycle = self.find_cycle(tokens)
+            if cycle is not None:
+                period, start = cycle
+                self.triggered[row] = (period, offset + start)
+                is_done[row] = True
+        return is_done
+
+
+class TimeBudgetStoppingCriteria(StoppingCriteria):
+    """单次 generate 的墙钟预算（批内所有序列同时停止）"""
+
+    def __init__(self, max_seconds: float):
+        """
+        初始化预算
+
+        Args:
+            max_seconds: 允许的最长解码时间（秒），从构造时开始计时
+        """
+        self.max_seconds = max_seconds
+        self.start = time.perf_counter()
+        self.triggered = False
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        expired = time.perf_counter() - self.start > self.max_seconds
+        if expired:
+            self.triggered = True
+        return torch.full((input_ids.shape[0],), expired, dtype=torch.bool, device=input_ids.device)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+任务事件模块
+任务状态变更时唤醒订阅者，供 Server-Sent Events 推送进度使用，取代前端的定时轮询
+"""
+
+import asyncio
+import threading
+from typing import Dict, Optional, Set
+
+
+class TaskEventHub:
+    """
+    任务事件中心
+
+    - 每个SSE连接订阅一个任务，得到一个 asyncio.Event
+    - 任务存储发生变更时调用 publish，唤醒该任务的所有订阅者
+    - publish 可以在任意线程调用，唤醒操作会被调度回事件循环执行
+    """
+
+    def __init__(self):
+        """初始化事件中心"""
+        self._subscribers: Dict[str, Set[asyncio.Event]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """
+        绑定事件循环
+
+        Args:
+            loop: 订阅者所在的事件循环
+        """
+        self._loop = loop
+
+    def subscribe(self, task_id: str) -> asyncio.Event:
+        """
+        订阅任务变更
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            任务变更时被置位的事件（由订阅者负责清除）
+        """
+        event = asyncio.Event()
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, task_id: str, event: asyncio.Event):
+        """
+        取消订阅
+
+        Args:
+            task_id: 任务ID
+            event: subscribe 返回的事件
+        """
+        with self._lock:
+            events = self._subscribers.get(task_id)
+            if events is not None:
+                events.discard(event)
+                if not events:
+                    del self._subscribers[task_id]
+
+    def publish(self, task_id: str):
+        """
+        通知任务已变更
+
+        Args:
+            task_id: 任务ID
+        """
+        with self._lock:
+            events = list(self._subscribers.get(task_id, ()))
+        if not events or self._loop is None:
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        for event in events:
+            if running is self._loop:
+                event.set()
+            else:
+                self._loop.call_soon_threadsafe(event.set)
+
+    def subscriber_count(self) -> int:
+        """当前订阅连接数"""
+        with self._lock:
+            return sum(len(events) for events in self._subscribers.values())
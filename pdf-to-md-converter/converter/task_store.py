@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+任务存储模块
+提供可替换的任务状态存储：内存实现（开发调试）与 SQLite 实现（默认，支持重启后恢复）
+"""
+
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# 任务表中的普通字段（result 以JSON文本存储，logs 单独存表）
+TASK_FIELDS = ("task_id", "filename", "status", "progress", "message", "error", "created_at", "updated_at")
+
+# 未结束的任务状态
+ACTIVE_STATUSES = ("queued", "processing")
+
+
+def encode_cursor(task: Dict[str, Any]) -> str:
+    """由一页中最后一个任务生成翻页游标（created_at|task_id）"""
+    return f"{task['created_at']}|{task['task_id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    解析翻页游标
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    created_at, sep, task_id = cursor.partition("|")
+    if not sep or not created_at or not task_id:
+        raise ValueError(f"无效的翻页游标: {cursor}")
+    return created_at, task_id
+
+
+class TaskStore(ABC):
+    """
+    任务存储接口
+
+    任务以字典形式读写，字段与 /api/status 接口返回的结构一致：
+    task_id, filename, status, progress, message, created_at, logs, 以及可选的 result / error
+
+    任务更新、追加日志或删除后会通知已注册的监听器（可能在任意线程中调用）
+    """
+
+    def __init__(self):
+        """初始化监听器列表"""
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """
+        注册任务变更监听器
+
+        Args:
+            callback: 回调函数，参数为发生变更的任务ID
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, task_id: str):
+        """通知监听器任务已变更"""
+        for callback in self._listeners:
+            callback(task_id)
+
+    @abstractmethod
+    def create(self, task: Dict[str, Any]):
+        """
+        创建任务记录
+
+        Args:
+            task: 任务字典（必须包含 task_id）
+        """
+
+    @abstractmethod
+    def get(self, task_id: str, include_logs: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        获取任务
+
+        Args:
+            task_id: 任务ID
+            include_logs: 是否附带日志
+
+        Returns:
+            任务字典，不存在时返回None
+        """
+
+    @abstractmethod
+    def update(self, task_id: str, **fields):
+        """
+        更新任务字段
+
+        Args:
+            task_id: 任务ID
+            **fields: 需要更新的字段（status / progress / message / error / result）
+        """
+
+    @abstractmethod
+    def append_log(self, task_id: str, line: str):
+        """
+        追加一条任务日志
+
+        Args:
+            task_id: 任务ID
+            line: 日志内容
+        """
+
+    @abstractmethod
+    def get_logs(self, task_id: str, after: int = 0) -> List[Tuple[int, str]]:
+        """
+        获取任务日志
+
+        Args:
+            task_id: 任务ID
+            after: 只返回序号大于该值的日志
+
+        Returns:
+            (日志序号, 日志内容) 列表，序号从1开始递增
+        """
+
+    @abstractmethod
+    def list(
+        self,
+        status: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        """
+        按 (created_at, task_id) 倒序分页列出任务（不含日志）
+
+        Args:
+            status: 按状态过滤
+            limit: 每页数量
+            cursor: 上一页返回的游标，从该位置之后继续（None 表示第一页）
+
+        Returns:
+            (任务列表, 符合条件的任务总数, 下一页游标；没有更多任务时为None)
+
+        Raises:
+            ValueError: 游标格式无效
+        """
+
+    @abstractmethod
+    def delete(self, task_id: str) -> bool:
+        """
+        删除任务及其日志
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            任务是否存在
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """任务总数"""
+
+    @abstractmethod
+    def count_by_status(self) -> Dict[str, int]:
+        """
+        按状态统计任务数
+
+        Returns:
+            {状态: 任务数}
+        """
+
+    @abstractmethod
+    def fail_interrupted(self, message: str) -> int:
+        """
+        将上次运行遗留的未结束任务标记为失败（服务启动时调用）
+
+        Args:
+            message: 失败信息
+
+        Returns:
+            被标记的任务数
+        """
+
+    def close(self):
+        """释放存储资源"""
+
+
+class MemoryTaskStore(TaskStore):
+    """内存任务存储（重启后丢失，仅用于开发调试）"""
+
+    def __init__(self):
+        """初始化内存存储"""
+        super().__init__()
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._logs: Dict[str, List[str]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _count_status(self, status: str, delta: int):
+        """调整某状态的任务计数（调用方需持有锁）"""
+        self._counts[status] = self._counts.get(status, 0) + delta
+
+    def create(self, task: Dict[str, Any]):
+        task = {k: v for k, v in task.items() if k != "logs"}
+        task.setdefault("status", "queued")
+        task.setdefault("updated_at", task.get("created_at"))
+        with self._lock:
+            old = self._tasks.get(task["task_id"])
+            if old is not None:
+                self._count_status(old["status"], -1)
+            self._tasks[task["task_id"]] = task
+            self._logs[task["task_id"]] = []
+            self._count_status(task["status"], 1)
+
+    def get(self, task_id: str, include_logs: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if task_id not in self._tasks:
+                return None
+            task = dict(self._tasks[task_id])
+            if include_logs:
+                task["logs"] = list(self._logs[task_id])
+        return task
+
+    def update(self, task_id: str, **fields):
+        fields["updated_at"] = datetime.now().isoformat()
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None:
+                if "status" in fields and fields["status"] != task["status"]:
+                    self._count_status(task["status"], -1)
+                    self._count_status(fields["status"], 1)
+                task.update(fields)
+        self._notify(task_id)
+
+    def append_log(self, task_id: str, line: str):
+        with self._lock:
+            if task_id in self._logs:
+                self._logs[task_id].append(line)
+        self._notify(task_id)
+
+    def get_logs(self, task_id: str, after: int = 0) -> List[Tuple[int, str]]:
+        with self._lock:
+            logs = self._logs.get(task_id, [])
+            return [(seq, line) for seq, line in enumerate(logs[after:], after + 1)]
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        after = decode_cursor(cursor) if cursor else None
+        with self._lock:
+            items = [
+                dict(task) for task in self._tasks.values()
+                if status is None or task["status"] == status
+            ]
+        total = len(items)
+        if after is not None:
+            items = [task for task in items if (task["created_at"], task["task_id"]) < after]
+        items.sort(key=lambda task: (task["created_at"], task["task_id"]), reverse=True)
+        page = items[:limit]
+        next_cursor = encode_cursor(page[-1]) if len(items) > limit else None
+        return page, total, next_cursor
+
+    def delete(self, task_id: str) -> bool:
+        with self._lock:
+            self._logs.pop(task_id, None)
+            task = self._tasks.pop(task_id, None)
+            if task is not None:
+                self._count_status(task["status"], -1)
+        self._notify(task_id)
+        return task is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._tasks)
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            return {status: count for status, count in self._counts.items() if count}
+
+    def fail_interrupted(self, message: str) -> int:
+        # 内存存储在重启后为空，不存在遗留任务
+        return 0
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    SQLite任务存储
+
+    - WAL模式：读写互不阻塞，状态查询不会被进度写入卡住
+    - (created_at, task_id) 与 (status, created_at, task_id) 索引支持按游标翻页，每页只读取 limit 行
+    - 各状态任务数由触发器维护在 task_counts 表中，与任务的插入、状态变更、删除在同一事务内更新，
+      计数查询不扫描任务表
+    - 日志单独存表并按 (task_id, seq) 索引，任务行保持固定大小，进程内存不随日志增长
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        task_id     TEXT PRIMARY KEY,
+        filename    TEXT NOT NULL,
+        status      TEXT NOT NULL,
+        progress    INTEGER NOT NULL DEFAULT 0,
+        message     TEXT,
+        error       TEXT,
+        result      TEXT,
+        created_at  TEXT NOT NULL,
+        updated_at  TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_tasks_created_at_task_id ON tasks (created_at, task_id);
+    CREATE INDEX IF NOT EXISTS idx_tasks_status_created_at_task_id ON tasks (status, created_at, task_id);
+    CREATE TABLE IF NOT EXISTS task_counts (
+        status      TEXT PRIMARY KEY,
+        count       INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_count_insert AFTER INSERT ON tasks
+    BEGIN
+        INSERT INTO task_counts (status, count) VALUES (NEW.status, 1)
+        ON CONFLICT (status) DO UPDATE SET count = count + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_count_delete AFTER DELETE ON tasks
+    BEGIN
+        UPDATE task_counts SET count = count - 1 WHERE status = OLD.status;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_tasks_count_status AFTER UPDATE OF status ON tasks
+    WHEN OLD.status <> NEW.status
+    BEGIN
+        UPDATE task_counts SET count = count - 1 WHERE status = OLD.status;
+        INSERT INTO task_counts (status, count) VALUES (NEW.status, 1)
+        ON CONFLICT (status) DO UPDATE SET count = count + 1;
+    END;
+    CREATE TABLE IF NOT EXISTS task_logs (
+        task_id     TEXT NOT NULL,
+        seq         INTEGER NOT NULL,
+        line        TEXT NOT NULL,
+        PRIMARY KEY (task_id, seq)
+    ) WITHOUT ROWID;
+    """
+
+    def __init__(self, db_path: str):
+        """
+        初始化SQLite存储
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        super().__init__()
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        # 连接在事件循环线程和工作线程之间共享，由锁保证串行访问
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+
+    def _row_to_task(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """将数据库行转换为任务字典（省略空的可选字段）"""
+        task = {field: row[field] for field in TASK_FIELDS}
+        if task["error"] is None:
+            del task["error"]
+        if row["result"] is not None:
+            task["result"] = json.loads(row["result"])
+        return task
+
+    def create(self, task: Dict[str, Any]):
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tasks (task_id, filename, status, progress, message, error, result, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    task["task_id"],
+                    task["filename"],
+                    task.get("status", "queued"),
+                    task.get("progress", 0),
+                    task.get("message"),
+                    task.get("error"),
+                    json.dumps(task["result"], ensure_ascii=False) if "result" in task else None,
+                    task.get("created_at", now),
+                    now,
+                ),
+            )
+
+    def get(self, task_id: str, include_logs: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        task = self._row_to_task(row)
+        if include_logs:
+            task["logs"] = [line for _, line in self.get_logs(task_id)]
+        return task
+
+    def update(self, task_id: str, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+        unknown = set(fields) - set(TASK_FIELDS) - {"result"}
+        if unknown:
+            raise ValueError(f"未知的任务字段: {', '.join(sorted(unknown))}")
+        fields["updated_at"] = datetime.now().isoformat()
+
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE tasks SET {columns} WHERE task_id = ?",
+                (*fields.values(), task_id),
+            )
+        self._notify(task_id)
+
+    def append_log(self, task_id: str, line: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO task_logs (task_id, seq, line) "
+                "SELECT ?, COALESCE(MAX(seq), 0) + 1, ? FROM task_logs WHERE task_id = ?",
+                (task_id, line, task_id),
+            )
+        self._notify(task_id)
+
+    def get_logs(self, task_id: str, after: int = 0) -> List[Tuple[int, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, line FROM task_logs WHERE task_id = ? AND seq > ? ORDER BY seq",
+                (task_id, after),
+            ).fetchall()
+        return [(row["seq"], row["line"]) for row in rows]
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if cursor:
+            conditions.append("(created_at, task_id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            # 多取一行判断是否还有下一页
+            rows = self._conn.execute(
+                f"SELECT * FROM tasks {where} ORDER BY created_at DESC, task_id DESC LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+        items = [self._row_to_task(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+        total = self.count_by_status().get(status, 0) if status else self.count()
+        return items, total, next_cursor
+
+    def delete(self, task_id: str) -> bool:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM task_logs WHERE task_id = ?", (task_id,))
+                cursor = self._conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._notify(task_id)
+        return cursor.rowcount > 0
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(count), 0) FROM task_counts").fetchone()[0]
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, count FROM task_counts WHERE count > 0").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def fail_interrupted(self, message: str) -> int:
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE tasks SET status = 'failed', message = ?, error = ?, updated_at = ? "
+                f"WHERE status IN ({placeholders})",
+                (message, message, datetime.now().isoformat(), *ACTIVE_STATUSES),
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_task_store(backend: str = "sqlite", db_path: Optional[str] = None) -> TaskStore:
+    """
+    根据配置创建任务存储
+
+    Args:
+        backend: 存储后端（sqlite / memory）
+        db_path: SQLite数据库路径（sqlite后端必填）
+
+    Returns:
+        任务存储实例
+    """
+    if backend == "memory":
+        return MemoryTaskStore()
+    if backend == "sqlite":
+        if not db_path:
+            raise ValueError("sqlite 任务存储需要指定数据库路径")
+        return SQLiteTaskStore(db_path)
+    raise ValueError(f"不支持的任务存储后端: {backend}")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+微型模型生成模块
+基于 PaddleOCRVLConfig.tiny 预设生成随机权重的微型 PaddleOCR-VL 检查点，
+复用原模型目录中的远程代码、分词器和图像处理器配置，
+可以通过 OCRProcessor 的同一加载路径在CPU上秒级完成生成、缓存、批处理等功能的基准和测试
+
+用法:
+    python -m converter.tiny_model --source ../models/paddleocr-vl --output /tmp/paddleocr-vl-tiny
+"""
+
+import argparse
+import json
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import torch
+from transformers.dynamic_module_utils import get_class_from_dynamic_module
+
+
+# 仓库自带的模型目录（包含远程代码与分词器，不含权重）
+DEFAULT_SOURCE = Path(__file__).resolve().parents[2] / "models" / "paddleocr-vl"
+
+# 不复制的文件：权重和模型配置（由微型配置重新生成）
+_SKIP_SUFFIXES = (".safetensors", ".bin", ".pth", ".ckpt")
+_SKIP_FILES = ("config.json", "model.safetensors.index.json")
+
+
+def create_tiny_model(
+    output_dir: str,
+    source_dir: Optional[str] = None,
+    seed: int = 0,
+    vision_config: Optional[Dict[str, Any]] = None,
+    **config_overrides
+) -> str:
+    """
+    生成微型随机权重检查点
+
+    Args:
+        output_dir: 输出目录
+        source_dir: 提供远程代码、分词器和处理器配置的原模型目录
+        seed: 随机种子（相同种子生成相同权重）
+        vision_config: 覆盖视觉配置预设的参数
+        **config_overrides: 覆盖语言模型配置预设的参数
+
+    Returns:
+        输出目录路径
+    """
+    source = Path(source_dir) if source_dir else DEFAULT_SOURCE
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+
+    # 复制远程代码、分词器、处理器与生成配置
+    for path in source.iterdir():
+        if not path.is_file() or path.name in _SKIP_FILES or path.suffix in _SKIP_SUFFIXES:
+            continue
+        shutil.copy2(path, output / path.name)
+
+    with open(source / "config.json", "r", encoding="utf-8") as f:
+        source_config = json.load(f)
+
+    config_class = get_class_from_dynamic_module(
+        source_config["auto_map"]["AutoConfig"], str(source)
+    )
+    model_class = get_class_from_dynamic_module(
+        source_config["auto_map"]["AutoModelForCausalLM"], str(source)
+    )
+
+    config = config_class.tiny(vision_config=vision_config, **config_overrides)
+    config.auto_map = source_config["auto_map"]
+    config.architectures = source_config["architectures"]
+
+    torch.manual_seed(seed)
+    model = model_class(config).eval()
+    model.save_pretrained(str(output), safe_serialization=True)
+
+    # save_pretrained 会按模型当前状态重写生成配置，这里恢复原模型的生成配置
+    if (source / "generation_config.json").exists():
+        shutil.copy2(source / "generation_config.json", output / "generation_config.json")
+
+    param_count = sum(p.numel() for p in model.parameters())
+    print(f"✓ 微型模型已生成: {output} ({param_count / 1e6:.1f}M 参数)")
+    return str(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成随机权重的微型 PaddleOCR-VL 检查点")
+    parser.add_argument("--source", default=str(DEFAULT_SOURCE), help="原模型目录（不需要权重）")
+    parser.add_argument("--output", required=True, help="输出目录")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--layers", type=int, default=None, help="语言模型层数")
+    parser.add_argument("--vision-layers", type=int, default=None, help="视觉编码器层数")
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.layers is not None:
+        overrides["num_hidden_layers"] = args.layers
+    vision_overrides = {}
+    if args.vision_layers is not None:
+        vision_overrides["num_hidden_layers"] = args.vision_layers
+
+    create_tiny_model(args.output, args.source, seed=args.seed, vision_config=vision_overrides, **overrides)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+上传大小限制模块
+FastAPI 在调用处理函数之前就会读完并缓存整个 multipart 请求体（UploadFile 参数），
+处理函数里的大小检查只能在整个文件已经收完之后才生效。
+这里用一个ASGI中间件在请求体到达时就检查大小：
+- 声明的 Content-Length 超过上限时不读取请求体，直接返回413
+- 分块传输（没有 Content-Length）或声明不实时，累计已接收字节数，超过上限立即返回413并停止接收
+"""
+
+from typing import Any, Callable, Dict
+
+from starlette.responses import JSONResponse
+
+
+class UploadSizeLimitMiddleware:
+    """
+    请求体大小限制中间件（只作用于指定路径的请求）
+    """
+
+    def __init__(self, app: Callable, path: str, max_body_bytes: int, detail: str):
+        """
+        初始化中间件
+
+        Args:
+            app: 下游ASGI应用
+            path: 需要限制的请求路径（如 /api/upload）
+            max_body_bytes: 请求体字节数上限（含 multipart 包装开销）
+            detail: 超限时返回的错误信息
+        """
+        self.app = app
+        self.path = path
+        self.max_body_bytes = max_body_bytes
+        self.detail = detail
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+        started = False
+
+        async def limited_receive() -> Dict[str, Any]:
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes and not started:
+                    # 先回复413，再让下游当作客户端断开处理，不再继续接收请求体
+                    rejected = True
+                    await self._reject(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Dict[str, Any]):
+            nonlocal started
+            # 已经回复413后丢弃下游的响应
+            if rejected:
+                return
+            started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+    async def _reject(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        """返回413响应"""
+        response = JSONResponse({"detail": self.detail}, status_code=413, headers={"Connection": "close"})
+        await response(scope, receive, send)
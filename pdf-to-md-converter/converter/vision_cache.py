@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+视觉嵌入缓存模块
+同一页面换任务类型（ocr / table / formula / chart）重新识别时，视觉编码器和投影层的输入完全相同。
+这里把每页的投影层输出（送入语言模型的图像嵌入）以 safetensors 格式保存在磁盘上，
+后续提示词直接把缓存的嵌入作为 image_embeds 传给模型，跳过 self.visual 与 self.mlp_AR。
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import torch
+from safetensors.torch import load_file, save_file
+
+
+# 缓存文件格式版本（存储内容或键的计算方式变化时递增）
+VISION_CACHE_FORMAT_VERSION = 1
+
+
+class VisionEmbeddingCache:
+    """
+    视觉嵌入缓存（每页一个 safetensors 文件，按最近访问时间LRU淘汰）
+
+    - 键：单张图像预处理后 patch 像素的 BLAKE2b 哈希 + 网格大小 + 模型版本与视觉编码器配置
+    - 值：该图像的投影层输出 [图像token数, hidden_size]，保持模型计算时的 dtype
+    - 命中时刷新文件修改时间；总大小超过 max_bytes 时删除最久未访问的文件
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 ** 3):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存文件总大小上限（字节）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._total_bytes = sum(path.stat().st_size for path in self.cache_dir.glob("*/*.safetensors"))
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(pixel_values: torch.Tensor, image_grid_thw: torch.Tensor, namespace: str) -> str:
+        """
+        计算单张图像的缓存键
+
+        Args:
+            pixel_values: 该图像的 patch 像素（预处理输出中属于这张图的部分）
+            image_grid_thw: 该图像的网格大小 (t, h, w)
+            namespace: 模型版本与视觉编码器配置标识
+
+        Returns:
+            缓存键（十六进制字符串）
+        """
+        grid = "x".join(str(int(v)) for v in image_grid_thw.tolist())
+        pixels = pixel_values.detach().contiguous().cpu()
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"v{VISION_CACHE_FORMAT_VERSION}|{namespace}|{grid}|{pixels.dtype}|".encode("utf-8"))
+        digest.update(pixels.view(torch.uint8).numpy().tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        """缓存键对应的文件路径"""
+        return self.cache_dir / key[:2] / f"{key}.safetensors"
+
+    def get(self, key: str) -> Optional[torch.Tensor]:
+        """
+        查找缓存的图像嵌入（命中时刷新访问时间）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            [图像token数, hidden_size] 的嵌入（CPU张量），未命中返回None
+        """
+        path = self._path(key)
+        try:
+            embeds = load_file(str(path))["image_embeds"]
+            os.utime(path)
+        except (OSError, KeyError):
+            with self._lock:
+                self._misses += 1
+            return None
+        except Exception as e:
+            print(f"⚠️ 视觉嵌入缓存文件损坏，已删除: {path.name} ({e})")
+            with self._lock:
+                self._total_bytes -= self._remove(path)
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        return embeds
+
+    def put(self, key: str, image_embeds: torch.Tensor):
+        """
+        写入图像嵌入（先写临时文件再原子重命名，目录不可写时跳过）
+
+        Args:
+            key: 缓存键
+            image_embeds: 该图像的投影层输出
+        """
+        path = self._path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.part")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            old_size = path.stat().st_size if path.exists() else 0
+            save_file({"image_embeds": image_embeds.detach().contiguous().cpu()}, str(tmp))
+            size = tmp.stat().st_size
+            tmp.replace(path)
+        except OSError as e:
+            print(f"⚠️ 视觉嵌入缓存保存失败: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            self._total_bytes += size - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _remove(self, path: Path) -> int:
+        """删除缓存文件，返回释放的字节数"""
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            return size
+        except OSError:
+            return 0
+
+    def _evict_locked(self):
+        """按最近访问时间淘汰，直到总大小不超过上限（调用方需持有锁）"""
+        files = []
+        for path in self.cache_dir.glob("*/*.safetensors"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        for _, path in sorted(files):
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._total_bytes -= self._remove(path)
+            self._evictions += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            命中/未命中次数、淘汰次数、当前大小
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+                "evictions": self._evictions,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -2,7 +2,10 @@
 
 const API_BASE = '';
 let currentTaskId = null;
-let pollInterval = null;
+let eventSource = null;
+let logCursor = 0;  // 已接收的日志条数，断线重连时从该位置续传
+let reconnectAttempts = 0;  // 连续重连次数，收到事件后清零
+const MAX_RECONNECT_ATTEMPTS = 5;
 
 // DOM元素
 const uploadArea = document.getElementById('uploadArea');
@@ -101,14 +104,19 @@ uploadBtn.addEventListener('click', async () => {
         });
         
         if (!response.ok) {
-            throw new Error('上传失败');
+            // 文件过大、页数超限或不是有效PDF时服务端返回具体原因
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.detail || '上传失败');
         }
         
         const data = await response.json();
         currentTaskId = data.task_id;
         
-        // 开始轮询任务状态
-        startPolling();
+        // 订阅任务进度
+        logCursor = 0;
+        reconnectAttempts = 0;
+        document.getElementById('logContainer').innerHTML = '';
+        subscribeTaskEvents();
         
     } catch (error) {
         showError('上传失败: ' + error.message);
@@ -117,37 +125,89 @@ uploadBtn.addEventListener('click', async () => {
     }
 });
 
-// 开始轮询任务状态
-function startPolling() {
-    if (pollInterval) {
-        clearInterval(pollInterval);
+// 订阅任务进度事件（Server-Sent Events）
+function subscribeTaskEvents() {
+    closeTaskEvents();
+    
+    // 浏览器自动重连时会回传 Last-Event-ID；手动重建连接时通过 cursor 续传
+    eventSource = new EventSource(`${API_BASE}/api/tasks/${currentTaskId}/events?cursor=${logCursor}`);
+    
+    eventSource.addEventListener('progress', (event) => {
+        reconnectAttempts = 0;
+        updateProgress(JSON.parse(event.data));
+    });
+    
+    eventSource.addEventListener('done', (event) => {
+        const data = JSON.parse(event.data);
+        closeTaskEvents();
+        updateProgress(data);
+        
+        if (data.status === 'completed') {
+            showResult(data);
+        } else {
+            showError('处理失败: ' + data.message);
+            hideProgress();
+            uploadBtn.disabled = false;
+        }
+    });
+    
+    eventSource.addEventListener('error', (event) => {
+        // 服务端发送的 error 事件带有数据；连接错误由浏览器自动重连
+        if (event.data) {
+            closeTaskEvents();
+            showError(JSON.parse(event.data).message);
+            hideProgress();
+            uploadBtn.disabled = false;
+        } else if (eventSource.readyState === EventSource.CLOSED) {
+            // 服务端返回404/5xx时浏览器不会自动重连
+            handleEventsClosed();
+        }
+    });
+}
+
+// 进度连接被关闭：任务已不存在时报错，否则按指数退避有限次重连
+async function handleEventsClosed() {
+    closeTaskEvents();
+    const taskId = currentTaskId;
+    
+    try {
+        const response = await fetch(`${API_BASE}/api/status/${taskId}`);
+        if (response.status === 404) {
+            showError('任务不存在或已被删除');
+            hideProgress();
+            uploadBtn.disabled = false;
+            return;
+        }
+    } catch (error) {
+        // 网络错误按普通断线处理，继续重连
     }
     
-    pollInterval = setInterval(async () => {
-        try {
-            const response = await fetch(`${API_BASE}/api/status/${currentTaskId}`);
-            if (!response.ok) {
-                throw new Error('查询状态失败');
-            }
-            
-            const data = await response.json();
-            updateProgress(data);
-            
-            // 任务完成或失败时停止轮询
-            if (data.status === 'completed') {
-                clearInterval(pollInterval);
-                showResult(data);
-            } else if (data.status === 'failed') {
-                clearInterval(pollInterval);
-                showError('处理失败: ' + data.message);
-                hideProgress();
-                uploadBtn.disabled = false;
-            }
-            
-        } catch (error) {
-            console.error('轮询错误:', error);
+    if (taskId !== currentTaskId) {
+        return;
+    }
+    if (reconnectAttempts >= MAX_RECONNECT_ATTEMPTS) {
+        showError('进度连接多次重连失败，请稍后刷新页面查看任务状态');
+        hideProgress();
+        uploadBtn.disabled = false;
+        return;
+    }
+    
+    const delay = Math.min(2000 * 2 ** reconnectAttempts, 30000);
+    reconnectAttempts += 1;
+    console.error(`进度连接已关闭，${delay / 1000} 秒后第 ${reconnectAttempts} 次重连...`);
+    setTimeout(() => {
+        if (taskId === currentTaskId) {
+            subscribeTaskEvents();
         }
-    }, 1000); // 每秒查询一次
+    }, delay);
+}
+
+// 关闭进度事件连接
+function closeTaskEvents() {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
 }
 
 // 更新进度
@@ -157,13 +217,15 @@ function updateProgress(data) {
     progressFill.textContent = progress + '%';
     progressMessage.textContent = data.message || '处理中...';
     
-    // 更新日志
+    // 追加新日志（事件只携带游标之后的日志）
     if (data.logs) {
         const logContainer = document.getElementById('logContainer');
         
+        if (data.cursor !== undefined) {
+            logCursor = data.cursor;
+        }
+        
         if (data.logs.length > 0) {
-            logContainer.innerHTML = '';
-            
             data.logs.forEach(log => {
                 const logEntry = document.createElement('div');
                 logEntry.className = 'log-entry';